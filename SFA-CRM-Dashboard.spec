@@ -5,7 +5,7 @@ a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[('assets', 'assets'), ('components', 'components'), ('layouts', 'layouts'), ('callbacks', 'callbacks'), ('images', 'images'), ('pdca_2025.xlsx', '.')],
+    datas=[('assets', 'assets'), ('vendor', 'vendor'), ('components', 'components'), ('layouts', 'layouts'), ('callbacks', 'callbacks'), ('images', 'images'), ('pdca_2025.xlsx', '.')],
     hiddenimports=['dash_bootstrap_components', 'plotly', 'pandas', 'openpyxl'],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,55 @@
+"""
+本番環境用エントリーポイント（gunicorn --preload でワーカー間のメモリ共有を維持）
+
+fork 前にマスターでデータ読み込み・列指向への変換・初回シリアライズ・ウォームアップを済ませ、GC の世代を凍結する。
+ワーカーは参照カウント・GC によるページの複製が抑えられ、マスターのメモリの大部分を共有したまま動作する
+
+使い方:
+  gunicorn app_preload:server --workers 3 --preload
+  python -m utils.memory_report <マスターのPID>   # ワーカーごとの固有・共有メモリ
+  （SFA_PROFILE=1 または管理者トークン付きのブラウザでは /_memory でも確認できる）
+"""
+import gc
+import logging
+
+# fork までに生成・解放されるオブジェクトでページに空きが散らばらないよう GC を止める
+gc.disable()
+
+import flask  # noqa: E402
+
+from data_manager import data_manager  # noqa: E402
+# main の import 時にサンプルデータが読み込まれる
+from main import app  # noqa: E402
+from utils import memory_report, profiling, warmup  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+def _warm_up(server):
+    """初回リクエスト時の遅延インポート・レイアウト構築を fork 前に済ませる"""
+    client = server.test_client()
+    for path in ('/', '/_dash-layout', '/_dash-dependencies'):
+        client.get(path)
+
+
+@app.server.route('/_memory')
+def _memory():
+    if not profiling.should_profile():
+        flask.abort(404)
+    return flask.jsonify(memory_report.worker_report())
+
+
+data_manager.compact()
+_warm_up(app.server)
+# よく使われる画面状態のキャッシュも fork 前に作成してワーカー間で共有する
+if warmup.enabled:
+    warmup.warmer.run()
+
+# 読み込み済みのオブジェクトを GC の対象外にしてから GC を再開する（fork 後のワーカーにも引き継がれる）
+gc.collect()
+gc.freeze()
+gc.enable()
+logger.info(f"fork 前の準備が完了しました（凍結したオブジェクト: {gc.get_freeze_count()}）")
+
+# Gunicorn用のサーバーオブジェクトを公開
+server = app.server
@@ -0,0 +1,3 @@
+"""
+ベンチマーク・負荷試験ツール
+"""
@@ -0,0 +1,308 @@
+"""
+集計結果のゴールデン出力
+サンプル・合成ワークブックについて (セクション, 月, 期間種別, チャネル, プラン) の全組み合わせで
+apply_filters・calculate_kpi_values・get_monthly_trend_data・CV率計算の結果を記録し、
+最適化後の実装がその結果と許容誤差内で一致するかを検証する
+
+使い方:
+  python -m benchmarks.golden_outputs --record   # 現在の結果を benchmarks/golden/ に記録
+  python -m benchmarks.golden_outputs            # 記録との比較（不一致があれば終了コード1）
+  python -m benchmarks.golden_outputs --stride 20  # 20件に1件だけ比較（短時間の確認用）
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from config import CHANNEL_ALIASES, MAIN_CHANNELS, STAGE_MAPPING  # noqa: E402
+import data_manager  # noqa: E402
+from utils import cv_rate_utils  # noqa: E402
+from utils.compact_records import compact_dataset  # noqa: E402
+from benchmarks.run_benchmarks import load_sample_contents  # noqa: E402
+from benchmarks.synthetic_workbook import generate_workbook, to_upload_contents  # noqa: E402
+
+GOLDEN_DIR = os.path.join(ROOT, 'benchmarks', 'golden')
+
+# 比較の許容誤差
+DEFAULT_REL_TOL = 1e-9
+DEFAULT_ABS_TOL = 1e-6
+
+KPI_SECTIONS = ('sales', 'acquisition', 'unit_price', 'retention', 'indicators')
+TREND_SECTIONS = ('sales', 'acquisition', 'unit_price')
+PERIOD_TYPES = ('single', 'cumulative')
+DATA_TYPES = ('actual', 'budget')
+EXCLUDED_PLANS = ('計', '合計', '')
+
+# CV率の種類 → (分母のステージ, 分子のステージ)
+CV_TRANSITIONS = {
+    'to商談': (['新規リード数', 'アプローチ数'], ['商談ステージ']),
+    'to具体検討': (['商談ステージ'], ['具体検討ステージ']),
+    'to内諾': (['具体検討ステージ'], ['内諾ステージ']),
+    'to獲得': (['内諾ステージ'], ['新規アプリ獲得数（単月）']),
+}
+
+# 検証対象のワークブック（名前 → (contents, structure) を返す関数）
+WORKBOOKS = {
+    'sample': lambda: (load_sample_contents(), None),
+    'synthetic': lambda: _synthetic_workbook(),
+}
+
+
+def _synthetic_workbook():
+    content, structure = generate_workbook(channels=8, plans_per_channel=5, months=7, fill_ratio=0.85, seed=2025)
+    return to_upload_contents(content), structure
+
+
+def current_engine():
+    """現在の実装（最適化版と比較する基準）"""
+    return SimpleNamespace(
+        apply_filters=data_manager.apply_filters,
+        calculate_kpi_values=data_manager.calculate_kpi_values,
+        get_monthly_trend_data=data_manager.get_monthly_trend_data,
+        calculate_cv_rate_with_lag=cv_rate_utils.calculate_cv_rate_with_lag,
+        calculate_cv_rate_trend_with_lag=cv_rate_utils.calculate_cv_rate_trend_with_lag,
+    )
+
+
+def load_workbook_data(name):
+    """ワークブックを読み込んでデータストアを作成"""
+    contents, structure = WORKBOOKS[name]()
+    data, message = data_manager.process_excel_data(contents, structure)
+    if data is None:
+        raise RuntimeError(message)
+    return data
+
+
+def _normalize(value):
+    """比較・JSON保存用に numpy 型やタプルを変換"""
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    return value
+
+
+def _filter_summary(df):
+    """フィルタ結果の要約（行数・行の並びのダイジェスト・月別合計）"""
+    if df is None:
+        return None
+    month_cols = [col for col in df.columns if col.endswith('月') or col == '合計']
+    rows = [[str(channel), str(plan)] for channel, plan in zip(df['channel'], df['plan'])] if 'channel' in df else []
+    return {
+        'count': len(rows),
+        'rows': hashlib.sha1(json.dumps(rows, ensure_ascii=False).encode('utf-8')).hexdigest(),
+        'totals': {col: df[col].sum() for col in month_cols},
+    }
+
+
+def channel_options(data):
+    """チャネルフィルタの候補（未指定・正規化名・別名のないExcel上の名前・複数選択）"""
+    aliased = {name for names in CHANNEL_ALIASES.values() for name in names}
+    raw = []
+    for record in data.get('sales', {}).get('actual', [])[1:]:
+        channel = record.get('channel')
+        if channel and channel != '合計' and channel not in aliased and channel not in raw:
+            raw.append(channel)
+    return [None] + [[name] for name in CHANNEL_ALIASES] + [[name] for name in raw] + [list(MAIN_CHANNELS[:3])]
+
+
+def plan_options(data, section):
+    """プランフィルタの候補（未指定・各プラン・複数選択）"""
+    plans = []
+    for record in data.get(section, {}).get('actual', [])[1:]:
+        plan = record.get('plan')
+        if plan not in EXCLUDED_PLANS and plan not in plans:
+            plans.append(plan)
+    return [None] + [[plan] for plan in plans] + ([plans[:2]] if len(plans) > 1 else [])
+
+
+def _key(*parts):
+    return '|'.join('-' if part is None else ','.join(part) if isinstance(part, list) else str(part) for part in parts)
+
+
+def iter_cases(data, engine):
+    """(キー, 結果を計算する関数) を列挙"""
+    channels = channel_options(data)
+    for section in KPI_SECTIONS:
+        if section not in data:
+            continue
+        plans = plan_options(data, section)
+        frames = {dt: data_manager.get_dataframe_from_store(data, section, dt) for dt in DATA_TYPES}
+        months = [col for col in frames['actual'].columns if col.endswith('月')] if frames['actual'] is not None else []
+
+        for data_type, df in frames.items():
+            for channel_filter in channels:
+                for plan_filter in plans:
+                    yield (_key('filter', section, data_type, channel_filter, plan_filter),
+                           lambda df=df, c=channel_filter, p=plan_filter: _filter_summary(engine.apply_filters(df, c, p)))
+
+        for month in months:
+            for period_type in PERIOD_TYPES:
+                for channel_filter in channels:
+                    for plan_filter in plans:
+                        yield (_key('kpi', section, month, period_type, channel_filter, plan_filter),
+                               lambda s=section, m=month, t=period_type, c=channel_filter, p=plan_filter:
+                               engine.calculate_kpi_values(data, s, m, 'plan_ratio', t, c, p))
+
+        if section not in TREND_SECTIONS:
+            continue
+        for period_type in PERIOD_TYPES:
+            for channel_filter in channels:
+                for plan_filter in plans:
+                    yield (_key('trend', section, period_type, channel_filter, plan_filter),
+                           lambda s=section, t=period_type, c=channel_filter, p=plan_filter:
+                           engine.get_monthly_trend_data(data, s, 'plan_ratio', t, c, p))
+            # target_item 指定時（チャネル別・プラン別のスパークライン）
+            for channel_filter in channels[1:]:
+                for target in channel_filter:
+                    yield (_key('trend_target', section, period_type, target, None),
+                           lambda s=section, t=period_type, target=target:
+                           engine.get_monthly_trend_data(data, s, 'plan_ratio', t, None, None, target_item=target))
+            for plan_filter in plans[1:]:
+                yield (_key('trend_target', section, period_type, plan_filter[0], plan_filter),
+                       lambda s=section, t=period_type, p=plan_filter:
+                       engine.get_monthly_trend_data(data, s, 'plan_ratio', t, channels[-1], p, target_item=p[0]))
+
+    if 'indicators' in data:
+        for stage_name in STAGE_MAPPING:
+            yield (_key('trend_stage', 'indicators', stage_name),
+                   lambda stage_name=stage_name:
+                   engine.get_monthly_trend_data(data, 'indicators', 'plan_ratio', 'single', stage_name=stage_name))
+        yield from _cv_cases(data, engine)
+
+
+def _cv_cases(data, engine):
+    indicators = data_manager.get_dataframe_from_store(data, 'indicators', 'actual')
+    if indicators is None or indicators.empty:
+        return
+    month_cols = [col for col in indicators.columns if col.endswith('月')]
+    for channel in MAIN_CHANNELS:
+        rows = engine.apply_filters(indicators, [channel], None)
+        for cv_type, (from_plans, to_plans) in CV_TRANSITIONS.items():
+            from_data = rows[rows['plan'].isin(from_plans)]
+            to_data = rows[rows['plan'].isin(to_plans)]
+            yield (_key('cv_rate', channel, cv_type),
+                   lambda f=from_data, t=to_data, cv=cv_type, ch=channel:
+                   [engine.calculate_cv_rate_with_lag(f, t, month, cv, ch, month_cols) for month in month_cols])
+            yield (_key('cv_trend', channel, cv_type),
+                   lambda f=from_data, t=to_data, cv=cv_type, ch=channel:
+                   engine.calculate_cv_rate_trend_with_lag(f, t, cv, ch, month_cols))
+
+
+def compute_outputs(data, engine=None, stride=1):
+    """
+    全組み合わせの結果（キー → 正規化済みの値）
+
+    stride : 列挙順で stride 件ごとに1件だけ計算する（テスト用の間引き）
+    """
+    engine = engine or current_engine()
+    outputs = {}
+    for i, (key, compute) in enumerate(iter_cases(data, engine)):
+        if i % stride:
+            continue
+        try:
+            outputs[key] = _normalize(compute())
+        except Exception as e:
+            # 例外も現在の挙動として記録する
+            outputs[key] = {'error': type(e).__name__}
+    return outputs
+
+
+def _close(expected, actual, rel_tol, abs_tol):
+    if isinstance(expected, dict):
+        return isinstance(actual, dict) and expected.keys() == actual.keys() and all(
+            _close(expected[k], actual[k], rel_tol, abs_tol) for k in expected)
+    if isinstance(expected, list):
+        return isinstance(actual, list) and len(expected) == len(actual) and all(
+            _close(e, a, rel_tol, abs_tol) for e, a in zip(expected, actual))
+    if isinstance(expected, (int, float)) and not isinstance(expected, bool) \
+            and isinstance(actual, (int, float)) and not isinstance(actual, bool):
+        return math.isclose(expected, actual, rel_tol=rel_tol, abs_tol=abs_tol)
+    return expected == actual
+
+
+def compare_outputs(expected, actual, rel_tol=DEFAULT_REL_TOL, abs_tol=DEFAULT_ABS_TOL, partial=False):
+    """
+    記録との比較
+
+    partial : actual が間引いた結果の場合は True（記録にあって結果にないキーを不一致としない）
+
+    Returns:
+    --------
+    list : 不一致のキー（記録にないキー・記録にあって結果にないキーを含む）
+    """
+    mismatches = [key for key in expected if (key in actual or not partial)
+                  and (key not in actual or not _close(expected[key], actual[key], rel_tol, abs_tol))]
+    mismatches += [key for key in actual if key not in expected]
+    return mismatches
+
+
+def golden_path(name):
+    return os.path.join(GOLDEN_DIR, f'{name}.json.gz')
+
+
+def record(name, engine=None):
+    """現在の結果を記録"""
+    outputs = compute_outputs(load_workbook_data(name), engine)
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    # mtime を固定して、結果が同じなら同じファイルになるようにする
+    with open(golden_path(name), 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+        f.write(json.dumps(outputs, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8'))
+    return len(outputs)
+
+
+def check(name, engine=None, rel_tol=DEFAULT_REL_TOL, abs_tol=DEFAULT_ABS_TOL, stride=1, compact=False):
+    """記録と比較し、不一致のキーを返す（compact=True は列指向に変換したデータで計算）"""
+    with gzip.open(golden_path(name), 'rt', encoding='utf-8') as f:
+        expected = json.load(f)
+    data = load_workbook_data(name)
+    if compact:
+        data = compact_dataset(data)
+    # 記録時と同じく JSON を経由した値で比較する
+    outputs = compute_outputs(data, engine, stride)
+    actual = json.loads(json.dumps(outputs, ensure_ascii=False))
+    return compare_outputs(expected, actual, rel_tol, abs_tol, partial=stride > 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='集計結果のゴールデン出力の記録・検証')
+    parser.add_argument('--record', action='store_true', help='現在の結果を記録する')
+    parser.add_argument('--workbooks', nargs='+', choices=list(WORKBOOKS), default=list(WORKBOOKS), help='対象ワークブック')
+    parser.add_argument('--rel-tol', type=float, default=DEFAULT_REL_TOL, help='相対許容誤差')
+    parser.add_argument('--abs-tol', type=float, default=DEFAULT_ABS_TOL, help='絶対許容誤差')
+    parser.add_argument('--stride', type=int, default=1, help='N件ごとに1件だけ検証する')
+    parser.add_argument('--compact', action='store_true', help='列指向に変換したデータ（app_preload と同じ）で検証する')
+    args = parser.parse_args(argv)
+
+    failed = False
+    for name in args.workbooks:
+        if args.record:
+            print(f"{name}: {record(name)} 件を記録しました（{golden_path(name)}）")
+            continue
+        mismatches = check(name, rel_tol=args.rel_tol, abs_tol=args.abs_tol, stride=args.stride, compact=args.compact)
+        if mismatches:
+            failed = True
+            print(f"{name}: {len(mismatches)} 件の不一致")
+            for key in mismatches[:20]:
+                print(f"  {key}")
+        else:
+            print(f"{name}: 一致")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+コールバックエンドポイントの負荷試験
+複数の仮想セッションがページ読み込み・月の変更・フィルタ（カード）クリック・表示切り替え・タブ切り替えを行い、
+/_dash-update-component へブラウザと同じ形式のリクエストを送る。
+コールバック別のレイテンシ（p50/p95/p99）・エラー率と全体のスループットを集計する
+
+使い方:
+  gunicorn app:server --workers 3 --preload --bind 127.0.0.1:8050   # 別のターミナルで起動
+  python -m benchmarks.load_test --url http://127.0.0.1:8050 --sessions 20 --actions 30
+  python -m benchmarks.load_test --in-process --sessions 4          # サーバーを起動せずプロセス内で実行
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# レンダラーの再現はウォームアップと共用（FlaskClientTransport・UPDATE_PATH・output_label は他の計測からも参照）
+from utils.renderer_session import (  # noqa: E402,F401
+    TOGGLE_BUTTONS, UPDATE_PATH, FlaskClientTransport, RendererSession, load_dependencies, output_label,
+)
+
+# 操作の種類 → 選ばれる重み（表示切り替えは TOGGLE_BUTTONS のボタンを交互にクリック）
+ACTION_WEIGHTS = {
+    'month': 3,
+    'card': 3,
+    'cv_filter': 1,
+    'period': 1,
+    'data_type': 1,
+    'analysis': 1,
+    'tab': 2,
+}
+
+
+class HttpTransport:
+    """HTTP/1.1 の持続的接続でサーバーへ送信（セッションごとに1接続）"""
+
+    def __init__(self, base_url, timeout=60):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self._conn = cls(self.host, self.port, timeout=self.timeout)
+        return self._conn
+
+    def request(self, method, path, body=None):
+        """(ステータス, 応答本文) を返す"""
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, self.prefix + path, body=data, headers=headers)
+                response = conn.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, OSError):
+                # サーバー側で切断された持続的接続は1回だけ張り直す
+                conn.close()
+                self._conn = None
+                if attempt:
+                    raise
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class SimulatedSession(RendererSession):
+    """
+    重みに従って操作を選ぶ仮想セッション
+
+    records : (ラベル, 秒, ステータス, 応答バイト数) を追記するリスト
+    """
+
+    def __init__(self, transport, dependencies, rng, session_id, records, think_time=0.0):
+        super().__init__(transport, dependencies, session_id, records)
+        self.rng = rng
+        self.think_time = think_time
+
+    def _select(self, key, prop, options):
+        current = self.props.get((key, prop))
+        candidates = [o['value'] if isinstance(o, dict) else o for o in options or []]
+        candidates = [value for value in candidates if value != current]
+        if not candidates:
+            return False
+        self.select(key, prop, self.rng.choice(candidates))
+        return True
+
+    def available_actions(self):
+        actions = []
+        if self.props.get(('month-selector', 'options')):
+            actions.append('month')
+        if self.cards():
+            actions.append('card')
+        if self.props.get(('trend-cv-filter', 'options')):
+            actions.append('cv_filter')
+        for action, buttons in TOGGLE_BUTTONS.items():
+            if all(button in self.components for button in buttons):
+                actions.append(action)
+        return actions
+
+    def act(self):
+        """重みに従って操作を1つ選んで実行し、操作名を返す"""
+        actions = self.available_actions()
+        if not actions:
+            return None
+        action = self.rng.choices(actions, weights=[ACTION_WEIGHTS[a] for a in actions])[0]
+        if action == 'month':
+            self._select('month-selector', 'value', self.props[('month-selector', 'options')])
+        elif action == 'cv_filter':
+            self._select('trend-cv-filter', 'value', self.props[('trend-cv-filter', 'options')])
+        elif action == 'card':
+            self.click(self.rng.choice(self.cards()))
+        else:
+            first, second = TOGGLE_BUTTONS[action]
+            # 直前にクリックした方と逆のボタンを押す
+            clicks = self.props.get((first, 'n_clicks')) or 0, self.props.get((second, 'n_clicks')) or 0
+            self.click(first if clicks[0] <= clicks[1] else second)
+        return action
+
+    def run(self, actions):
+        self.load_page()
+        for _ in range(actions):
+            if self.think_time:
+                time.sleep(self.rng.expovariate(1 / self.think_time))
+            self.act()
+        self.transport.close()
+
+
+def percentile(sorted_values, q):
+    """最近順位法によるパーセンタイル"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(records, elapsed):
+    """記録をコールバック別に集計"""
+    by_label = {}
+    for label, seconds, status, size in records:
+        by_label.setdefault(label, []).append((seconds, status, size))
+
+    callbacks = {}
+    for label, rows in sorted(by_label.items()):
+        latencies = sorted(seconds * 1000 for seconds, _, _ in rows)
+        errors = sum(1 for _, status, _ in rows if status == 0 or status >= 400)
+        callbacks[label] = {
+            'count': len(rows),
+            'errors': errors,
+            'error_rate': round(errors / len(rows), 4),
+            'not_modified': sum(1 for _, status, _ in rows if status == 204),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'mean_ms': round(statistics.fmean(latencies), 2),
+            'mean_bytes': round(statistics.fmean(size for _, _, size in rows)),
+        }
+    total = len(records)
+    errors = sum(row['errors'] for row in callbacks.values())
+    latencies = sorted(seconds * 1000 for _, seconds, _, _ in records)
+    return {
+        'requests': total,
+        'errors': errors,
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(total / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'callbacks': callbacks,
+    }
+
+
+def run_load_test(transport_factory, sessions=10, actions=20, think_time=0.0, seed=0):
+    """
+    負荷試験を実行
+
+    transport_factory : セッションごとの送信オブジェクトを返す関数
+    """
+    setup = transport_factory()
+    dependencies = load_dependencies(setup)
+    # 初回のシリアライズ時の遅延インポートなどを計測前に済ませる
+    setup.request('GET', '/_dash-layout')
+    setup.close()
+
+    records = []
+    lock = threading.Lock()
+
+    def run_session(index):
+        local = []
+        session = SimulatedSession(transport_factory(), dependencies, random.Random(f'{seed}-{index}'),
+                                   f'load-{seed}-{index}', local, think_time)
+        session.run(actions)
+        with lock:
+            records.extend(local)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        for future in [pool.submit(run_session, i) for i in range(sessions)]:
+            future.result()
+    return summarize(records, time.perf_counter() - start)
+
+
+def print_report(report):
+    print(f"リクエスト {report['requests']} 件  エラー {report['errors']} 件（{report['error_rate'] * 100:.2f}%）"
+          f"  {report['elapsed_s']:.1f} 秒  {report['throughput_rps']:.1f} req/s"
+          f"  p50 {report['p50_ms']:.1f} / p95 {report['p95_ms']:.1f} / p99 {report['p99_ms']:.1f} ms\n")
+    print(f"{'コールバック':<58}{'件数':>6}{'エラー':>7}{'204':>6}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for label, row in report['callbacks'].items():
+        print(f"{label[:58]:<58}{row['count']:>6}{row['error_rate'] * 100:>6.1f}%{row['not_modified']:>6}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='コールバックエンドポイントの負荷試験')
+    parser.add_argument('--url', default='http://127.0.0.1:8050', help='対象サーバー')
+    parser.add_argument('--in-process', action='store_true', help='サーバーを起動せずプロセス内のアプリに送る')
+    parser.add_argument('--sessions', type=int, default=10, help='同時セッション数')
+    parser.add_argument('--actions', type=int, default=20, help='セッションあたりの操作数（ページ読み込み後）')
+    parser.add_argument('--think-time', type=float, default=0.0, help='操作間の平均待ち時間（秒、指数分布）')
+    parser.add_argument('--seed', type=int, default=0, help='操作選択の乱数シード')
+    parser.add_argument('--output', help='結果JSONの保存先')
+    args = parser.parse_args(argv)
+
+    if args.in_process:
+        from main import app
+        factory = lambda: FlaskClientTransport(app.server)  # noqa: E731
+    else:
+        factory = lambda: HttpTransport(args.url)  # noqa: E731
+
+    report = run_load_test(factory, args.sessions, args.actions, args.think_time, args.seed)
+    report['meta'] = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'target': 'in-process' if args.in_process else args.url,
+        'sessions': args.sessions, 'actions': args.actions, 'think_time': args.think_time, 'seed': args.seed,
+    }
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n結果を保存しました: {args.output}")
+    return 1 if report['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""
+記録したセッションの再生
+utils/session_recorder.py が保存したコールバックリクエストを、記録時の間隔（または speed 倍速）で
+セッションごとの順序を保って再送し、ビルド間でコールバック別のレイテンシと応答のフィンガープリントを比較する
+
+使い方:
+  SFA_RECORD=1 gunicorn app:server --workers 3 --preload           # 記録（recordings/ に保存）
+  python -m benchmarks.replay_sessions recordings/ --url http://127.0.0.1:8050 --speed 10 --output replay.json
+  python -m benchmarks.replay_sessions recordings/ --in-process --speed 0 --baseline replay.json
+  （比較対象の既定は記録時の結果。--baseline で以前の再生結果と比較する）
+"""
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.load_test import FlaskClientTransport, HttpTransport, UPDATE_PATH, output_label, percentile  # noqa: E402
+from utils.output_fingerprint import SESSION_KEY  # noqa: E402
+
+
+def load_recordings(paths):
+    """記録ファイル（またはディレクトリ内の *.jsonl）をセッション → 時刻順のリクエスト一覧にまとめる"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.jsonl'))
+        else:
+            files.append(path)
+
+    sessions = {}
+    for path in files:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    sessions.setdefault(entry['session'], []).append(entry)
+    for entries in sessions.values():
+        entries.sort(key=lambda entry: entry['t'])
+    return sessions
+
+
+def replay_session(transport, entries, session_id, speed=1.0):
+    """
+    1セッション分のリクエストを再送
+
+    speed : 記録時の間隔に対する倍速（0 は待たずに連続で送る）
+    """
+    results = []
+    start = time.perf_counter()
+    for entry in entries:
+        if speed:
+            delay = entry['t'] / speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+        payload = dict(entry['payload'], **{SESSION_KEY: session_id})
+        sent = time.perf_counter()
+        try:
+            status, content = transport.request('POST', UPDATE_PATH, payload)
+        except OSError:
+            status, content = 0, b''
+        results.append({
+            'output': entry['output'],
+            't': round(sent - start, 4),
+            'status': status,
+            'duration_ms': round((time.perf_counter() - sent) * 1000, 2),
+            'fingerprint': hashlib.sha1(content).hexdigest() if content else None,
+        })
+    transport.close()
+    return results
+
+
+def replay(sessions, transport_factory, speed=1.0, concurrency=None):
+    """記録したセッションを並行して再生し、セッション → 結果一覧を返す"""
+    warmup = transport_factory()
+    # 初回のシリアライズ時の遅延インポートなどを計測前に済ませる
+    warmup.request('GET', '/_dash-layout')
+    warmup.close()
+
+    results = {}
+    lock = threading.Lock()
+    run_id = datetime.now().strftime('%H%M%S')
+
+    def run(session):
+        replayed = replay_session(transport_factory(), sessions[session], f'replay-{run_id}-{session}', speed)
+        with lock:
+            results[session] = replayed
+
+    with ThreadPoolExecutor(max_workers=concurrency or max(1, len(sessions))) as pool:
+        for future in [pool.submit(run, session) for session in sessions]:
+            future.result()
+    return results
+
+
+def _latencies(sessions):
+    by_label = {}
+    for entries in sessions.values():
+        for entry in entries:
+            by_label.setdefault(output_label(entry['output']), []).append(entry['duration_ms'])
+    return {label: sorted(values) for label, values in by_label.items()}
+
+
+def compare_sessions(baseline, current):
+    """
+    2つの実行結果（記録時・再生時）の比較
+
+    Returns:
+    --------
+    dict : {'callbacks': {ラベル: レイテンシの比較}, 'mismatches': [応答が異なるリクエスト]}
+    """
+    callbacks = {}
+    base_latencies, current_latencies = _latencies(baseline), _latencies(current)
+    for label in sorted(set(base_latencies) | set(current_latencies)):
+        base, now = base_latencies.get(label, []), current_latencies.get(label, [])
+        row = {'count': len(now)}
+        for name, values in (('baseline', base), ('current', now)):
+            row[f'{name}_p50_ms'] = round(percentile(values, 50), 2)
+            row[f'{name}_p95_ms'] = round(percentile(values, 95), 2)
+        row['p50_ratio'] = round(row['current_p50_ms'] / row['baseline_p50_ms'], 3) if row['baseline_p50_ms'] else None
+        callbacks[label] = row
+
+    mismatches = []
+    for session, base_entries in baseline.items():
+        current_entries = current.get(session, [])
+        for index, base in enumerate(base_entries):
+            now = current_entries[index] if index < len(current_entries) else None
+            if now is None or now['status'] != base['status'] or now['fingerprint'] != base['fingerprint']:
+                mismatches.append({
+                    'session': session, 'index': index, 'output': output_label(base['output']),
+                    'baseline_status': base['status'], 'current_status': now['status'] if now else None,
+                })
+
+    requests = sum(len(entries) for entries in current.values())
+    durations = [entry['duration_ms'] for entries in current.values() for entry in entries]
+    return {
+        'requests': requests,
+        'mean_ms': round(statistics.fmean(durations), 2) if durations else 0.0,
+        'callbacks': callbacks,
+        'mismatches': mismatches,
+    }
+
+
+def print_comparison(comparison):
+    print(f"{'コールバック':<58}{'件数':>6}{'p50 基準':>10}{'p50 今回':>10}{'比':>7}{'p95 基準':>10}{'p95 今回':>10}")
+    for label, row in comparison['callbacks'].items():
+        ratio = f"{row['p50_ratio']:.2f}" if row['p50_ratio'] is not None else '-'
+        print(f"{label[:58]:<58}{row['count']:>6}{row['baseline_p50_ms']:>10.1f}{row['current_p50_ms']:>10.1f}"
+              f"{ratio:>7}{row['baseline_p95_ms']:>10.1f}{row['current_p95_ms']:>10.1f}")
+    mismatches = comparison['mismatches']
+    print(f"\nリクエスト {comparison['requests']} 件  応答の不一致 {len(mismatches)} 件")
+    for mismatch in mismatches[:20]:
+        print(f"  {mismatch['session']} #{mismatch['index']} {mismatch['output']}"
+              f" ({mismatch['baseline_status']} → {mismatch['current_status']})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='記録したセッションの再生とビルド間の比較')
+    parser.add_argument('recordings', nargs='+', help='記録ファイルまたはディレクトリ')
+    parser.add_argument('--url', default='http://127.0.0.1:8050', help='対象サーバー')
+    parser.add_argument('--in-process', action='store_true', help='サーバーを起動せずプロセス内のアプリに送る')
+    parser.add_argument('--speed', type=float, default=1.0, help='記録時の間隔に対する倍速（0 は待たない）')
+    parser.add_argument('--concurrency', type=int, help='同時に再生するセッション数（既定は全セッション）')
+    parser.add_argument('--baseline', help='比較する以前の再生結果JSON（省略時は記録時の結果と比較）')
+    parser.add_argument('--output', help='再生結果JSONの保存先')
+    args = parser.parse_args(argv)
+
+    sessions = load_recordings(args.recordings)
+    if not sessions:
+        print('記録がありません')
+        return 1
+
+    if args.in_process:
+        from main import app
+        factory = lambda: FlaskClientTransport(app.server)  # noqa: E731
+    else:
+        factory = lambda: HttpTransport(args.url)  # noqa: E731
+
+    results = replay(sessions, factory, args.speed, args.concurrency)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['sessions']
+    else:
+        baseline = sessions
+    comparison = compare_sessions(baseline, results)
+    print_comparison(comparison)
+
+    if args.output:
+        report = {
+            'meta': {'timestamp': datetime.now().isoformat(timespec='seconds'),
+                     'target': 'in-process' if args.in_process else args.url, 'speed': args.speed},
+            'comparison': comparison,
+            'sessions': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n結果を保存しました: {args.output}")
+    return 1 if comparison['mismatches'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,434 @@
+"""
+ベンチマークスイート
+取り込み・フィルタ・集計・CV率計算・グラフ生成の処理時間を複数のデータ規模で計測し、
+JSONで保存してベースラインと比較する
+
+使い方:
+  python -m benchmarks.run_benchmarks                        # 計測して benchmarks/results/ に保存
+  python -m benchmarks.run_benchmarks --source synthetic     # 合成ワークブック（規模 × 5 チャネル）で計測
+  python -m benchmarks.run_benchmarks --save-baseline        # 結果をベースラインとして保存
+  python -m benchmarks.run_benchmarks --baseline benchmarks/baseline.json --threshold 1.2 \
+      --threshold-for process_excel_data=1.5                 # ベースラインと比較（劣化時は終了コード1）
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from data_manager import (  # noqa: E402
+    process_excel_data, apply_filters, get_dataframe_from_store,
+    calculate_kpi_values, get_monthly_trend_data
+)
+from utils.cache_utils import filter_cache, derived_cache  # noqa: E402
+from utils.cv_rate_utils import calculate_cv_rate_with_lag, calculate_cv_rate_trend_with_lag  # noqa: E402
+from components import charts  # noqa: E402
+from benchmarks.synthetic_workbook import BASE_CHANNELS, generate_workbook, to_upload_contents  # noqa: E402
+
+SAMPLE_WORKBOOK = os.path.join(ROOT, 'pdca_2025.xlsx')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+DEFAULT_SCALES = (1, 4, 16)
+DEFAULT_THRESHOLD = 1.25     # 中央値がベースラインの何倍を超えたら劣化とみなすか
+DEFAULT_MIN_DELTA_MS = 0.05  # これ未満の差は誤差として無視
+
+SECTIONS = ('sales', 'acquisition', 'unit_price', 'retention', 'indicators')
+CHANNEL_FILTERS = (None, ['新規web'], ['既存', 'フロー'], ['新規web', '新規法人', '新規代理店'])
+MONTHS = [f'{m}月' for m in range(1, 13)]
+
+# 名前 → (ケース作成関数, 対象規模（None は全規模）)
+BENCHMARKS = {}
+
+
+def benchmark(name, scales=None):
+    """ベンチマークを登録するデコレータ（関数は規模別データから計測対象の呼び出しを作る）"""
+    def decorator(setup):
+        BENCHMARKS[name] = (setup, scales)
+        return setup
+    return decorator
+
+
+def clear_caches():
+    """キャッシュを破棄（キャッシュなしの処理時間を計測するため）"""
+    filter_cache.clear()
+    derived_cache.clear()
+
+
+def load_sample_contents():
+    """サンプルExcelを dcc.Upload と同じ形式で読み込む"""
+    with open(SAMPLE_WORKBOOK, 'rb') as f:
+        encoded = base64.b64encode(f.read()).decode('utf-8')
+    return f"data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{encoded}"
+
+
+def scale_dataset(data, factor):
+    """見出し行・合計行を除く明細行を factor 倍に複製したデータ"""
+    if factor == 1:
+        return data
+    scaled = {}
+    for section, section_data in data.items():
+        scaled[section] = {}
+        for data_type, records in section_data.items():
+            head = records[:1]
+            tail = [r for r in records[1:] if r.get('channel') == '合計']
+            body = [r for r in records[1:] if r.get('channel') != '合計']
+            scaled[section][data_type] = head + [dict(r) for _ in range(factor) for r in body] + tail
+    return scaled
+
+
+class Context:
+    """
+    規模別の入力データ
+
+    contents : 取り込み対象のワークブック（None の場合は取り込みを計測しない）
+    structure : ワークブックの構成（省略時は EXCEL_STRUCTURE）
+    """
+
+    def __init__(self, contents, data, scale, structure=None):
+        self.contents = contents
+        self.structure = structure
+        self.scale = scale
+        self.data = data
+        self.frames = {
+            (section, data_type): get_dataframe_from_store(self.data, section, data_type)
+            for section in SECTIONS for data_type in ('actual', 'budget')
+            if section in self.data
+        }
+
+
+# --- 取り込み ---------------------------------------------------------------
+
+@benchmark('process_excel_data')
+def bench_process_excel_data(ctx):
+    if ctx.contents is None:
+        return None
+    return lambda: process_excel_data(ctx.contents, ctx.structure)
+
+
+# --- フィルタ ---------------------------------------------------------------
+
+@benchmark('apply_filters')
+def bench_apply_filters(ctx):
+    def run():
+        clear_caches()
+        for (section, data_type), df in ctx.frames.items():
+            for channel_filter in CHANNEL_FILTERS:
+                apply_filters(df, channel_filter, None)
+    return run
+
+
+@benchmark('apply_filters_cached')
+def bench_apply_filters_cached(ctx):
+    def run():
+        for df in ctx.frames.values():
+            for channel_filter in CHANNEL_FILTERS:
+                apply_filters(df, channel_filter, None)
+    run()
+    return run
+
+
+# --- 集計 -------------------------------------------------------------------
+
+@benchmark('calculate_kpi_values')
+def bench_calculate_kpi_values(ctx):
+    def run():
+        clear_caches()
+        for section in ('sales', 'acquisition', 'unit_price'):
+            for period_type in ('single', 'cumulative'):
+                for channel_filter in CHANNEL_FILTERS:
+                    calculate_kpi_values(ctx.data, section, '6月', 'plan_ratio', period_type, channel_filter, None)
+    return run
+
+
+@benchmark('get_monthly_trend_data')
+def bench_get_monthly_trend_data(ctx):
+    def run():
+        clear_caches()
+        for section in ('sales', 'acquisition'):
+            for period_type in ('single', 'cumulative'):
+                get_monthly_trend_data(ctx.data, section, 'plan_ratio', period_type)
+                get_monthly_trend_data(ctx.data, section, 'plan_ratio', period_type, target_item='新規web')
+                get_monthly_trend_data(ctx.data, section, 'plan_ratio', period_type, plan_filter=['アプリ'], target_item='アプリ')
+        for stage_name in ('新規リード数', '商談ステージ', '新規アプリ獲得数（単月）'):
+            get_monthly_trend_data(ctx.data, 'indicators', 'plan_ratio', 'single', stage_name=stage_name)
+    return run
+
+
+# --- CV率 -------------------------------------------------------------------
+
+@benchmark('cv_rate')
+def bench_cv_rate(ctx):
+    df = ctx.frames[('indicators', 'actual')]
+    pairs = []
+    for channel, excel_channel in (('新規web', '新規（WEB）'), ('新規法人', '新規（法人）'), ('新規代理店', '新規（代理店）')):
+        rows = df[df['channel'] == excel_channel]
+        pairs.append((channel, rows[rows['plan'] == '商談ステージ'], rows[rows['plan'] == '具体検討ステージ']))
+    month_cols = [col for col in df.columns if col.endswith('月')]
+
+    def run():
+        for channel, from_data, to_data in pairs:
+            for month in month_cols:
+                calculate_cv_rate_with_lag(from_data, to_data, month, 'to具体検討', channel, month_cols)
+            calculate_cv_rate_trend_with_lag(from_data, to_data, 'to具体検討', channel, month_cols)
+    return run
+
+
+# --- グラフ生成 ---------------------------------------------------------------
+
+def _series(n, start=100):
+    return [start + (i * 37) % 91 for i in range(n)]
+
+
+@benchmark('chart.create_trend_chart', scales=(1,))
+def bench_trend_chart(ctx):
+    budget, actual = _series(12, 120), _series(12, 100)
+    rates = [a / b * 100 for a, b in zip(actual, budget)]
+    return lambda: charts.create_trend_chart(MONTHS, budget, actual, MONTHS[:6], rates, '6月', 'currency', None, 'plan_ratio')
+
+
+@benchmark('chart.create_funnel_chart', scales=(1,))
+def bench_funnel_chart(ctx):
+    stages = ['リード・アプローチ', '商談', '具体検討', '内諾', '獲得']
+    return lambda: charts.create_funnel_chart(stages, [500, 200, 80, 40, 20], [600, 250, 100, 50, 25], [83, 80, 80, 80, 80])
+
+
+@benchmark('chart.create_dual_sparkline', scales=(1,))
+def bench_dual_sparkline(ctx):
+    return lambda: charts.create_dual_sparkline(_series(12, 100), _series(12, 120), 85.0, height=42, actual_months=MONTHS[:6])
+
+
+@benchmark('chart.create_sparkline', scales=(1,))
+def bench_sparkline(ctx):
+    return lambda: charts.create_sparkline(_series(12))
+
+
+@benchmark('chart.create_mini_bar_chart', scales=(1,))
+def bench_mini_bar_chart(ctx):
+    return lambda: charts.create_mini_bar_chart(_series(12))
+
+
+@benchmark('chart.create_horizontal_bar_chart')
+def bench_horizontal_bar_chart(ctx):
+    n = 5 * ctx.scale
+    return lambda: charts.create_horizontal_bar_chart([f'プラン{i}' for i in range(n)], _series(n, 50))
+
+
+@benchmark('chart.create_comparison_chart')
+def bench_comparison_chart(ctx):
+    n = 5 * ctx.scale
+    return lambda: charts.create_comparison_chart([f'チャネル{i}' for i in range(n)], _series(n, 100), _series(n, 120))
+
+
+@benchmark('chart.create_stacked_bar_chart')
+def bench_stacked_bar_chart(ctx):
+    n = 6 * ctx.scale
+    data_dict = {
+        'actual': {f'チャネル{i}': v for i, v in enumerate(_series(n, 100))},
+        'budget': {f'チャネル{i}': v for i, v in enumerate(_series(n, 120))},
+    }
+    return lambda: charts.create_stacked_bar_chart(['6月'], data_dict, '6月', horizontal=True, comparison_mode=True)
+
+
+# --- 計測・比較 ---------------------------------------------------------------
+
+def measure(func, repeat=5, min_time=0.05):
+    """1回あたりの処理時間（ms）を repeat 回計測"""
+    func()  # ウォームアップ
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 10000:
+            break
+        number *= 2
+
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+
+    samples_ms = [s * 1000 for s in samples]
+    return {
+        'median_ms': round(statistics.median(samples_ms), 4),
+        'min_ms': round(min(samples_ms), 4),
+        'mean_ms': round(statistics.fmean(samples_ms), 4),
+        'stdev_ms': round(statistics.stdev(samples_ms), 4) if len(samples_ms) > 1 else 0.0,
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _metadata():
+    import dash
+    import numpy
+    import pandas
+    import plotly
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'versions': {'pandas': pandas.__version__, 'numpy': numpy.__version__,
+                     'dash': dash.__version__, 'plotly': plotly.__version__},
+    }
+
+
+def sample_contexts(scales):
+    """サンプルExcelの明細行を複製した規模別データ（取り込みは規模1のみ計測）"""
+    contents = load_sample_contents()
+    base_data, message = process_excel_data(contents)
+    if base_data is None:
+        raise RuntimeError(message)
+    return {scale: Context(contents if scale == 1 else None, scale_dataset(base_data, scale), scale) for scale in scales}
+
+
+def synthetic_contexts(scales, seed=0):
+    """合成ワークブックによる規模別データ（規模 × 5 チャネル）"""
+    contexts = {}
+    for scale in scales:
+        content, structure = generate_workbook(channels=len(BASE_CHANNELS) * scale, seed=seed)
+        contents = to_upload_contents(content)
+        data, message = process_excel_data(contents, structure)
+        if data is None:
+            raise RuntimeError(message)
+        contexts[scale] = Context(contents, data, scale, structure)
+    return contexts
+
+
+def run_benchmarks(scales=DEFAULT_SCALES, repeat=5, name_filter=None, contexts=None, log=print):
+    """
+    ベンチマークを実行
+
+    contexts : 規模 → Context（省略時はサンプルExcelを複製して作成）
+    """
+    if contexts is None:
+        contexts = sample_contexts(scales)
+
+    results = {}
+    for name, (setup, bench_scales) in BENCHMARKS.items():
+        if name_filter and not any(token in name for token in name_filter):
+            continue
+        for scale, ctx in contexts.items():
+            if bench_scales is not None and scale not in bench_scales:
+                continue
+            func = setup(ctx)
+            if func is None:
+                continue
+            stats = measure(func, repeat=repeat)
+            results.setdefault(name, {})[str(scale)] = stats
+            log(f"{name:<36} x{scale:<4} {stats['median_ms']:>10.3f} ms")
+    clear_caches()
+    return {'meta': _metadata(), 'results': results}
+
+
+def compare_results(current, baseline, threshold=DEFAULT_THRESHOLD, thresholds=None, min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """
+    ベースラインとの比較
+
+    Returns:
+    --------
+    list : [{'name', 'scale', 'baseline_ms', 'current_ms', 'ratio', 'threshold', 'status'}, ...]
+           status は 'regression' / 'improvement' / 'ok'
+    """
+    thresholds = thresholds or {}
+    rows = []
+    for name, scales in current['results'].items():
+        for scale, stats in scales.items():
+            base = baseline.get('results', {}).get(name, {}).get(scale)
+            if not base:
+                continue
+            base_ms, current_ms = base['median_ms'], stats['median_ms']
+            limit = thresholds.get(name, threshold)
+            ratio = current_ms / base_ms if base_ms else float('inf')
+            status = 'ok'
+            if abs(current_ms - base_ms) >= min_delta_ms:
+                if ratio > limit:
+                    status = 'regression'
+                elif ratio < 1 / limit:
+                    status = 'improvement'
+            rows.append({'name': name, 'scale': scale, 'baseline_ms': base_ms, 'current_ms': current_ms,
+                         'ratio': round(ratio, 3), 'threshold': limit, 'status': status})
+    return rows
+
+
+def _parse_thresholds(values):
+    thresholds = {}
+    for value in values or []:
+        name, _, ratio = value.partition('=')
+        thresholds[name] = float(ratio)
+    return thresholds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='SFA/CRM Dashboard ベンチマーク')
+    parser.add_argument('--scales', type=int, nargs='+', default=list(DEFAULT_SCALES), help='データ規模（明細行の倍率）')
+    parser.add_argument('--source', choices=('sample', 'synthetic'), default='sample',
+                        help='入力データ（sample: サンプルExcelの複製、synthetic: 合成ワークブック）')
+    parser.add_argument('--seed', type=int, default=0, help='合成ワークブックの乱数シード')
+    parser.add_argument('--repeat', type=int, default=5, help='計測回数')
+    parser.add_argument('--filter', nargs='+', help='名前に含まれる文字列で対象を絞り込む')
+    parser.add_argument('--output', help='結果JSONの保存先（省略時は benchmarks/results/ に日時付きで保存）')
+    parser.add_argument('--baseline', help='比較するベースラインJSON')
+    parser.add_argument('--save-baseline', action='store_true', help=f'結果をベースライン（{os.path.relpath(DEFAULT_BASELINE, ROOT)}）として保存')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='劣化とみなす倍率（既定 1.25）')
+    parser.add_argument('--threshold-for', action='append', metavar='NAME=RATIO', help='ベンチマーク別の倍率')
+    parser.add_argument('--min-delta-ms', type=float, default=DEFAULT_MIN_DELTA_MS, help='誤差として無視する差（ms）')
+    args = parser.parse_args(argv)
+
+    contexts = synthetic_contexts(args.scales, args.seed) if args.source == 'synthetic' else None
+    report = run_benchmarks(scales=args.scales, repeat=args.repeat, name_filter=args.filter, contexts=contexts)
+    report['meta']['source'] = args.source
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n結果を保存しました: {output}")
+
+    if args.save_baseline:
+        with open(DEFAULT_BASELINE, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"ベースラインを保存しました: {DEFAULT_BASELINE}")
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    rows = compare_results(report, baseline, args.threshold, _parse_thresholds(args.threshold_for), args.min_delta_ms)
+    print(f"\nベースライン比較（{args.baseline}）")
+    for row in rows:
+        mark = {'regression': '▲劣化', 'improvement': '▽改善', 'ok': ''}[row['status']]
+        print(f"{row['name']:<36} x{row['scale']:<4} {row['baseline_ms']:>10.3f} → {row['current_ms']:>10.3f} ms"
+              f"  ({row['ratio']:.2f}x, 閾値 {row['threshold']:.2f}x) {mark}")
+    regressions = [row for row in rows if row['status'] == 'regression']
+    if regressions:
+        print(f"\n{len(regressions)} 件の劣化があります")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
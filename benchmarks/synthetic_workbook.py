@@ -0,0 +1,293 @@
+"""
+合成PDCAワークブックの生成
+EXCEL_STRUCTURE と同じ列構成（計画差・計画比・実績・予算）で、チャネル数・チャネルあたりのプラン数・
+実績月数・充填率を指定してワークブックを作る。追加セクションを持つ拡張レイアウトにも対応し、
+同じシードからは同じデータを生成する（ベンチマーク・負荷試験用）
+
+使い方:
+  python -m benchmarks.synthetic_workbook --channels 200 --plans 6 --months 9 --fill 0.8 \
+      --extra-sections 2 --seed 1 --output synthetic.xlsx
+  （行範囲が EXCEL_STRUCTURE と異なるため、構成を synthetic.structure.json に保存する）
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import random
+import sys
+from datetime import datetime
+
+from openpyxl import Workbook
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from config import EXCEL_STRUCTURE  # noqa: E402
+
+# 実データと同じ名前を先頭に使い、不足分は連番で補う
+BASE_CHANNELS = ['新規（WEB）', '新規（法人）', '新規（代理店）', 'クロスセル', '既存（25年以前）']
+BASE_PLANS = ['アプリ', 'スタンド（宅急便）', 'スタンド（ＦＳ）', 'スタンド（社外）']
+INDICATOR_STAGES = ['新規リード数', '商談ステージ', '具体検討ステージ', '内諾ステージ',
+                    '新規アプリ獲得数（単月）', '新規アプリ獲得数（累月）']
+
+SECTION_LABELS = {
+    'sales': '売上高',
+    'acquisition': '獲得件数（累月）',
+    'unit_price': '客単価',
+    'retention': '継続率',
+    'indicators': '指標',
+}
+
+HEADER_ROW = 4      # 先頭セクションの見出し行（パーサーは各列範囲の4行目から月を読む）
+SECTION_GAP = 2     # セクション間の空行数
+MONTH_COUNT = 12
+# ファイル内のタイムスタンプを固定して、同じ入力から同じバイト列を得る
+FIXED_TIMESTAMP = datetime(2025, 1, 1)
+
+
+def channel_names(count):
+    """チャネル名の一覧"""
+    return BASE_CHANNELS[:count] + [f'チャネル{i:03d}' for i in range(len(BASE_CHANNELS) + 1, count + 1)]
+
+
+def plan_names(count):
+    """プラン名の一覧"""
+    return BASE_PLANS[:count] + [f'プラン{i:02d}' for i in range(len(BASE_PLANS) + 1, count + 1)]
+
+
+def _section_rows(section, channels, plans):
+    """セクション内の行（チャネル, プラン, 行の種類）。先頭は見出し行"""
+    rows = [(SECTION_LABELS.get(section, section), None, 'header')]
+    if section == 'retention':
+        # 継続率はチャネル名を持たないプラン別の行のみ
+        rows += [(None, plan, 'detail') for plan in plans]
+    elif section == 'indicators':
+        for channel in channels:
+            for stage in INDICATOR_STAGES:
+                if channel == 'クロスセル' and stage == '新規リード数':
+                    stage = 'アプローチ数'
+                rows.append((channel, stage, 'stage'))
+    else:
+        for channel in channels:
+            rows += [(channel, plan, 'detail') for plan in plans]
+            if section in ('sales', 'acquisition', 'unit_price'):
+                rows.append((channel, '計', 'subtotal'))
+        if section == 'sales':
+            rows.append(('合計', None, 'total'))
+    return rows
+
+
+def build_structure(channels, plans_per_channel, extra_sections=0):
+    """生成するワークブックの構成（EXCEL_STRUCTURE と同じ形式）"""
+    channel_list, plan_list = channel_names(channels), plan_names(plans_per_channel)
+    sections = {}
+    row = HEADER_ROW
+    for section in list(SECTION_LABELS) + [f'extra_{i}' for i in range(1, extra_sections + 1)]:
+        count = len(_section_rows(section, channel_list, plan_list))
+        sections[section] = (row, row + count - 1)
+        row += count + SECTION_GAP
+    return {
+        'sheet_name': EXCEL_STRUCTURE['sheet_name'],
+        'sections': sections,
+        'col_ranges': dict(EXCEL_STRUCTURE['col_ranges']),
+    }
+
+
+def _monthly_values(section, rng, index):
+    """予算の月別値（12か月）"""
+    if section == 'sales':
+        base = rng.uniform(50, 3000)
+        return [round(base * rng.uniform(0.8, 1.2), 3) for _ in range(MONTH_COUNT)]
+    if section == 'acquisition':
+        total, values = 0, []
+        for _ in range(MONTH_COUNT):
+            total += rng.randint(0, 30)
+            values.append(total)
+        return values
+    if section == 'unit_price':
+        return [round(rng.uniform(10, 500), 3)] * MONTH_COUNT
+    if section == 'retention':
+        return [round(rng.uniform(0.8, 1.0), 3)] * MONTH_COUNT
+    if section == 'indicators':
+        # ファネルの下流ほど件数を少なくする
+        base = rng.randint(50, 500) * (0.5 ** index)
+        return [round(base * rng.uniform(0.7, 1.3)) for _ in range(MONTH_COUNT)]
+    return [round(rng.uniform(0, 1000), 3) for _ in range(MONTH_COUNT)]
+
+
+def _actual_values(section, rng, budget, months):
+    """実績の月別値（months か月目まで）"""
+    values = []
+    for i, planned in enumerate(budget):
+        if i >= months:
+            values.append(None)
+        elif section in ('unit_price', 'retention'):
+            values.append(round(planned * rng.uniform(0.9, 1.1), 3))
+        elif section in ('acquisition', 'indicators'):
+            values.append(round(planned * rng.uniform(0.7, 1.2)))
+        else:
+            values.append(round(planned * rng.uniform(0.6, 1.3), 3))
+    if section == 'acquisition':
+        # 累月値は単調増加に揃える
+        for i in range(1, len(values)):
+            if values[i] is not None and values[i - 1] is not None:
+                values[i] = max(values[i], values[i - 1])
+    return values
+
+
+def _drop_cells(values, rng, fill_ratio):
+    """充填率に応じて空セルを作る"""
+    return [v if v is None or rng.random() < fill_ratio else None for v in values]
+
+
+def _sum_rows(rows):
+    return [sum(row[i] or 0 for row in rows) for i in range(MONTH_COUNT)]
+
+
+def _row_total(section, values):
+    """合計列の値"""
+    filled = [v for v in values if v is not None]
+    if not filled:
+        return None
+    # 累月の件数は最終月の値が合計
+    return filled[-1] if section == 'acquisition' else sum(filled)
+
+
+def _generate_values(section, rows, rng, months, fill_ratio):
+    """行ごとの実績・予算（見出し行は None）"""
+    values, block, blocks = [], [], []
+    for channel, plan, kind in rows:
+        if kind == 'header':
+            values.append(None)
+        elif kind in ('detail', 'stage'):
+            index = INDICATOR_STAGES.index(plan) if plan in INDICATOR_STAGES else 0
+            budget = _monthly_values(section, rng, index)
+            actual = _actual_values(section, rng, budget, months)
+            pair = (_drop_cells(actual, rng, fill_ratio), _drop_cells(budget, rng, fill_ratio))
+            values.append(pair)
+            block.append(pair)
+        elif kind == 'subtotal':
+            if section == 'unit_price':
+                pair = ([None] * MONTH_COUNT, [None] * MONTH_COUNT)
+            else:
+                actual = [v if i < months else None for i, v in enumerate(_sum_rows([p[0] for p in block]))]
+                pair = (actual, _sum_rows([p[1] for p in block]))
+            values.append(pair)
+            blocks.append(pair)
+            block = []
+        else:  # total
+            actual = [v if i < months else None for i, v in enumerate(_sum_rows([p[0] for p in blocks]))]
+            values.append((actual, _sum_rows([p[1] for p in blocks])))
+    return values
+
+
+def _write_range(ws, row, start_col, end_col, values, total=None):
+    """列範囲に月別値（と合計）を書き込む"""
+    for slot, col in enumerate(range(start_col, end_col + 1)):
+        value = values[slot] if slot < MONTH_COUNT else total if slot == MONTH_COUNT else None
+        if value is not None:
+            ws.cell(row=row, column=col + 1, value=value)
+
+
+def _write_header(ws, row, label, col_ranges):
+    ws.cell(row=row, column=1, value=label)
+    for start_col, end_col in col_ranges.values():
+        for slot, col in enumerate(range(start_col, end_col + 1)):
+            ws.cell(row=row, column=col + 1, value=slot + 1 if slot < MONTH_COUNT else '合計')
+
+
+def generate_workbook(channels=len(BASE_CHANNELS), plans_per_channel=len(BASE_PLANS), months=6,
+                      fill_ratio=1.0, extra_sections=0, seed=0):
+    """
+    合成ワークブックを生成
+
+    Parameters:
+    -----------
+    channels : チャネル数
+    plans_per_channel : チャネルあたりのプラン数
+    months : 実績がある月数（予算は常に12か月分）
+    fill_ratio : 明細セルのうち値を入れる割合（0〜1）
+    extra_sections : 末尾に追加するセクション数（拡張レイアウト）
+    seed : 乱数シード
+
+    Returns:
+    --------
+    tuple : (xlsx のバイト列, process_excel_data に渡す構成)
+    """
+    if channels < 1 or plans_per_channel < 1:
+        raise ValueError('チャネル数・プラン数は1以上を指定してください')
+    if not 0 <= months <= MONTH_COUNT:
+        raise ValueError('実績月数は0〜12で指定してください')
+    if not 0 <= fill_ratio <= 1:
+        raise ValueError('充填率は0〜1で指定してください')
+
+    rng = random.Random(seed)
+    structure = build_structure(channels, plans_per_channel, extra_sections)
+    channel_list, plan_list = channel_names(channels), plan_names(plans_per_channel)
+    col_ranges = structure['col_ranges']
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = structure['sheet_name']
+    for data_type in col_ranges:
+        ws.cell(row=1, column=col_ranges[data_type][0] + 1, value=data_type)
+
+    for section, (start_row, _) in structure['sections'].items():
+        rows = _section_rows(section, channel_list, plan_list)
+        values = _generate_values(section, rows, rng, months, fill_ratio)
+        for offset, ((channel, plan, kind), pair) in enumerate(zip(rows, values)):
+            row = start_row + offset
+            if kind == 'header':
+                _write_header(ws, row, channel, col_ranges)
+                continue
+            ws.cell(row=row, column=1, value=channel)
+            ws.cell(row=row, column=2, value=plan)
+            actual, budget = pair
+            plan_diff = [a - b if a is not None and b is not None else None for a, b in zip(actual, budget)]
+            plan_ratio = [round(a / b, 4) if a is not None and b else None for a, b in zip(actual, budget)]
+            for data_type, series in (('plan_diff', plan_diff), ('plan_ratio', plan_ratio),
+                                      ('actual', actual), ('budget', budget)):
+                if data_type in col_ranges:
+                    start_col, end_col = col_ranges[data_type]
+                    _write_range(ws, row, start_col, end_col, series, _row_total(section, series))
+
+    wb.properties.created = FIXED_TIMESTAMP
+    wb.properties.modified = FIXED_TIMESTAMP
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue(), structure
+
+
+def to_upload_contents(content):
+    """dcc.Upload と同じ data URL 形式に変換"""
+    encoded = base64.b64encode(content).decode('utf-8')
+    return f"data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{encoded}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='合成PDCAワークブックの生成')
+    parser.add_argument('--channels', type=int, default=len(BASE_CHANNELS), help='チャネル数')
+    parser.add_argument('--plans', type=int, default=len(BASE_PLANS), help='チャネルあたりのプラン数')
+    parser.add_argument('--months', type=int, default=6, help='実績がある月数')
+    parser.add_argument('--fill', type=float, default=1.0, help='明細セルの充填率（0〜1）')
+    parser.add_argument('--extra-sections', type=int, default=0, help='追加セクション数')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+    parser.add_argument('--output', default='synthetic.xlsx', help='保存先')
+    args = parser.parse_args(argv)
+
+    content, structure = generate_workbook(args.channels, args.plans, args.months, args.fill,
+                                           args.extra_sections, args.seed)
+    with open(args.output, 'wb') as f:
+        f.write(content)
+    structure_path = os.path.splitext(args.output)[0] + '.structure.json'
+    with open(structure_path, 'w', encoding='utf-8') as f:
+        json.dump(structure, f, ensure_ascii=False, indent=2)
+    rows = max(end for _, end in structure['sections'].values())
+    print(f"{args.output} を作成しました（{rows} 行、構成: {structure_path}）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -66,6 +66,7 @@ pyinstaller ^
   --onefile ^
   --console ^
   --add-data "assets;assets" ^
+  --add-data "vendor;vendor" ^
   --add-data "components;components" ^
   --add-data "layouts;layouts" ^
   --add-data "callbacks;callbacks" ^
@@ -17,6 +17,7 @@ a = Analysis(
     binaries=[],
     datas=[
         ('assets', 'assets'),
+        ('vendor', 'vendor'),
         ('components', 'components'),
         ('layouts', 'layouts'),
         ('callbacks', 'callbacks'),
@@ -8,9 +8,12 @@ import logging
 logger = logging.getLogger(__name__)
 from data_manager import (
     data_manager, get_dataframe_from_store, apply_filters,
-    format_number, clean_channel_names
+    format_number
 )
 from utils.cv_rate_utils import calculate_cv_rate_with_lag, get_cv_type_from_stage_transition, calculate_cv_rate_trend_with_lag
+from utils.section_cache import depends_on_sections
+from utils.background import callback_options, report_progress
+from utils.output_fingerprint import skip_unchanged_outputs
 from components.cards import (
     create_metric_card, create_channel_funnel, create_insight_card,
     create_trend_item, get_performance_color
@@ -57,6 +60,8 @@ def register_tab1_callbacks(app):
          Input('plan-filter', 'value'),
          Input('channel-filter-tab1', 'value')]
     )
+    @skip_unchanged_outputs
+    @depends_on_sections('indicators')
     def update_funnel_metrics(selected_month, plan_ratio_class, 
                             channel_filter, plan_filter, channel_filter_tab1):
         data = data_manager.get_data()
@@ -273,8 +278,12 @@ def register_tab1_callbacks(app):
         [Input('month-selector', 'value'),
          Input('channel-filter', 'value'),
          Input('plan-filter', 'value'),
-         Input('channel-filter-tab1', 'value')]
+         Input('channel-filter-tab1', 'value')],
+        # SFA_BACKGROUND=1 の場合はプロセスプールで計算（進捗表示・入力変更時の取り消し付き）
+        **callback_options('funnel-grid-progress')
     )
+    @skip_unchanged_outputs
+    @depends_on_sections('indicators')
     def update_funnel_grid(selected_month, channel_filter, plan_filter, channel_filter_tab1):
         data = data_manager.get_data()
         if not data or not selected_month:
@@ -288,18 +297,12 @@ def register_tab1_callbacks(app):
             else:
                 channels = ['全体']
                 if 'indicators' in data:
-                    actual_df = get_dataframe_from_store(data, 'indicators', 'actual')
-                    if actual_df is not None:
-                        raw_channels = clean_channel_names(actual_df['channel'].unique())
-                        main_channels = []
-                        for ch in ['新規web', '新規法人', '新規代理店', 'クロスセル']:
-                            if ch in raw_channels:
-                                main_channels.append(ch)
-                        channels.extend(main_channels[:4])
+                    channels.extend(data_manager.get_main_channels('indicators')[:4])
             
             funnel_charts = []
             
-            for channel in channels:
+            for index, channel in enumerate(channels):
+                report_progress(index, len(channels))
                 # チャネル別のフィルタ設定
                 if channel == '全体':
                     ch_filter = []
@@ -434,6 +437,8 @@ def register_tab1_callbacks(app):
          Input('trend-cv-filter', 'value'),
          Input('channel-filter-tab1', 'value')]
     )
+    @skip_unchanged_outputs
+    @depends_on_sections('indicators')
     def update_channel_trends(selected_month, cv_filter, channel_filter_tab1):
         data = data_manager.get_data()
         if not data or not selected_month:
@@ -463,13 +468,8 @@ def register_tab1_callbacks(app):
                     if channel_filter_tab1:
                         channels = [channel_filter_tab1]
                     else:
-                        raw_channels = clean_channel_names(indicators_actual['channel'].unique())
-                        # 主要4チャネルを選択 - 清理済みチャネル名を使用
-                        channels = []
-                        for ch in ['新規web', '新規法人', '新規代理店', 'クロスセル']:
-                            if ch in raw_channels:
-                                channels.append(ch)
-                        channels = channels[:4]
+                        # 主要4チャネルを選択（取り込み時のカタログを使用）
+                        channels = data_manager.get_main_channels('indicators')[:4]
                     
                     # チャネル別のデータを格納するリスト
                     channel_data_list = []
@@ -705,6 +705,8 @@ def register_tab1_callbacks(app):
         Output('funnel-insights', 'children'),
         [Input('month-selector', 'value')]
     )
+    @skip_unchanged_outputs
+    @depends_on_sections('indicators')
     def update_funnel_insights(selected_month):
         data = data_manager.get_data()
         if not data or not selected_month:
@@ -837,6 +839,8 @@ def register_tab1_callbacks(app):
          Input('stage-cv-filter', 'data'),
          Input('channel-filter-tab1', 'value')]
     )
+    @skip_unchanged_outputs
+    @depends_on_sections('indicators')
     def update_stage_cv_cards(selected_month, selected_stage, channel_filter_tab1):
         data = data_manager.get_data()
         if not data or not selected_month:
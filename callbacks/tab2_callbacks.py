@@ -7,9 +7,12 @@ import logging
 logger = logging.getLogger(__name__)
 from data_manager import (
     data_manager, get_dataframe_from_store, apply_filters, should_display_actual_data,
-    format_number, clean_channel_names, clean_plan_names, calculate_single_month,
+    format_number, calculate_single_month,
     calculate_cumulative, calculate_kpi_values, get_monthly_trend_data
 )
+from utils.section_cache import depends_on_sections
+from utils.background import callback_options, report_progress
+from utils.output_fingerprint import skip_unchanged_outputs
 from components.cards import (
     create_performance_card, create_insight_card, get_performance_color
 )
@@ -132,6 +135,8 @@ def register_tab2_callbacks(app):
          Input('plan-filter-tab2', 'value'),
          Input('analysis-type-state', 'data')]
     )
+    @skip_unchanged_outputs
+    @depends_on_sections('sales', 'acquisition')
     def update_main_trend_chart(selected_month, plan_ratio_class, cumulative_class,
                                channel_filter, plan_filter, channel_filter_tab2, plan_filter_tab2, analysis_type):
         data = data_manager.get_data()
@@ -284,6 +289,8 @@ def register_tab2_callbacks(app):
         Output('retention-rate-cards', 'children'),
         [Input('month-selector', 'value')]
     )
+    @skip_unchanged_outputs
+    @depends_on_sections('retention')
     def update_retention_rate_cards(selected_month):
         data = data_manager.get_data()
         if not data or not selected_month:
@@ -296,7 +303,7 @@ def register_tab2_callbacks(app):
                 actual_df = get_dataframe_from_store(data, 'retention', 'actual')
                 
                 if actual_df is not None and not actual_df.empty:
-                    channels = clean_channel_names(actual_df['channel'].unique())
+                    channels = data_manager.get_channels('retention')
                     
                     for channel in channels:
                         channel_data = actual_df[actual_df['channel'].str.contains(channel, na=False)]
@@ -341,6 +348,8 @@ def register_tab2_callbacks(app):
          Input('channel-filter-tab2', 'value'),
          Input('plan-filter-tab2', 'value')]
     )
+    @skip_unchanged_outputs
+    @depends_on_sections('unit_price')
     def update_unit_price_analysis_cards(selected_month, plan_ratio_class, cumulative_class,
                                        channel_filter, plan_filter, channel_filter_tab2, plan_filter_tab2):
         data = data_manager.get_data()
@@ -358,7 +367,7 @@ def register_tab2_callbacks(app):
                 budget_df = get_dataframe_from_store(data, 'unit_price', 'budget')
                 
                 if actual_df is not None and budget_df is not None:
-                    channels = clean_channel_names(actual_df['channel'].unique())
+                    channels = data_manager.get_channels('unit_price')
                     
                     for channel in channels:
                         # Tab2専用のフィルターを使用
@@ -429,6 +438,8 @@ def register_tab2_callbacks(app):
          Input('plan-filter-tab2', 'value'),
          Input('analysis-type-state', 'data')]
     )
+    @skip_unchanged_outputs
+    @depends_on_sections('sales', 'acquisition')
     def update_composition_channel_chart(selected_month, plan_ratio_class, cumulative_class,
                                        plan_filter, plan_filter_tab2, analysis_type):
         data = data_manager.get_data()
@@ -453,7 +464,7 @@ def register_tab2_callbacks(app):
                 current_plan_filter = [plan_filter_tab2] if plan_filter_tab2 else plan_filter
                 
                 # 各チャネルごとのデータを取得
-                channels = clean_channel_names(actual_df['channel'].unique())
+                channels = data_manager.get_channels(data_key)
                 data_dict = {'actual': {}, 'budget': {}}
                 
                 # 各チャネルごとのデータを取得（calculate_kpi_values()と同じロジックを使用）
@@ -498,6 +509,8 @@ def register_tab2_callbacks(app):
          Input('channel-filter-tab2', 'value'),
          Input('analysis-type-state', 'data')]
     )
+    @skip_unchanged_outputs
+    @depends_on_sections('sales', 'acquisition')
     def update_composition_app_chart(selected_month, plan_ratio_class, cumulative_class,
                                    channel_filter, channel_filter_tab2, analysis_type):
         data = data_manager.get_data()
@@ -522,7 +535,7 @@ def register_tab2_callbacks(app):
                 current_channel_filter = [channel_filter_tab2] if channel_filter_tab2 else channel_filter
                 
                 # 各プラン（アプリ）ごとのデータを取得
-                plans = clean_plan_names(actual_df['plan'].unique())
+                plans = data_manager.get_plans(data_key)
                 data_dict = {'actual': {}, 'budget': {}}
                 
                 # 各プランごとのデータを取得（calculate_kpi_values()と同じロジックを使用）
@@ -571,6 +584,8 @@ def register_tab2_callbacks(app):
          Input('plan-filter-tab2', 'value'),
          Input('analysis-type-state', 'data')]
     )
+    @skip_unchanged_outputs
+    @depends_on_sections('sales', 'acquisition')
     def update_channel_cards(selected_month, plan_ratio_class, cumulative_class,
                            channel_filter, plan_filter, channel_filter_tab2, plan_filter_tab2, analysis_type):
         data = data_manager.get_data()
@@ -592,7 +607,7 @@ def register_tab2_callbacks(app):
                 budget_df = get_dataframe_from_store(data, data_key, 'budget')
                 
                 if actual_df is not None and budget_df is not None:
-                    channels = clean_channel_names(actual_df['channel'].unique())
+                    channels = data_manager.get_channels(data_key)
                     
                     for channel in channels:
                         # Tab2専用のフィルターを使用
@@ -672,8 +687,12 @@ def register_tab2_callbacks(app):
          Input('plan-filter', 'value'),
          Input('channel-filter-tab2', 'value'),
          Input('plan-filter-tab2', 'value'),
-         Input('analysis-type-state', 'data')]
+         Input('analysis-type-state', 'data')],
+        # SFA_BACKGROUND=1 の場合はプロセスプールで計算（進捗表示・入力変更時の取り消し付き）
+        **callback_options('plan-cards-progress')
     )
+    @skip_unchanged_outputs
+    @depends_on_sections('sales', 'acquisition')
     def update_plan_cards(selected_month, plan_ratio_class, cumulative_class,
                          channel_filter, plan_filter, channel_filter_tab2, plan_filter_tab2, analysis_type):
         data = data_manager.get_data()
@@ -695,9 +714,10 @@ def register_tab2_callbacks(app):
                 budget_df = get_dataframe_from_store(data, data_key, 'budget')
                 
                 if actual_df is not None and budget_df is not None:
-                    plans = clean_plan_names(actual_df['plan'].unique())
+                    plans = data_manager.get_plans(data_key)
                     
-                    for plan in plans:
+                    for index, plan in enumerate(plans):
+                        report_progress(index, len(plans))
                         # Tab2専用のフィルターを使用
                         current_channel_filter = [channel_filter_tab2] if channel_filter_tab2 else channel_filter
                         current_plan_filter = [plan_filter_tab2] if plan_filter_tab2 else plan_filter
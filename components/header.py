@@ -45,7 +45,7 @@ def create_header():
                         ], 
                         **{
                             'role': 'button',
-                            'aria-label': 'Excelファイルをアップロードしてデータを更新'
+                            'aria-label': 'Excelファイル（または差分CSV）をアップロードしてデータを更新'
                         },
                         style={
                             'background': 'transparent',
@@ -2,6 +2,8 @@
 SFA/CRM Dashboard Configuration
 設定・定数定義ファイル
 """
+import os
+import sys
 
 # ダークテーマカラーパレット
 DARK_COLORS = {
@@ -128,6 +130,18 @@ STAGE_MAPPING = {
     "新規アプリ獲得数（単月）": [107, 118, 126, 134]
 }
 
+# チャネル名の表記ゆれ（正規化後の名前 → Excel上の名前）
+CHANNEL_ALIASES = {
+    '既存': ['既存', '既存（25年以前）'],
+    'フロー': ['フロー①', 'フロー②', 'フロー③', 'フロー④', 'フロー⑤', 'フロー'],
+    '新規web': ['新規（WEB）'],
+    '新規法人': ['新規（法人）'],
+    '新規代理店': ['新規（代理店）']
+}
+
+# 主要チャネル（ファネル・経路別トレンドの表示順）
+MAIN_CHANNELS = ['新規web', '新規法人', '新規代理店', 'クロスセル']
+
 INTEGRATED_STAGES = {
     "リード・アプローチ": ["新規リード数", "アプローチ数"],
     "商談": ["商談ステージ"],
@@ -183,6 +197,56 @@ EXCEL_STRUCTURE = {
     }
 }
 
+# パフォーマンス設定
+PERFORMANCE = {
+    'filter_cache_size': 1024,   # apply_filters結果（行位置）のLRU件数
+    'derived_cache_size': 4096,  # KPI値・月別トレンドのLRU件数
+    'section_output_cache_size': 512,  # セクション依存コールバック出力のLRU件数
+    'fingerprint_sessions': 1000,  # 出力フィンガープリントを保持するセッション数
+    'metrics_enabled': os.environ.get('SFA_METRICS', '').lower() in ('1', 'true', 'yes'),  # /metrics の計測
+    'profile_enabled': os.environ.get('SFA_PROFILE', '').lower() in ('1', 'true', 'yes'),  # 全リクエストのプロファイリング
+    'profile_dir': os.environ.get('SFA_PROFILE_DIR', 'profiles'),  # プロファイルレポートの保存先
+    'profile_keep': 50,  # 保持するプロファイルレポート数
+    'record_enabled': os.environ.get('SFA_RECORD', '').lower() in ('1', 'true', 'yes'),  # コールバックリクエストの記録
+    'record_dir': os.environ.get('SFA_RECORD_DIR', 'recordings'),  # 記録の保存先
+    'fanout_enabled': os.environ.get('SFA_FANOUT', '').lower() in ('1', 'true', 'yes'),  # 操作別のコールバック分析
+    'fanout_window': 2.0,  # 同じ操作とみなす直前の呼び出しからの間隔（秒）
+    'fanout_traces': 500,  # 保持する操作トレース数
+    # CDNを使わないアセット配信（exe では常に有効）
+    'offline_assets': (os.environ.get('SFA_OFFLINE_ASSETS', '').lower() in ('1', 'true', 'yes')
+                       or getattr(sys, 'frozen', False)),
+    'compress_enabled': os.environ.get('SFA_COMPRESS', '1').lower() in ('1', 'true', 'yes'),  # 応答の gzip/brotli 圧縮
+    'compress_min_bytes': 1024,  # 圧縮する応答の最小サイズ
+    'gzip_level': 6,  # gzip の圧縮レベル（動的な応答のため速度を優先）
+    'brotli_quality': 5,  # brotli の品質
+    'prefetch_enabled': os.environ.get('SFA_PREFETCH', '').lower() in ('1', 'true', 'yes'),  # 前後の月・反対の切り替えの投機計算
+    'prefetch_workers': 1,  # 同時に実行する投機計算の数
+    'prefetch_queue': 32,  # 待ち行列の上限（超えたら古いものから破棄）
+    'prefetch_ttl': 5.0,  # 実リクエストの処理中に待てる時間（秒、超えたら破棄）
+    'admission_enabled': os.environ.get('SFA_ADMISSION', '').lower() in ('1', 'true', 'yes'),  # 重いコールバックの流入制御
+    'admission_slots': 2,  # 重いコールバックの同時実行数
+    'admission_queue': 16,  # 待ち行列の上限（超えたら busy を返す）
+    'admission_wait': 10.0,  # 待ち時間の上限（秒、超えたら busy を返す）
+    'admission_heavy_ms': 200,  # 平均処理時間がこれ以上のコールバックを重いとみなす
+    'admission_heavy_callbacks': ('update_stage_cv_cards', 'update_channel_trends', 'update_funnel_grid',
+                                  'update_channel_cards', 'update_plan_cards', 'update_unit_price_analysis_cards'),
+    'single_flight_enabled': os.environ.get('SFA_SINGLE_FLIGHT', '1').lower() in ('1', 'true', 'yes'),  # 同じ計算の同時実行をまとめる
+    'single_flight_dir': os.environ.get('SFA_SINGLE_FLIGHT_DIR', ''),  # ワーカー間のリース用ディレクトリ（空ならユーザー専用の一時ディレクトリ）
+    'single_flight_timeout': 30.0,  # 他の計算を待つ時間の上限（秒、超えたら自分で計算）
+    'single_flight_result_ttl': 60.0,  # ワーカー間で受け渡した結果ファイルの保持時間（秒）
+    'result_store_enabled': os.environ.get('SFA_RESULT_STORE', '').lower() in ('1', 'true', 'yes'),  # 出力のディスクキャッシュ
+    'result_store_path': os.environ.get('SFA_RESULT_STORE_PATH', ''),  # SQLite ファイル（空ならユーザー専用の一時ディレクトリ）
+    'result_store_max_mb': int(os.environ.get('SFA_RESULT_STORE_MAX_MB', '256')),  # 保存する出力の合計サイズの上限
+    'memory_budget_mb': int(os.environ.get('SFA_MEMORY_BUDGET_MB', '0')),  # ワーカーごとの RSS の予算（0 は削減しない）
+    'memory_check_seconds': 5.0,  # RSS を確認する間隔（秒）
+    'background_enabled': os.environ.get('SFA_BACKGROUND', '').lower() in ('1', 'true', 'yes'),  # 重いコールバックのバックグラウンド実行
+    'background_workers': 2,  # ワーカーごとのプロセスプールの大きさ
+    'background_interval_ms': 250,  # ブラウザが結果・進捗を確認する間隔
+    'background_store_path': os.environ.get('SFA_BACKGROUND_STORE_PATH', ''),  # 結果・進捗の SQLite ファイル（空ならユーザー専用の一時ディレクトリ）
+    'background_store_max_mb': 64,  # 保存する結果の合計サイズの上限
+    'warmup_enabled': os.environ.get('SFA_WARMUP', '1').lower() in ('1', 'true', 'yes'),  # データ公開後のウォームアップ
+}
+
 # データポイント最適化関数
 def optimize_chart_data(df, max_points=50):
     """データポイント数を制限（視覚的品質維持）"""
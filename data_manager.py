@@ -2,35 +2,200 @@
 データ処理・管理モジュール
 """
 import pandas as pd
+import numpy as np
 import base64
+import csv
+import hashlib
+import json
 import io
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 from openpyxl import load_workbook
 from datetime import datetime
-from config import EXCEL_STRUCTURE, STAGE_MAPPING, INTEGRATED_STAGES
+from config import EXCEL_STRUCTURE, STAGE_MAPPING, INTEGRATED_STAGES, CHANNEL_ALIASES, MAIN_CHANNELS
+from utils.cache_utils import FilterKey, ChangeSet, filter_cache, derived_cache, frame_signature
+from utils.compact_records import compact_dataset, json_default, records_to_frame
+from utils import fanout, metrics, prefetch
+from utils.profiling import profiled
+
+logger = logging.getLogger(__name__)
+
+# 計算中のコールバックが参照するスナップショット（pinned() の中だけ設定）
+_pinned_snapshot = ContextVar('sfa_pinned_snapshot', default=None)
 
 class DataManager:
     """データ管理クラス"""
     def __init__(self):
-        self.data = None
+        # 公開中のデータ・セクションの内容バージョン・次元カタログの組（読み手が食い違わないよう常に同時に差し替える）
+        self.snapshot = (None, {}, None)
         self.last_update = None
+        self.update_count = 0  # 最終更新時刻を設定した回数（データに変更がない取り込みでも増える）
         self.excel_filename = None
+        self.version = 0
+        self.last_changes = None
+        self._caches = [filter_cache, derived_cache]
+        self._lock = threading.Lock()
         
+    @profiled('DataManager.update_data')
     def update_data(self, contents, filename):
-        """Excelデータを更新"""
+        """Excelデータを更新（読み込み済みデータとの差分のみ反映）"""
+        if filename and str(filename).lower().endswith('.csv'):
+            return self.apply_delta(contents, filename)
         try:
             data, message = process_excel_data(contents)
             if data:
-                self.data = data
-                self.last_update = datetime.now()
-                self.excel_filename = filename
+                with self._lock:
+                    if self.data is None:
+                        changes = ChangeSet.everything(data)
+                    else:
+                        with metrics.stage('diff'):
+                            changes = diff_datasets(self.data, data)
+                        with metrics.stage('merge'):
+                            data = merge_datasets(self.data, data, changes)
+                    
+                    if changes:
+                        self._publish(data, changes)
+                    else:
+                        logger.info("データに変更はありません（キャッシュを維持）")
+                    self._touch()
+                    self.excel_filename = filename
                 return True, message
             return False, message
         except Exception as e:
             return False, f"エラー: {str(e)}"
     
+    def apply_delta(self, contents, filename=None, month=None):
+        """
+        単月の差分CSV（channel, plan, section, value[, month]）を実績データへ反映
+        
+        Excelを読み直さず、該当セルと小計行のみ更新して新しいデータバージョンを公開する
+        month を省略した場合はCSVの month 列、なければ当月を対象とする
+        """
+        try:
+            with metrics.stage('delta_parse'):
+                rows = parse_delta_csv(contents)
+            with self._lock:
+                if self.data is None:
+                    return False, "先にExcelファイルを読み込んでください"
+                
+                target_month = month or f"{datetime.now().month}月"
+                with metrics.stage('delta_apply'):
+                    data, changes, applied, rejected = apply_delta_rows(self.data, rows, target_month)
+                for line, reason in rejected:
+                    logger.warning(f"差分CSV {line}行目を反映できませんでした: {reason}")
+                
+                if changes:
+                    self._publish(data, changes)
+                    self._touch()
+                
+            message = f"差分データを反映しました（{applied}件）"
+            if rejected:
+                details = '、'.join(f"{line}行目: {reason}" for line, reason in rejected[:3])
+                message += f" 未反映 {len(rejected)}件（{details}）"
+            return True, message
+        except Exception as e:
+            return False, f"差分CSV処理エラー: {str(e)}"
+    
+    def _publish(self, data, changes):
+        """新しいデータバージョンを公開し、変更範囲のキャッシュを無効化"""
+        stages = metrics.stage_timer()
+        catalog = build_dimension_catalog(data)
+        changed_sections = changes.sections
+        section_versions = {
+            section: (self.section_versions[section]
+                      if section in self.section_versions and section not in changed_sections and None not in changed_sections
+                      else section_digest(section_data))
+            for section, section_data in data.items()
+        }
+        self.snapshot = (data, section_versions, catalog)
+        self.version += 1
+        self.last_changes = changes
+        for cache in self._caches:
+            cache.invalidate(changes, self.version)
+        stages.mark('publish')
+        logger.info(f"データバージョン {self.version} を公開しました（変更: {changes.summary()}）")
+    
+    def _touch(self):
+        """最終更新時刻を設定"""
+        self.last_update = datetime.now()
+        self.update_count += 1
+    
+    def get_layout_version(self):
+        """レイアウトに表示する内容のバージョン（データバージョンと最終更新時刻の設定回数、ETag 用）"""
+        return f'{self.version}.{self.update_count}'
+    
+    def compact(self):
+        """公開中のデータを列指向のコンパクトな表現に置き換え（内容・バージョンは変わらない）"""
+        with self._lock:
+            data, section_versions, catalog = self.snapshot
+            if data is not None:
+                self.snapshot = (compact_dataset(data), section_versions, catalog)
+    
+    def register_cache(self, cache):
+        """データ変更時に invalidate(changes, version) を呼び出すキャッシュを登録"""
+        if cache not in self._caches:
+            self._caches.append(cache)
+    
+    @property
+    def data(self):
+        """公開中のデータ"""
+        return self.snapshot[0]
+    
+    @property
+    def section_versions(self):
+        """公開中のデータのセクション → 内容バージョン"""
+        return self.snapshot[1]
+    
+    @property
+    def catalog(self):
+        """公開中のデータの次元カタログ"""
+        return self.snapshot[2]
+    
+    @contextmanager
+    def pinned(self, snapshot):
+        """この中の get_data()・カタログの取得は snapshot のものを返す（キャッシュキーと計算に同じデータを使うため）"""
+        token = _pinned_snapshot.set(snapshot)
+        try:
+            yield
+        finally:
+            _pinned_snapshot.reset(token)
+    
+    def _current(self):
+        """pinned() の中ではそのスナップショット、それ以外は公開中のスナップショット"""
+        return _pinned_snapshot.get() or self.snapshot
+    
     def get_data(self):
-        """現在のデータを取得"""
-        return self.data
+        """現在のデータを取得（pinned() の中ではそのスナップショットのデータ）"""
+        return self._current()[0]
+    
+    def get_section_versions(self, sections, snapshot=None):
+        """指定セクションの内容バージョン（未読み込みは None、snapshot 省略時は公開中のデータ）"""
+        section_versions = (snapshot or self.snapshot)[1]
+        return tuple(section_versions.get(section) for section in sections)
+    
+    def get_catalog(self):
+        """現在のデータの次元カタログを取得（pinned() の中ではそのスナップショットのカタログ）"""
+        return self._current()[2]
+    
+    def _catalog_values(self, section, name):
+        catalog = self.get_catalog()
+        if catalog and section in catalog['sections']:
+            return list(catalog['sections'][section][name])
+        return []
+    
+    def get_channels(self, section):
+        """セクションの正規化済みチャネル一覧を取得"""
+        return self._catalog_values(section, 'channels')
+    
+    def get_plans(self, section):
+        """セクションのプラン一覧を取得"""
+        return self._catalog_values(section, 'plans')
+    
+    def get_main_channels(self, section='indicators'):
+        """セクションに存在する主要チャネルを表示順で取得"""
+        return self._catalog_values(section, 'main_channels')
     
     def get_last_update(self):
         """最終更新時刻を取得"""
@@ -93,6 +258,318 @@ def clean_plan_names(plans):
                 cleaned.append(plan_str)
     return list(set(cleaned))
 
+def build_dimension_catalog(data):
+    """
+    データセットの次元カタログを作成（取り込み時に各セクションを1パスで走査）
+    
+    Returns:
+    --------
+    dict : {
+        'months': 月リスト（売上計画の列順）,
+        'default_month': 売上実績の最終データ月,
+        'sections': {section: {'months', 'channels', 'plans', 'plans_by_channel', 'main_channels'}}
+    }
+    """
+    header_channels = ['売上高', '獲得件数（累月）', '客単価', '継続率', '指標']
+    catalog = {'months': [], 'default_month': None, 'sections': {}}
+    
+    for section, section_data in (data or {}).items():
+        records = section_data.get('actual') or []
+        months = [col for col in (records[0].keys() if records else []) if str(col).endswith('月')]
+        raw_channels = set()
+        raw_plans = set()
+        plans_by_raw_channel = {}
+        month_totals = dict.fromkeys(months, 0)
+        current_channel = None
+        
+        for record in records:
+            channel = record.get('channel')
+            plan = record.get('plan')
+            if channel is not None:
+                raw_channels.add(channel)
+            if plan is not None:
+                raw_plans.add(plan)
+            
+            # 階層構造（チャネル名が空の行は直前のチャネルに属する）
+            if channel and str(channel).strip():
+                current_channel = str(channel).strip()
+            if current_channel:
+                plans_by_raw_channel.setdefault(current_channel, set()).add(plan)
+            
+            # 最終データ月の判定用（get_last_data_month()と同じ除外条件）
+            if section == 'sales' and channel not in header_channels:
+                for month in months:
+                    month_totals[month] += record.get(month) or 0
+        
+        channels = sorted(clean_channel_names(raw_channels))
+        plans_by_channel = {}
+        for raw_channel, plans in plans_by_raw_channel.items():
+            for channel in clean_channel_names([raw_channel]):
+                plans_by_channel.setdefault(channel, set()).update(clean_plan_names(plans))
+        
+        catalog['sections'][section] = {
+            'months': months,
+            'channels': channels,
+            'plans': sorted(clean_plan_names(raw_plans)),
+            'plans_by_channel': {ch: sorted(plans) for ch, plans in plans_by_channel.items()},
+            'main_channels': [ch for ch in MAIN_CHANNELS if ch in channels]
+        }
+        
+        if section == 'sales':
+            for month in reversed(months):
+                if month_totals[month] > 0:
+                    catalog['default_month'] = month
+                    break
+    
+    # 月選択肢は売上計画の列順（従来の handle_file_upload と同じ）
+    budget_records = (data or {}).get('sales', {}).get('budget') or []
+    if budget_records:
+        catalog['months'] = [col for col in budget_records[0].keys() if str(col).endswith('月')]
+    if catalog['default_month'] is None and catalog['months']:
+        catalog['default_month'] = catalog['months'][-1]
+    
+    return catalog
+
+def section_digest(section_data):
+    """セクションの内容から決まるバージョン（同じ内容なら常に同じ値）"""
+    payload = json.dumps(section_data, sort_keys=True, ensure_ascii=False, default=json_default)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+
+def _row_key(record):
+    """行構成の比較キー"""
+    return (record.get('channel'), record.get('plan'))
+
+def _values_differ(old_value, new_value):
+    """セル値の比較（NaN同士は同じとみなす）"""
+    if old_value == new_value:
+        return False
+    return not (old_value != old_value and new_value != new_value)
+
+def diff_datasets(old_data, new_data):
+    """
+    読み込み済みデータと新しいデータのセル単位の差分を計算
+    
+    Returns:
+    --------
+    ChangeSet : 変更のあった (section, channel, month) と (section, data_type)
+    """
+    changes = ChangeSet()
+    
+    for section in set(old_data) | set(new_data):
+        old_section = old_data.get(section) or {}
+        new_section = new_data.get(section) or {}
+        
+        for data_type in set(old_section) | set(new_section):
+            old_records = old_section.get(data_type) or []
+            new_records = new_section.get(data_type) or []
+            
+            # 行構成や列が変わった場合はセクション全体を変更とする
+            if (len(old_records) != len(new_records)
+                    or [_row_key(r) for r in old_records] != [_row_key(r) for r in new_records]
+                    or any(old.keys() != new.keys() for old, new in zip(old_records, new_records))):
+                changes.structural = True
+                changes.add(section, data_type)
+                continue
+            
+            current_channel = None
+            for old_record, new_record in zip(old_records, new_records):
+                channel = new_record.get('channel')
+                if channel and str(channel).strip():
+                    current_channel = str(channel).strip()
+                for col, new_value in new_record.items():
+                    if col in ('channel', 'plan', 'section'):
+                        continue
+                    if _values_differ(old_record.get(col), new_value):
+                        changes.add(section, data_type, current_channel, col)
+            
+            if data_type == 'actual' and (section, data_type) in changes.blocks:
+                _add_last_month_shift(changes, section, data_type, old_records, new_records)
+    
+    return changes
+
+def _add_last_month_shift(changes, section, data_type, old_records, new_records):
+    """最終データ月が動いた場合、その間の月は全チャネルで表示判定が変わるため変更に加える"""
+    month_cols = [col for col in new_records[0].keys() if str(col).endswith('月')] if new_records else []
+    old_last = get_last_data_month(records_to_frame(old_records), month_cols)
+    new_last = get_last_data_month(records_to_frame(new_records), month_cols)
+    if old_last != new_last:
+        indices = [month_cols.index(m) if m in month_cols else -1 for m in (old_last, new_last)]
+        for month in month_cols[min(indices) + 1:max(indices) + 1]:
+            changes.add(section, data_type, None, month)
+
+def merge_datasets(old_data, new_data, changes):
+    """
+    変更のあったブロック・行だけを新しいデータに差し替え
+    
+    変更のないブロック（リスト）と行（dict）は既存のオブジェクトをそのまま共有する
+    """
+    if changes.structural and (None, None, None) in changes.footprints:
+        return new_data
+    
+    merged = {}
+    for section, new_section in new_data.items():
+        merged[section] = {}
+        old_section = old_data.get(section) or {}
+        for data_type, new_records in new_section.items():
+            old_records = old_section.get(data_type)
+            if (section, data_type) not in changes.blocks and old_records is not None:
+                merged[section][data_type] = old_records
+            elif old_records is not None and len(old_records) == len(new_records):
+                merged[section][data_type] = [
+                    old if old == new else new
+                    for old, new in zip(old_records, new_records)
+                ]
+            else:
+                merged[section][data_type] = new_records
+    return merged
+
+# 差分CSVの必須列
+DELTA_COLUMNS = ('channel', 'plan', 'section', 'value')
+
+# 「計」「合計」行が明細行の合計になっているセクション
+ADDITIVE_SECTIONS = ('sales', 'acquisition')
+
+def parse_delta_csv(contents):
+    """
+    差分CSVを行のリストに変換
+    
+    contents は dcc.Upload 形式（data:...;base64,...）またはCSVテキスト
+    """
+    if isinstance(contents, bytes):
+        decoded = contents
+    elif contents.startswith('data:'):
+        decoded = base64.b64decode(contents.split(',', 1)[1])
+    else:
+        decoded = contents.encode('utf-8')
+    
+    # Excelで保存したCSV（Shift_JIS）にも対応
+    try:
+        text = decoded.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = decoded.decode('cp932')
+    
+    reader = csv.DictReader(io.StringIO(text))
+    columns = [str(col).strip().lower() for col in (reader.fieldnames or [])]
+    missing = [col for col in DELTA_COLUMNS if col not in columns]
+    if missing:
+        raise ValueError(f"必須列がありません: {', '.join(missing)}")
+    
+    rows = []
+    for line, raw in enumerate(reader, start=2):
+        row = {str(key).strip().lower(): (value or '').strip() for key, value in raw.items() if key is not None}
+        if not any(row.values()):
+            continue
+        row['line'] = line
+        rows.append(row)
+    return rows
+
+def _normalize_month(value):
+    """'7', '07', '7月' などを '7月' に揃える"""
+    text = str(value).strip()
+    if text.endswith('月'):
+        text = text[:-1]
+    try:
+        return f"{int(float(text))}月"
+    except ValueError:
+        return None
+
+def _row_index(records):
+    """(実効チャネル, プラン) → 行位置のリスト（空欄チャネルは直前のチャネルを継承）"""
+    index = {}
+    channels = []
+    current_channel = ''
+    for pos, record in enumerate(records):
+        channel = str(record.get('channel') or '').strip()
+        if channel:
+            current_channel = channel
+        channels.append(current_channel)
+        index.setdefault((current_channel, str(record.get('plan') or '').strip()), []).append(pos)
+    return index, channels
+
+def apply_delta_rows(data, rows, default_month):
+    """
+    差分行を実績データ（actual）へ適用
+    
+    変更のあったセクションの実績ブロックと行だけを複製し、それ以外は既存データを共有する
+    
+    Returns:
+    --------
+    tuple : (新しいデータ, ChangeSet, 反映件数, [(行番号, 理由), ...])
+    """
+    changes = ChangeSet()
+    rejected = []
+    applied = 0
+    
+    # セクションはキー（sales）または見出し行の名前（売上高）で指定できる
+    section_names = {}
+    for section, section_data in data.items():
+        section_names[section] = section
+        records = section_data.get('actual') or []
+        if records and records[0].get('channel') and not records[0].get('plan'):
+            section_names[str(records[0]['channel']).strip()] = section
+    
+    blocks = {}
+    for row in rows:
+        line = row['line']
+        section = section_names.get(row['section'])
+        if section is None:
+            rejected.append((line, f"セクション「{row['section']}」が見つかりません"))
+            continue
+        month = _normalize_month(row.get('month') or default_month)
+        try:
+            value = float(row['value'].replace(',', ''))
+        except ValueError:
+            rejected.append((line, f"値「{row['value']}」を数値に変換できません"))
+            continue
+        
+        if section not in blocks:
+            original = data[section].get('actual') or []
+            index, channels = _row_index(original)
+            blocks[section] = {'original': original, 'records': list(original),
+                               'index': index, 'channels': channels, 'copied': set()}
+        block = blocks[section]
+        if not block['records'] or month not in block['records'][0]:
+            rejected.append((line, f"月「{row.get('month') or default_month}」が見つかりません"))
+            continue
+        
+        positions = []
+        for channel in CHANNEL_ALIASES.get(row['channel'], [row['channel']]):
+            positions.extend(block['index'].get((channel, row['plan']), []))
+        if len(positions) != 1:
+            reason = "該当する行がありません" if not positions else "該当する行が複数あります"
+            rejected.append((line, f"{reason}（{row['channel']} / {row['plan']}）"))
+            continue
+        
+        targets = [(positions[0], value - block['records'][positions[0]][month])]
+        # 明細行の変化分を「計」「合計」行へ反映
+        if section in ADDITIVE_SECTIONS and row['plan'] not in ('計', ''):
+            channel = block['channels'][positions[0]]
+            for key in ((channel, '計'), ('合計', '')):
+                for pos in block['index'].get(key, []):
+                    targets.append((pos, targets[0][1]))
+        
+        applied += 1
+        for pos, delta in targets:
+            if not delta:
+                continue
+            if pos not in block['copied']:
+                block['records'][pos] = dict(block['records'][pos])
+                block['copied'].add(pos)
+            block['records'][pos][month] += delta
+            changes.add(section, 'actual', block['channels'][pos], month)
+    
+    if not changes:
+        return data, changes, applied, rejected
+    
+    new_data = dict(data)
+    for section, block in blocks.items():
+        if not block['copied']:
+            continue
+        new_data[section] = dict(data[section])
+        new_data[section]['actual'] = block['records']
+        _add_last_month_shift(changes, section, 'actual', block['original'], block['records'])
+    return new_data, changes, applied, rejected
+
 def filter_detail_rows(df):
     """詳細行のフィルタリング"""
     if df is None or df.empty:
@@ -120,28 +597,65 @@ def filter_detail_rows(df):
     return filtered_df
 
 def apply_filters(df, channel_filter, plan_filter):
-    """フィルタ適用（階層構造対応）"""
+    """フィルタ適用（階層構造対応、結果の行位置をキャッシュ）"""
     if df is None or df.empty:
         return df
     
+    filter_key = FilterKey.from_filters(channel_filter, plan_filter)
+    signature = frame_signature(df)
+    fanout.note('apply_filters', signature, filter_key or (channel_filter, plan_filter))
+    prefetch.checkpoint()
+    if filter_key is None or signature is None or not df.index.is_unique:
+        return _apply_filters_uncached(df, channel_filter, plan_filter)
+    
+    cache_key = (signature, filter_key)
+    positions = filter_cache.get(cache_key)
+    if positions is None:
+        positions = _filter_positions(df, filter_key)
+        filter_cache.put(cache_key, positions)
+    
+    return df.iloc[positions]
+
+def _filter_positions(df, filter_key):
+    """正規化済みフィルタに一致する行位置を計算"""
+    exclude_channels = ['売上高', '獲得件数（累月）', '客単価', '継続率', '指標', '合計', 'total', 'Total']
+    exclude_plans = ['計', '合計', 'total', 'Total']
+    mask = ~df['channel'].isin(exclude_channels).to_numpy() & ~df['plan'].isin(exclude_plans).to_numpy()
+    positions = np.flatnonzero(mask)
+    
+    if filter_key.channels:
+        # 階層構造を考慮したフィルタリング（チャネル名が空の行は直前のチャネルに属する）
+        normalized_channels = set(filter_key.channels)
+        channel_values = df['channel'].to_numpy()
+        selected = []
+        current_channel = None
+        
+        for pos in positions:
+            channel = channel_values[pos]
+            if channel and str(channel).strip():
+                current_channel = str(channel).strip()
+                if current_channel in normalized_channels:
+                    selected.append(pos)
+            elif current_channel and current_channel in normalized_channels:
+                selected.append(pos)
+        
+        positions = np.array(selected, dtype=np.intp)
+    
+    if filter_key.plans:
+        plan_mask = df['plan'].isin(filter_key.plans).to_numpy()
+        positions = positions[plan_mask[positions]]
+    
+    return positions
+
+def _apply_filters_uncached(df, channel_filter, plan_filter):
+    """フィルタ適用（キャッシュを使わない従来の処理）"""
     filtered_df = filter_detail_rows(df)
     
     if channel_filter:
         # チャネル名の正規化
         normalized_channels = []
         for ch in channel_filter:
-            if ch == '既存':
-                normalized_channels.extend(['既存', '既存（25年以前）'])
-            elif ch == 'フロー':
-                normalized_channels.extend(['フロー①', 'フロー②', 'フロー③', 'フロー④', 'フロー⑤', 'フロー'])
-            elif ch == '新規web':
-                normalized_channels.append('新規（WEB）')
-            elif ch == '新規法人':
-                normalized_channels.append('新規（法人）')
-            elif ch == '新規代理店':
-                normalized_channels.append('新規（代理店）')
-            else:
-                normalized_channels.append(ch)
+            normalized_channels.extend(CHANNEL_ALIASES.get(ch, [ch]))
         
         # 階層構造を考慮したフィルタリング
         selected_rows = []
@@ -166,9 +680,11 @@ def apply_filters(df, channel_filter, plan_filter):
 
 def get_dataframe_from_store(data, section, data_type):
     """データストアからDataFrameを取得"""
+    fanout.note('get_dataframe_from_store', id(data), section, data_type)
+    prefetch.checkpoint()
     if (data and section in data and data_type in data[section] and 
         data[section][data_type] is not None):
-        return pd.DataFrame(data[section][data_type])
+        return records_to_frame(data[section][data_type])
     return None
 
 def get_last_data_month(df, month_cols):
@@ -233,25 +749,32 @@ def calculate_cumulative(values):
     
     return cumulative_data
 
-def process_excel_data(contents):
-    """Excelファイルを処理してPDCAデータを抽出"""
+def process_excel_data(contents, structure=None):
+    """
+    Excelファイルを処理してPDCAデータを抽出
+
+    structure : シート名・セクション行範囲・列範囲（省略時は EXCEL_STRUCTURE）
+    """
+    structure = structure or EXCEL_STRUCTURE
+    stages = metrics.stage_timer()
     try:
         content_type, content_string = contents.split(',')
         decoded = base64.b64decode(content_string)
         
         wb = load_workbook(io.BytesIO(decoded), data_only=True)
+        stages.mark('load_workbook')
         
-        if EXCEL_STRUCTURE['sheet_name'] not in wb.sheetnames:
-            return None, f"「{EXCEL_STRUCTURE['sheet_name']}」シートが見つかりません"
+        if structure['sheet_name'] not in wb.sheetnames:
+            return None, f"「{structure['sheet_name']}」シートが見つかりません"
         
-        ws = wb[EXCEL_STRUCTURE['sheet_name']]
+        ws = wb[structure['sheet_name']]
         
         data = {}
         
-        for section_name, (start_row, end_row) in EXCEL_STRUCTURE['sections'].items():
+        for section_name, (start_row, end_row) in structure['sections'].items():
             section_data = {}
             
-            for data_type, (start_col, end_col) in EXCEL_STRUCTURE['col_ranges'].items():
+            for data_type, (start_col, end_col) in structure['col_ranges'].items():
                 type_data = []
                 
                 # 月情報の取得
@@ -293,6 +816,8 @@ def process_excel_data(contents):
             
             data[section_name] = section_data
         
+        stages.mark('extract')
+        
         # データの数値変換
         processed_data = {}
         for section, section_data in data.items():
@@ -305,12 +830,52 @@ def process_excel_data(contents):
                         df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
                     processed_data[section][data_type] = df.to_dict('records')
         
+        stages.mark('convert')
+        
         return processed_data, "データの読み込みが完了しました"
         
     except Exception as e:
         return None, f"ファイル処理エラー: {str(e)}"
 
+_MISSING = object()
+
+def _derived_footprint(data, section, channel_filter, months=None):
+    """
+    集計結果のフットプリント (section, channels, months) とキャッシュのバージョンを判定
+
+    キャッシュしない場合は (None, None)。計算中にデータが公開された場合は put() がバージョンの違いで格納しない
+    """
+    # 公開と入れ替わらないよう、データより先にバージョンを読む
+    version = derived_cache.version
+    # 現在公開中のデータに対する呼び出しのみキャッシュ対象
+    if data is None or data is not data_manager.data:
+        return None, None
+    filter_key = FilterKey.from_filters(channel_filter, None)
+    if filter_key is None:
+        return None, None
+    return (section, filter_key.channels, tuple(months) if months is not None else None), version
+
 def calculate_kpi_values(data, section, selected_month, data_type, period_type, channel_filter, plan_filter):
+    """KPI値の計算（現在のデータに対する結果はフットプリント付きでキャッシュ）"""
+    fanout.note('calculate_kpi_values', id(data), section, selected_month, period_type, channel_filter, plan_filter)
+    prefetch.checkpoint()
+    catalog = data_manager.get_catalog()
+    section_months = catalog['sections'].get(section, {}).get('months', []) if catalog else []
+    months = section_months[:section_months.index(selected_month) + 1] if selected_month in section_months else None
+    footprint, version = _derived_footprint(data, section, channel_filter, months)
+    plan_key = FilterKey.from_filters(None, plan_filter)
+    if footprint is None or plan_key is None:
+        return _calculate_kpi_values(data, section, selected_month, data_type, period_type, channel_filter, plan_filter)
+    
+    # data_type は計算に使われないためキーに含めない
+    cache_key = ('kpi', section, selected_month, period_type, footprint[1], plan_key.plans)
+    result = derived_cache.get(cache_key, _MISSING)
+    if result is _MISSING:
+        result = _calculate_kpi_values(data, section, selected_month, data_type, period_type, channel_filter, plan_filter)
+        derived_cache.put(cache_key, result, footprint, version)
+    return result
+
+def _calculate_kpi_values(data, section, selected_month, data_type, period_type, channel_filter, plan_filter):
     """KPI値の計算"""
     actual_df = get_dataframe_from_store(data, section, 'actual')
     budget_df = get_dataframe_from_store(data, section, 'budget')
@@ -382,6 +947,31 @@ def calculate_kpi_values(data, section, selected_month, data_type, period_type,
     return actual_value, budget_value
 
 def get_monthly_trend_data(data, section, data_type, period_type, channel_filter=None, plan_filter=None, target_item=None, stage_name=None):
+    """月別トレンドデータを取得（スパークライン用、現在のデータに対する結果はキャッシュ）"""
+    fanout.note('get_monthly_trend_data', id(data), section, period_type, channel_filter, plan_filter, target_item, stage_name)
+    prefetch.checkpoint()
+    plan_key = FilterKey.from_filters(None, plan_filter)
+    # 実際に適用されるチャネル範囲をフットプリントとする
+    if (section == 'indicators' and stage_name) or (target_item and plan_filter):
+        scope_filter = None
+    elif target_item:
+        scope_filter = [target_item]
+    else:
+        scope_filter = channel_filter
+    footprint, version = _derived_footprint(data, section, scope_filter)
+    channel_key = FilterKey.from_filters(channel_filter, None)
+    if footprint is None or plan_key is None or channel_key is None:
+        return _get_monthly_trend_data(data, section, data_type, period_type, channel_filter, plan_filter, target_item, stage_name)
+    
+    cache_key = ('trend', section, period_type, channel_key.channels, plan_key.plans, target_item, stage_name)
+    result = derived_cache.get(cache_key, _MISSING)
+    if result is _MISSING:
+        result = _get_monthly_trend_data(data, section, data_type, period_type, channel_filter, plan_filter, target_item, stage_name)
+        derived_cache.put(cache_key, result, footprint, version)
+    # 呼び出し側での変更がキャッシュに波及しないようコピーを返す
+    return {key: list(value) if isinstance(value, list) else value for key, value in result.items()}
+
+def _get_monthly_trend_data(data, section, data_type, period_type, channel_filter=None, plan_filter=None, target_item=None, stage_name=None):
     """月別トレンドデータを取得（スパークライン用）"""
     actual_df = get_dataframe_from_store(data, section, 'actual')
     budget_df = get_dataframe_from_store(data, section, 'budget')
@@ -45,7 +45,10 @@ def create_funnel_analysis_layout():
                             'aria-level': '2'
                         },
                         className='text-heading',
-                        style={'margin': '0', 'fontSize': '0.8rem', 'lineHeight': '1.1'})
+                        style={'margin': '0', 'fontSize': '0.8rem', 'lineHeight': '1.1'}),
+                    # バックグラウンド実行中の進捗（SFA_BACKGROUND=1 の場合のみ表示される）
+                    html.Span(id='funnel-grid-progress', **{'aria-live': 'polite'},
+                              style={'marginLeft': 'auto', 'fontSize': '0.7rem', 'color': DARK_COLORS['text_muted']})
                 ], className='flex-row items-center card-header',
                 style={
                     'backgroundColor': '#4a5568',  # 複合グラフと同じ色
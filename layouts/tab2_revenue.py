@@ -196,7 +196,8 @@ def create_revenue_acquisition_layout():
                 html.Div([
                     # 獲得数 - プラン別カード（上部60%）
                     html.Div([
-                        make_scroll_card_with_dynamic_title("プラン別カード", "plan-cards", "detail-plan-title")
+                        make_scroll_card_with_dynamic_title("プラン別カード", "plan-cards", "detail-plan-title",
+                                                            progress_id="plan-cards-progress")
                     ], style={
                         'height': '60%',
                         'paddingBottom': '8px'
@@ -267,8 +268,11 @@ def create_revenue_acquisition_layout():
         'overflow': 'hidden'
     })
 
-def make_scroll_card_with_dynamic_title(default_title, body_id, title_id):
-    """動的タイトル付きスクロールカードを作成（一体型タイトルバー）"""
+def make_scroll_card_with_dynamic_title(default_title, body_id, title_id, progress_id=None):
+    """動的タイトル付きスクロールカードを作成（一体型タイトルバー、progress_id はバックグラウンド実行の進捗表示）"""
+    progress = [html.Div(id=progress_id, **{'aria-live': 'polite'},
+                         style={'flexShrink': 0, 'padding': '0 4px', 'fontSize': '0.7rem',
+                                'color': DARK_COLORS['text_muted']})] if progress_id else []
     return html.Div([
         html.Div(id=title_id, children=default_title, 
                 className='flex-row items-center card-header',
@@ -279,6 +283,7 @@ def make_scroll_card_with_dynamic_title(default_title, body_id, title_id):
                     'padding': '4px',
                     'marginBottom': '2px'
                 }),
+        *progress,
         html.Div(id=body_id, 
                 className='p-m',
                 **{
@@ -13,29 +13,38 @@ logger = logging.getLogger(__name__)
 
 # カスタムモジュールのインポート
 from config import DARK_COLORS, LAYOUT, ANIMATIONS
-from data_manager import data_manager, get_dataframe_from_store, get_last_data_month, clean_channel_names, clean_plan_names
+from data_manager import data_manager
 from components.header import create_header
-from components.loading import create_inline_loading_text
 from layouts.tab1_funnel import create_funnel_analysis_layout
 from layouts.tab2_revenue import create_revenue_acquisition_layout
 from callbacks.tab1_callbacks import register_tab1_callbacks
 from callbacks.tab2_callbacks import register_tab2_callbacks
+from utils.initial_layout import embed_section_outputs, set_outputs
+from utils.output_fingerprint import LAYOUT_VERSION_ID, RENDERER_HOOKS
+from utils import (admission, background, fanout, http_responses, memory_governor, metrics, prefetch, profiling,
+                   session_recorder, static_bundle, warmup)
 
 # Dashアプリケーションの初期化
 app = dash.Dash(__name__, 
-    external_stylesheets=[
+    # SFA_OFFLINE_ASSETS=1 の場合は vendor/ と assets/ をハッシュ付き・圧縮済みのバンドルで配信
+    external_stylesheets=static_bundle.stylesheets([
         dbc.themes.BOOTSTRAP,  # Bootstrap基本スタイル
         "https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap",
         "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css",
         "/assets/tab1-specific.css"  # Tab1専用CSS
-    ],
+    ]),
+    external_scripts=static_bundle.scripts(),
+    assets_ignore=static_bundle.assets_ignore(),
     suppress_callback_exceptions=True,
     meta_tags=[
         {"name": "viewport", "content": "width=device-width, initial-scale=1"},
         {"http-equiv": "X-UA-Compatible", "content": "IE=edge"},  # Edge互換性
     ],
     # 長いコールバック対応を無効化（Edge互換性向上）
-    long_callback_manager=None
+    # 重いコールバックは SFA_BACKGROUND=1 の場合のみ utils/background のマネージャーを個別に指定する
+    long_callback_manager=None,
+    # コールバックリクエストにセッションIDを付与（未変更出力の送信抑制用）
+    hooks=RENDERER_HOOKS
 )
 
 app.title = "SFA/CRM Analytics Dashboard"
@@ -557,63 +566,62 @@ app.index_string = f'''
             {{%config%}}
             {{%scripts%}}
             {{%renderer%}}
-            <script src="/assets/edge-polyfill.js"></script>
+            <script src="{static_bundle.asset_url('edge-polyfill.js', '/assets/edge-polyfill.js')}"></script>
         </footer>
     </body>
 </html>
 '''
 
 # メインレイアウト
-app.layout = html.Div([
-    # ヘッダー（タブ含む）
-    create_header(),
-    
-    # メインコンテンツエリア
-    html.Main([
-        # タブコンテンツ
-        html.Div(id='tab-content', **{
-            'role': 'tabpanel',
-            'aria-live': 'polite'
+def create_main_layout():
+    """データを含まないレイアウトの骨組み"""
+    return html.Div([
+        # ヘッダー（タブ含む）
+        create_header(),
+        
+        # メインコンテンツエリア
+        html.Main([
+            # タブコンテンツ
+            html.Div(id='tab-content', **{
+                'role': 'tabpanel',
+                'aria-live': 'polite'
+            }),
+        ], **{
+            'role': 'main'
         }),
-    ], **{
-        'role': 'main'
-    }),
-    
-    # Hidden stores for data
-    dcc.Store(id='data-type-state', data='plan_ratio'),
-    dcc.Store(id='period-type-state', data='cumulative'),
-    dcc.Store(id='active-tab', data='tab-1'),
-    dcc.Store(id='stage-cv-filter', data=None),
-    dcc.Store(id='analysis-type-state', data='acquisition'),  # 獲得/売上の状態管理
-    
-    # 初期化トリガー用のhidden div
-    html.Div(id='app-initialization', children='initialized', style={'display': 'none'})
-], style={
-    'minHeight': '100vh',
-    'backgroundColor': DARK_COLORS['bg_dark']
-})
-
-# グローバルコールバック: タブ切り替え
-@app.callback(
-    [Output('tab-content', 'children'),
-     Output('tab-1-button', 'style'),
-     Output('tab-2-button', 'style'),
-     Output('active-tab', 'data'),
-     Output('channel-filter-tab1-container', 'style'),
-     Output('channel-filter-tab2-container', 'style'),
-     Output('plan-filter-tab2-container', 'style'),
-     Output('acquisition-revenue-toggle-container', 'style'),
-     Output('btn-cumulative', 'disabled'),
-     Output('btn-single', 'disabled'),
-     Output('btn-cumulative', 'style'),
-     Output('btn-single', 'style')],
-    [Input('tab-1-button', 'n_clicks'),
-     Input('tab-2-button', 'n_clicks')],
-    [State('active-tab', 'data')]
-)
-def render_tab_content(tab1_clicks, tab2_clicks, active_tab):
-    ctx = dash.callback_context
-    
+        
+        # Hidden stores for data
+        dcc.Store(id='data-type-state', data='plan_ratio'),
+        dcc.Store(id='period-type-state', data='cumulative'),
+        dcc.Store(id='active-tab', data='tab-1'),
+        dcc.Store(id='stage-cv-filter', data=None),
+        dcc.Store(id='analysis-type-state', data='acquisition'),  # 獲得/売上の状態管理
+        
+        # レイアウトを作ったデータバージョン（未変更出力の送信抑制用、serve_layout で設定）
+        html.Div(id=LAYOUT_VERSION_ID, style={'display': 'none'})
+    ], style={
+        'minHeight': '100vh',
+        'backgroundColor': DARK_COLORS['bg_dark']
+    })
+
+# タブ切り替えで更新する出力
+TAB_OUTPUTS = [
+    Output('tab-content', 'children'),
+    Output('tab-1-button', 'style'),
+    Output('tab-2-button', 'style'),
+    Output('active-tab', 'data'),
+    Output('channel-filter-tab1-container', 'style'),
+    Output('channel-filter-tab2-container', 'style'),
+    Output('plan-filter-tab2-container', 'style'),
+    Output('acquisition-revenue-toggle-container', 'style'),
+    Output('btn-cumulative', 'disabled'),
+    Output('btn-single', 'disabled'),
+    Output('btn-cumulative', 'style'),
+    Output('btn-single', 'style'),
+]
+
+def create_tab_view(active_tab):
+    """アクティブなタブのコンテンツとヘッダーの表示状態（TAB_OUTPUTS の順）"""
     # 共通タブスタイル
     def get_tab_style(is_active=False, margin_right=None):
         style = {
@@ -630,14 +638,6 @@ def render_tab_content(tab1_clicks, tab2_clicks, active_tab):
             style['marginRight'] = margin_right
         return style
     
-    # どのボタンがクリックされたか判定
-    if ctx.triggered:
-        button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-        if button_id == 'tab-1-button':
-            active_tab = 'tab-1'
-        elif button_id == 'tab-2-button':
-            active_tab = 'tab-2'
-    
     # アクティブなタブに応じてスタイルを設定
     if active_tab == 'tab-1':
         tab1_style = get_tab_style(is_active=True, margin_right='8px')
@@ -672,73 +672,53 @@ def render_tab_content(tab1_clicks, tab2_clicks, active_tab):
             tab2_channel_filter_style, tab2_plan_filter_style, acquisition_revenue_toggle_style,
             cumulative_disabled, single_disabled, cumulative_style, single_style)
 
-# データアップロード処理（ローディング表示対応）
+# グローバルコールバック: タブ切り替え（初期表示はレイアウトに埋め込み済み）
 @app.callback(
-    [Output('month-selector', 'options'),
-     Output('month-selector', 'value'),
-     Output('channel-filter', 'options'),
-     Output('plan-filter', 'options'),
-     Output('channel-filter-tab1', 'options'),
-     Output('channel-filter-tab2', 'options'),
-     Output('plan-filter-tab2', 'options'),
-     Output('last-update-container', 'children')],
-    [Input('upload-data', 'contents'),
-     Input('app-initialization', 'children')],  # 初期化トリガーを追加
-    [State('upload-data', 'filename')]
+    TAB_OUTPUTS,
+    [Input('tab-1-button', 'n_clicks'),
+     Input('tab-2-button', 'n_clicks')],
+    [State('active-tab', 'data')],
+    prevent_initial_call=True
 )
-def handle_file_upload(contents, initialization_trigger, filename):
-    # ローディング表示を返す関数
-    def get_loading_state():
-        return ([], None, [], [], [], [], [], create_inline_loading_text("データを処理中..."))
+def render_tab_content(tab1_clicks, tab2_clicks, active_tab):
+    ctx = dash.callback_context
     
-    # アップロードファイルがある場合の処理
-    if contents is not None:
-        success, message = data_manager.update_data(contents, filename)
-    else:
-        # 初期化時：既存のデータがあるかチェック
-        existing_data = data_manager.get_data()
-        success = existing_data is not None
-        message = "サンプルデータ読み込み済み" if success else "データなし"
+    # どのボタンがクリックされたか判定
+    if ctx.triggered:
+        button_id = ctx.triggered[0]['prop_id'].split('.')[0]
+        if button_id == 'tab-1-button':
+            active_tab = 'tab-1'
+        elif button_id == 'tab-2-button':
+            active_tab = 'tab-2'
     
+    return create_tab_view(active_tab)
+
+# データの読み込みで更新する出力
+DATA_OUTPUTS = [
+    Output('month-selector', 'options'),
+    Output('month-selector', 'value'),
+    Output('channel-filter', 'options'),
+    Output('plan-filter', 'options'),
+    Output('channel-filter-tab1', 'options'),
+    Output('channel-filter-tab2', 'options'),
+    Output('plan-filter-tab2', 'options'),
+    Output('last-update-container', 'children'),
+]
+
+def create_data_selections(success, message):
+    """公開中のデータの選択肢・既定の月・最終更新表示（DATA_OUTPUTS の順）"""
     if success:
-        data = data_manager.get_data()
+        catalog = data_manager.get_catalog()
         
-        # 月選択オプションを生成
-        month_options = []
-        if 'sales' in data and 'budget' in data['sales']:
-            budget_df = get_dataframe_from_store(data, 'sales', 'budget')
-            if budget_df is not None and not budget_df.empty:
-                month_cols = [col for col in budget_df.columns if col.endswith('月')]
-                month_options = [{'label': month, 'value': month} for month in month_cols]
+        # 月選択オプションを生成（取り込み時に作成済みのカタログを使用）
+        month_options = [{'label': month, 'value': month} for month in catalog['months']]
         
-        # チャネルオプションを生成
-        channel_options = []
-        if 'sales' in data and 'actual' in data['sales']:
-            actual_data = get_dataframe_from_store(data, 'sales', 'actual')
-            if actual_data is not None and not actual_data.empty:
-                raw_channels = actual_data['channel'].dropna().unique()
-                cleaned_channels = clean_channel_names(raw_channels)
-                channel_options = [{'label': ch, 'value': ch} for ch in sorted(cleaned_channels)]
-        
-        # プランオプションを生成
-        plan_options = []
-        if 'sales' in data and 'actual' in data['sales']:
-            actual_data = get_dataframe_from_store(data, 'sales', 'actual')
-            if actual_data is not None and not actual_data.empty:
-                raw_plans = actual_data['plan'].dropna().unique()
-                cleaned_plans = clean_plan_names(raw_plans)
-                plan_options = [{'label': plan, 'value': plan} for plan in sorted(cleaned_plans)]
+        # チャネル・プランオプションを生成
+        channel_options = [{'label': ch, 'value': ch} for ch in data_manager.get_channels('sales')]
+        plan_options = [{'label': plan, 'value': plan} for plan in data_manager.get_plans('sales')]
         
         # デフォルト月を設定
-        default_month = None
-        if month_options and 'sales' in data and 'actual' in data['sales']:
-            actual_data = get_dataframe_from_store(data, 'sales', 'actual')
-            if actual_data is not None and not actual_data.empty:
-                month_cols = [col for col in actual_data.columns if col.endswith('月')]
-                default_month = get_last_data_month(actual_data, month_cols)
-        
-        if default_month is None and month_options:
-            default_month = month_options[-1]['value']
+        default_month = catalog['default_month'] if month_options else None
         
         # 成功時の更新表示
         last_update_display = html.Span(
@@ -770,6 +750,17 @@ def handle_file_upload(contents, initialization_trigger, filename):
         )
         return [], None, [], [], [], [], [], error_display
 
+# データアップロード処理（初期表示はレイアウトに埋め込み済み）
+@app.callback(
+    DATA_OUTPUTS,
+    [Input('upload-data', 'contents')],
+    [State('upload-data', 'filename')],
+    prevent_initial_call=True
+)
+def handle_file_upload(contents, filename):
+    success, message = data_manager.update_data(contents, filename)
+    return create_data_selections(success, message)
+
 # ボタン状態管理: 計画比/計画差
 @app.callback(
     [Output('btn-plan-ratio', 'className'),
@@ -843,6 +834,50 @@ def update_analysis_type_buttons(acquisition_clicks, revenue_clicks, current_sta
 register_tab1_callbacks(app)
 register_tab2_callbacks(app)
 
+def serve_layout():
+    """ページ読み込みごとのレイアウト（公開中のデータの選択肢・既定の月・初期表示の出力を埋め込む）"""
+    layout = create_main_layout()
+    set_outputs(layout, TAB_OUTPUTS, create_tab_view('tab-1'))
+    set_outputs(layout, DATA_OUTPUTS, create_data_selections(data_manager.get_data() is not None, "データなし"))
+    # 既定の月・フィルタなしのタブ1の出力（セクション依存コールバックの計算結果）
+    embed_section_outputs(app, layout, lambda: data_manager.version)
+    return layout
+
+app.layout = serve_layout
+
+# 応答の圧縮と _dash-layout・_dash-dependencies の ETag（他のフックより先に登録し、圧縮は最後に行う）
+http_responses.init_app(app, data_version=data_manager.get_layout_version)
+
+# 計測（SFA_METRICS=1 の場合のみ /metrics を公開）
+metrics.init_app(app, data_version=lambda: data_manager.version)
+
+# プロファイリング（SFA_PROFILE=1 または管理者用 ?profile=<SFA_PROFILE_TOKEN> で有効）
+profiling.init_app(app)
+
+# セッション再生用のリクエスト記録（SFA_RECORD=1 で有効）
+session_recorder.init_app(app)
+
+# 操作別のコールバック呼び出し数・重複計算の分析（SFA_FANOUT=1 で /_fanout を公開）
+fanout.init_app(app)
+
+# オフライン用アセットの配信（SFA_OFFLINE_ASSETS=1 で有効）
+static_bundle.init_app(app)
+
+# 前後の月・反対の切り替え状態の投機計算（SFA_PREFETCH=1 で有効、流入制御で待っている間も処理中として数える）
+prefetch.init_app(app)
+
+# 重いコールバックの同時実行数の制限と優先度付きの待ち行列（SFA_ADMISSION=1 で有効、計測のフックより後に登録）
+admission.init_app(app)
+
+# データ公開後のウォームアップと /healthz・/readyz（SFA_WARMUP=0 で無効）
+warmup.init_app(app, data_manager)
+
+# キャッシュのメモリ使用量の報告と RSS の予算による削減（SFA_MEMORY_BUDGET_MB で予算を設定）
+memory_governor.init_app(app, data_manager)
+
+# 重いコールバックのバックグラウンド実行（SFA_BACKGROUND=1 で有効、データの公開時にプロセスプールを作り直す）
+background.init_app(app, data_manager)
+
 # 起動時のサンプルデータ自動読み込み
 def load_sample_data_on_startup():
     """起動時にサンプルデータを自動読み込み"""
@@ -917,6 +952,10 @@ if __name__ == '__main__':
         debug_mode = True
         host_ip = '0.0.0.0'
     
+    # リローダーの監視用プロセスではウォームアップしない
+    if not debug_mode or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warmup.warmer.start()
+    
     try:
         app.run_server(
             debug=debug_mode,
@@ -36,20 +36,24 @@ from layouts.tab1_funnel import create_funnel_analysis_layout
 from layouts.tab2_revenue import create_revenue_acquisition_layout
 from callbacks.tab1_callbacks import register_tab1_callbacks
 from callbacks.tab2_callbacks import register_tab2_callbacks
+from utils import static_bundle
 
 # Dashアプリケーションの初期化
 app = dash.Dash(
     __name__,
-    external_stylesheets=[
+    external_stylesheets=static_bundle.stylesheets([
         dbc.themes.BOOTSTRAP,
         'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0-beta3/css/all.min.css'
-    ],
+    ]),
+    external_scripts=static_bundle.scripts(),
+    assets_ignore=static_bundle.assets_ignore(),
     suppress_callback_exceptions=True,
     title="SFA/CRM Analytics Dashboard"
 )
 
 # サーバーインスタンスを取得
 server = app.server
+static_bundle.init_app(app)
 
 def open_browser():
     """3秒待ってからブラウザを開く"""
@@ -0,0 +1,65 @@
+"""
+重いコールバックの流入制御のテスト
+"""
+import threading
+import time
+
+import pytest
+
+from utils.admission import AdmissionController, Busy, Superseded
+
+
+def _wait_queued(controller, count):
+    deadline = time.monotonic() + 2
+    while controller.queued() < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_heavy_callbacks_are_bounded_prioritised_and_collapsed():
+    """重いものだけ枠を使い、同じ出力の古い待ちは打ち切り、ユーザー操作を先に実行すること"""
+    controller = AdmissionController(slots=1, max_queue=8, max_wait=5, heavy_seconds=0.2, heavy=['grid'])
+    assert controller.admit('title') is False
+    assert controller.admit('grid') is True
+
+    order, results = [], {}
+
+    def wait(name, key, background=False):
+        try:
+            controller.admit('grid', key=key, background=background)
+            order.append(name)
+            controller.release('grid', 0.3, True)
+        except Superseded:
+            results[name] = 'superseded'
+
+    threads = [threading.Thread(target=wait, args=('warmup', ('warmup-1', 'grid'), True))]
+    threads[0].start()
+    _wait_queued(controller, 1)
+    for name in ('old', 'new'):
+        threads.append(threading.Thread(target=wait, args=(name, ('browser', 'grid'))))
+        threads[-1].start()
+        _wait_queued(controller, 2)
+    time.sleep(0.05)
+    controller.release('grid', 0.3, True)
+    for thread in threads:
+        thread.join(2)
+    assert results == {'old': 'superseded'}
+    assert order == ['new', 'warmup']
+    assert controller.running == 0
+
+
+def test_busy_when_queue_is_full_or_wait_expires():
+    """待ち行列があふれたら即座に、待ち時間を超えたら上限で busy になること"""
+    controller = AdmissionController(slots=1, max_queue=1, max_wait=0.2, heavy_seconds=0.2, heavy=[])
+    controller.release('chart', 0.5, False)
+    assert controller.is_heavy('chart') and not controller.is_heavy('title')
+    assert controller.admit('chart') is True
+
+    waiter = threading.Thread(target=lambda: pytest.raises(Busy, controller.admit, 'chart'))
+    waiter.start()
+    _wait_queued(controller, 1)
+    start = time.monotonic()
+    with pytest.raises(Busy):
+        controller.admit('chart')
+    assert time.monotonic() - start < 0.1
+    waiter.join(2)
+    assert controller.queued() == 0
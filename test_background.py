@@ -0,0 +1,91 @@
+"""
+重いコールバックのバックグラウンド実行のテスト
+"""
+import time
+
+import dash
+from dash import Input, Output, dcc, html
+
+from utils.background import LocalCallbackManager, report_progress
+from utils.output_fingerprint import skip_unchanged_outputs
+from utils.renderer_session import FlaskClientTransport, RendererSession, load_dependencies
+
+
+def _count(steps, delay):
+    for index in range(steps):
+        report_progress(index, steps)
+        time.sleep(delay)
+    return {'children': f'{steps} steps'}
+
+
+def _wait(manager, job, timeout=10):
+    deadline = time.monotonic() + timeout
+    progress = []
+    while manager.job_running(job) and time.monotonic() < deadline:
+        progress.append(manager.get_progress('count'))
+        time.sleep(0.02)
+    return [value for value in progress if value]
+
+
+def test_job_runs_in_pool_reports_progress_and_reuses_result(tmp_path):
+    """プロセスプールで計算して進捗と結果を保存し、同じキーは計算し直さないこと"""
+    manager = LocalCallbackManager('test-run', str(tmp_path / 'jobs.sqlite3'), workers=1, cache_by=[lambda: 'v1'])
+    try:
+        job_fn = manager.make_job_fn(_count, True, 'count-fn')
+        job = manager.call_job_fn('count', job_fn, [5, 0.1], {})
+        progress = _wait(manager, job)
+        assert progress and all(value[0].startswith('計算中') for value in progress)
+        assert manager.status(job)['status'] == 'done'
+        assert manager.get_result('count', job) == {'children': '5 steps'}
+
+        again = manager.call_job_fn('count', job_fn, [5, 0.1], {})
+        assert not manager.job_running(again)
+        assert manager.get_result('count', again) == {'children': '5 steps'}
+    finally:
+        manager.shutdown()
+
+
+def test_cancelled_job_stops_at_next_progress_report(tmp_path):
+    """取り消したジョブは次の進捗報告で中断し、結果を保存しないこと"""
+    manager = LocalCallbackManager('test-cancel', str(tmp_path / 'jobs.sqlite3'), workers=1, cache_by=[lambda: 'v1'])
+    try:
+        job_fn = manager.make_job_fn(_count, True, 'count-fn')
+        job = manager.call_job_fn('count', job_fn, [100, 0.05], {})
+        deadline = time.monotonic() + 10
+        while manager.status(job).get('status') != 'running' and time.monotonic() < deadline:
+            time.sleep(0.02)
+
+        manager.terminate_job(job)
+        start = time.monotonic()
+        _wait(manager, job)
+        assert time.monotonic() - start < 1
+        assert manager.status(job)['status'] == 'cancelled'
+        assert manager.get_result('count', job) is manager.UNDEFINED
+    finally:
+        manager.shutdown()
+
+
+def test_results_from_pool_are_remembered_as_sent(tmp_path):
+    """プールで計算した結果も送信済みとして記録し、A → B → A の切り替えで A を送り直すこと"""
+    manager = LocalCallbackManager('test-held', str(tmp_path / 'jobs.sqlite3'), workers=1, cache_by=[lambda: 'v1'])
+    try:
+        app = dash.Dash(__name__)
+        app.layout = html.Div([dcc.Store(id='month', data='A'), html.Div(id='grid')])
+
+        def render(month):
+            return f'grid {month}'
+
+        render.is_cached = lambda month: month == 'A'  # A は計算済み（リクエスト内で返す）、B はプールで計算
+        app.callback(Output('grid', 'children'), Input('month', 'data'),
+                     background=True, manager=manager, interval=50)(skip_unchanged_outputs(render))
+
+        transport = FlaskClientTransport(app.server)
+        session = RendererSession(transport, load_dependencies(transport), 'held-test')
+        session.load_page()
+        shown = []
+        for month in ('B', 'A'):
+            session.select('month', 'data', month)
+            shown.append(session.props.get(('grid', 'children')))
+        assert shown == ['grid B', 'grid A']
+    finally:
+        manager.shutdown()
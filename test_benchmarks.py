@@ -0,0 +1,32 @@
+"""
+ベンチマークスイート（比較処理）のテスト
+"""
+from benchmarks.run_benchmarks import compare_results, scale_dataset
+
+
+def _report(**medians):
+    return {'results': {name: {'1': {'median_ms': value}} for name, value in medians.items()}}
+
+
+def test_compare_flags_regressions_with_thresholds():
+    """閾値を超えた劣化・改善が判定され、個別閾値と誤差範囲が反映されること"""
+    baseline = _report(a=10.0, b=10.0, c=10.0, d=0.01)
+    current = _report(a=13.0, b=13.0, c=5.0, d=0.05, e=1.0)
+    rows = {row['name']: row for row in compare_results(current, baseline, threshold=1.25, thresholds={'b': 1.5})}
+
+    assert rows['a']['status'] == 'regression'
+    assert rows['b']['status'] == 'ok'
+    assert rows['c']['status'] == 'improvement'
+    assert rows['d']['status'] == 'ok'  # 差が誤差範囲内
+    assert 'e' not in rows  # ベースラインにないものは比較しない
+
+
+def test_scale_dataset_replicates_detail_rows_only():
+    """見出し行と合計行は1行のまま、明細行のみ複製されること"""
+    data = {'sales': {'actual': [
+        {'channel': '売上高', 'plan': ''},
+        {'channel': '新規（WEB）', 'plan': 'アプリ'},
+        {'channel': '合計', 'plan': ''},
+    ]}}
+    rows = scale_dataset(data, 3)['sales']['actual']
+    assert [r['channel'] for r in rows] == ['売上高'] + ['新規（WEB）'] * 3 + ['合計']
@@ -0,0 +1,44 @@
+"""
+列指向レコード（app_preload のコンパクト化）のテスト
+"""
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from benchmarks.golden_outputs import check
+from data_manager import apply_delta_rows, diff_datasets, get_dataframe_from_store, section_digest
+from utils.compact_records import ColumnarRecords, compact_dataset
+
+
+def _records():
+    return [
+        {'channel': '売上高', 'plan': '', 'section': 'sales', '1月': 1.0, '2月': 2, '合計': None},
+        {'channel': '新規（WEB）', 'plan': 'アプリ', 'section': 'sales', '1月': 10.5, '2月': 3, '合計': 4.0},
+        {'channel': '', 'plan': '計', 'section': 'sales', '1月': float('nan'), '2月': 7, '合計': 4},
+    ]
+
+
+def test_columnar_records_behave_like_dict_list():
+    """行・DataFrame・ダイジェスト・差分・差分CSVの結果が dict のリストと同じになること"""
+    records = _records()
+    compact = ColumnarRecords.from_records(records)
+    assert compact[1] == records[1] and compact[-1]['2月'] == 7 and type(compact[0]['2月']) is int
+    assert [row['channel'] for row in compact] == [row['channel'] for row in records]
+    assert_frame_equal(compact.to_frame(), pd.DataFrame(records))
+    assert ColumnarRecords.from_records(records[:1] + [{'channel': 'x'}]) is None
+
+    data = {'sales': {'actual': records, 'budget': []}}
+    compacted = compact_dataset(data)
+    assert isinstance(compacted['sales']['actual'], ColumnarRecords)
+    assert_frame_equal(get_dataframe_from_store(compacted, 'sales', 'actual'), pd.DataFrame(records))
+    assert section_digest(compacted['sales']) == section_digest(data['sales'])
+    assert not diff_datasets(compacted, data)
+
+    rows = [{'line': 2, 'channel': '新規（WEB）', 'plan': 'アプリ', 'section': 'sales', 'value': '20'}]
+    updated, changes, applied, _ = apply_delta_rows(compacted, rows, '2月')
+    assert applied == 1 and updated['sales']['actual'][1]['2月'] == 20
+    assert compacted['sales']['actual'][1]['2月'] == 3
+
+
+def test_compacted_dataset_matches_golden():
+    """列指向に変換したデータでも集計結果がゴールデン出力と一致すること"""
+    assert check('sample', stride=40, compact=True) == []
@@ -0,0 +1,39 @@
+"""
+ワーカー・再起動をまたいで共有するディスクキャッシュのテスト
+"""
+import os
+
+from utils.disk_cache import DiskCache, result_store
+
+
+def test_results_are_shared_across_instances_until_code_changes(tmp_path):
+    """別のワーカー・再起動後も同じ結果を返し、世代が変わったら破棄されること"""
+    path = str(tmp_path / 'results.sqlite3')
+    key = ('callbacks', 'update_grid', ('v1',), '["1月"]')
+    worker = DiskCache(path, max_bytes=10_000, generation='a')
+    worker.put(key, {'props': {'children': '1月'}, 'type': 'Div', 'namespace': 'dash_html_components'})
+
+    restarted = DiskCache(path, max_bytes=10_000, generation='a')
+    assert restarted.get(key) == {'props': {'children': '1月'}, 'type': 'Div', 'namespace': 'dash_html_components'}
+    assert restarted.get(key[:2] + (('v2',), key[3])) is None
+
+    deployed = DiskCache(path, max_bytes=10_000, generation='b')
+    assert deployed.get(key) is None
+    assert deployed.stats()['entries'] == 0
+
+    # 既定の保存先は他のユーザーが読み書きできないディレクトリ
+    assert not os.stat(os.path.dirname(result_store.path)).st_mode & 0o077
+
+
+def test_eviction_keeps_recently_used_results_within_budget(tmp_path):
+    """合計サイズが上限を超えたら最近使われていないものから削除されること"""
+    cache = DiskCache(str(tmp_path / 'results.sqlite3'), max_bytes=1000, generation='a')
+    for index in range(5):
+        cache.put(('key', index), 'x' * 198)
+    assert cache.stats()['entries'] == 5
+
+    cache.put(('key', 5), 'x' * 198)
+    stats = cache.stats()
+    assert stats['bytes'] <= 900
+    assert cache.get(('key', 0)) is None and cache.get(('key', 1)) is None
+    assert cache.get(('key', 5)) == 'x' * 198
@@ -0,0 +1,72 @@
+"""
+コールバックのファンアウト分析のテスト
+"""
+import dash
+from dash import Input, Output, dcc, html
+
+from utils import fanout
+
+
+def _app():
+    app = dash.Dash(__name__)
+    app.layout = html.Div([html.Button(id='btn'), dcc.Store(id='flt'), html.Div(id='a'), html.Div(id='b')])
+
+    @app.callback(Output('flt', 'data'), [Input('btn', 'n_clicks')])
+    def select(n_clicks):
+        return n_clicks
+
+    @app.callback(Output('a', 'children'), [Input('flt', 'data')])
+    def render_a(value):
+        fanout.note('apply_filters', value)
+        return value
+
+    @app.callback(Output('b', 'children'), [Input('flt', 'data')])
+    def render_b(value):
+        fanout.note('apply_filters', value)
+        return value
+
+    fanout.init_app(app)
+    return app
+
+
+def _post(client, output, prop_id, value, session='browser-1'):
+    component, prop = prop_id.split('.')
+    return client.post('/_dash-update-component', json={
+        'output': f'{output}', 'outputs': {'id': output.split('.')[0], 'property': output.split('.')[1]},
+        'inputs': [{'id': component, 'property': prop, 'value': value}], 'changedPropIds': [prop_id],
+        'sessionId': session,
+    })
+
+
+def test_chained_callbacks_are_grouped_into_one_action(monkeypatch):
+    """クリックから連鎖した呼び出しが1つの操作にまとまり、重複計算が数えられること"""
+    monkeypatch.setattr(fanout, 'enabled', True)
+    monkeypatch.setattr(fanout, 'builder', fanout.TraceBuilder(window=5))
+    client = _app().server.test_client()
+    for clicks in (1, 2):
+        _post(client, 'flt.data', 'btn.n_clicks', clicks)
+        _post(client, 'a.children', 'flt.data', clicks)
+        _post(client, 'b.children', 'flt.data', clicks)
+
+    report = client.get('/_fanout.json').get_json()
+    [row] = report['actions']
+    assert row['action'] == 'btn.n_clicks' and row['traces'] == 2
+    assert row['mean_fanout'] == 3 and row['mean_redundant'] == 1
+    assert row['redundant_by_kind'] == {'apply_filters': 2}
+    assert row['callbacks'] == {'select': 2, 'render_a': 2, 'render_b': 2}
+    assert 'btn.n_clicks' in client.get('/_fanout').get_data(as_text=True)
+
+
+def test_trace_builder_splits_actions_by_trigger_and_time():
+    """別の入力・時間の空いた呼び出しは新しい操作になり、パターンIDは type で集計されること"""
+    builder = fanout.TraceBuilder(window=1.0)
+    card = '{"channel":"web","type":"trend-card"}.n_clicks'
+    first = builder.add('s', 'cb1', [card], 0.0, 0.1, outputs={'flt.data'})
+    assert builder.add('s', 'cb2', ['flt.data'], 0.2, 0.3) is first
+    assert builder.add('s', 'cb3', [], 0.4, 0.5) is first
+    assert builder.add('s', 'cb4', [card], 0.5, 0.6, trigger_values={card: '2'}) is not first
+    second = builder.add('s', 'cb1', ['month.value'], 0.6, 0.7, trigger_values={'month.value': "'5月'"})
+    assert builder.add('s', 'cb5', ['month.value'], 0.6, 0.7, trigger_values={'month.value': "'5月'"}) is second
+    assert builder.add('s', 'cb2', ['flt.data'], 5.0, 5.1).action == 'flt.data'
+    assert builder.add('other', 'cb2', ['flt.data'], 0.2, 0.3) is not first
+    assert first.action == 'trend-card.n_clicks' and len(first.calls) == 3
@@ -0,0 +1,57 @@
+"""
+フィルタ結果キャッシュのテスト
+"""
+import pandas as pd
+
+from data_manager import apply_filters, _apply_filters_uncached
+from utils.cache_utils import FilterKey, LRUCache
+
+
+def _sample_df():
+    """階層構造（チャネル名が空のサブプラン行）を含むサンプル"""
+    return pd.DataFrame([
+        {'channel': '売上高', 'plan': '', '1月': 1},
+        {'channel': '新規（WEB）', 'plan': 'アプリ', '1月': 10},
+        {'channel': '', 'plan': 'スタンド', '1月': 20},
+        {'channel': '新規（WEB）', 'plan': '計', '1月': 30},
+        {'channel': '既存（25年以前）', 'plan': 'アプリ', '1月': 40},
+        {'channel': 'フロー①', 'plan': '通販', '1月': 50},
+        {'channel': '合計', 'plan': '', '1月': 160},
+    ])
+
+
+def test_filter_key_is_canonical():
+    """チャネル別名とプランの順序が正規化されること"""
+    assert FilterKey.from_filters(['新規web'], ['b', 'a']) == FilterKey.from_filters(['新規（WEB）'], ['a', 'b', 'a'])
+    assert FilterKey.from_filters([], None) == FilterKey.from_filters(None, [])
+    assert hash(FilterKey.from_filters(['既存'], None)) == hash(FilterKey.from_filters(['既存'], ()))
+
+
+def test_cached_filters_match_uncached():
+    """キャッシュ経由の結果が従来の処理と一致すること"""
+    df = _sample_df()
+    cases = [
+        (None, None), (['新規web'], None), (['既存', 'フロー'], None),
+        (None, ['アプリ']), (['新規web'], ['スタンド']), (['存在しない'], None),
+    ]
+    for channel_filter, plan_filter in cases:
+        for _ in range(2):
+            cached = apply_filters(df, channel_filter, plan_filter)
+            expected = _apply_filters_uncached(df, channel_filter, plan_filter)
+            assert cached.equals(expected)
+            assert list(cached.index) == list(expected.index)
+
+
+def test_lru_cache_stats_and_eviction():
+    """LRUの追い出しとヒット率が記録されること"""
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    stats = cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['size'] == 2
+
+    cache.set_version(1)
+    assert len(cache) == 0
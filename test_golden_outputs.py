@@ -0,0 +1,40 @@
+"""
+ゴールデン出力との一致検証
+"""
+import pytest
+
+import data_manager
+from benchmarks import golden_outputs
+from utils.cache_utils import derived_cache
+
+
+@pytest.mark.parametrize('name', list(golden_outputs.WORKBOOKS))
+def test_current_engine_matches_golden(name):
+    """現在の実装が記録済みの結果と一致すること（間引いて検証）"""
+    assert golden_outputs.check(name, stride=40) == []
+
+
+def test_cached_path_matches_golden(monkeypatch):
+    """公開中データとしてキャッシュを経由した結果も記録と一致すること"""
+    data = golden_outputs.load_workbook_data('sample')
+    monkeypatch.setattr(data_manager.data_manager, 'snapshot', (data, {}, data_manager.build_dimension_catalog(data)))
+    derived_cache.clear()
+    monkeypatch.setattr(golden_outputs, 'load_workbook_data', lambda name: data)
+    # 2回目はキャッシュから返る
+    assert golden_outputs.check('sample', stride=40) == []
+    assert golden_outputs.check('sample', stride=40) == []
+    derived_cache.clear()
+
+
+def test_changed_semantics_are_detected():
+    """獲得件数の単月値から負の値を除くような変更が不一致として検出されること"""
+    engine = golden_outputs.current_engine()
+    calculate = engine.calculate_kpi_values
+
+    def clamped(data, section, *args):
+        actual, budget = calculate(data, section, *args)
+        return (max(actual, 0), budget) if section == 'acquisition' else (actual, budget)
+
+    engine.calculate_kpi_values = clamped
+    mismatches = golden_outputs.check('sample', engine=engine, stride=11)
+    assert mismatches and all(key.startswith('kpi|acquisition|') for key in mismatches)
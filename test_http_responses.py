@@ -0,0 +1,73 @@
+"""
+応答の圧縮・条件付きキャッシュのテスト
+"""
+import gzip
+
+import dash
+import flask
+from dash import Input, Output, html
+
+import data_manager as data_manager_module
+from data_manager import DataManager
+from utils import http_responses
+
+
+def _app(version):
+    app = dash.Dash(__name__)
+    app.layout = html.Div([html.Div(id='in'), html.Div(id='out')])
+
+    @app.callback(Output('out', 'children'), [Input('in', 'children')])
+    def render(value):
+        return 'x' * 5000
+
+    @app.server.route('/stream')
+    def stream():
+        return flask.Response((f'{i:04d}\n' * 100 for i in range(10)), mimetype='text/plain')
+
+    http_responses.init_app(app, data_version=lambda: version['value'])
+    return app
+
+
+def test_large_responses_are_compressed_and_streams_compressed_incrementally():
+    """しきい値以上の応答とストリーミング応答が gzip で返り、小さい応答・非対応クライアントは圧縮しないこと"""
+    client = _app({'value': 1}).server.test_client()
+    response = client.post('/_dash-update-component', headers={'Accept-Encoding': 'gzip'}, json={
+        'output': 'out.children', 'outputs': {'id': 'out', 'property': 'children'},
+        'inputs': [{'id': 'in', 'property': 'children', 'value': None}], 'changedPropIds': [],
+    })
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'x' * 5000 in gzip.decompress(response.data).decode('utf-8')
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+    streamed = client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+    assert streamed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(streamed.data).decode('utf-8').count('\n') == 1000
+    assert 'Content-Encoding' not in client.get('/stream').headers
+    assert 'Content-Encoding' not in client.get('/_dash-dependencies', headers={'Accept-Encoding': 'gzip'}).headers
+
+
+def test_layout_etag_changes_with_data_version(monkeypatch):
+    """同じビルド・データバージョンでは 304 になり、データ・最終更新時刻が更新されると新しい内容を返すこと"""
+    version = {'value': 1}
+    client = _app(version).server.test_client()
+    first = client.get('/_dash-layout')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and etag.startswith('W/') and first.headers['Cache-Control'] == 'no-cache'
+
+    cached = client.get('/_dash-layout', headers={'If-None-Match': etag})
+    assert cached.status_code == 304 and not cached.data
+
+    version['value'] = 2
+    updated = client.get('/_dash-layout', headers={'If-None-Match': etag})
+    assert updated.status_code == 200 and updated.headers['ETag'] != etag
+    assert client.get('/_dash-dependencies', headers={'If-None-Match': etag}).status_code == 200
+
+    # データに変更がない再アップロードでも最終更新時刻の表示が変わるため ETag を変える
+    manager = DataManager()
+    manager._caches = []
+    block = {'sales': {'actual': [{'channel': 'A', 'plan': 'x', '1月': 1}]}}
+    monkeypatch.setattr(data_manager_module, 'process_excel_data', lambda contents: (block, 'ok'))
+    manager.update_data('contents', 'a.xlsx')
+    layout_version = manager.get_layout_version()
+    manager.update_data('contents', 'a.xlsx')
+    assert manager.version == 1 and manager.get_layout_version() != layout_version
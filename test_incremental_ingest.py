@@ -0,0 +1,108 @@
+"""
+差分取り込み（再アップロード時のセル単位差分）のテスト
+"""
+import copy
+
+from data_manager import apply_delta_rows, diff_datasets, merge_datasets, parse_delta_csv
+from utils.cache_utils import ChangeSet, FootprintCache
+
+
+def _sample_data():
+    """2セクションの最小データ"""
+    def rows(section, values):
+        return [
+            {'channel': '新規（WEB）', 'plan': 'アプリ', 'section': section, '1月': values[0], '2月': values[1]},
+            {'channel': '既存（25年以前）', 'plan': 'アプリ', 'section': section, '1月': 5, '2月': 5},
+        ]
+    return {
+        'sales': {'actual': rows('sales', [10, 0]), 'budget': rows('sales', [10, 10])},
+        'retention': {'actual': rows('retention', [1, 1]), 'budget': rows('retention', [1, 1])},
+    }
+
+
+def test_diff_reports_changed_cells_only():
+    """変更セルのみが (section, channel, month) として検出されること"""
+    old = _sample_data()
+    new = copy.deepcopy(old)
+    new['sales']['budget'][0]['1月'] = 12
+
+    changes = diff_datasets(old, new)
+    assert not changes.structural
+    assert changes.blocks == {('sales', 'budget')}
+    assert changes.footprints == {('sales', '新規（WEB）', '1月')}
+    assert not diff_datasets(old, copy.deepcopy(old))
+
+
+def test_diff_marks_moved_last_data_month():
+    """最終データ月が動いた場合は全チャネルの該当月が変更扱いになること"""
+    old = _sample_data()
+    old['sales']['actual'][1]['2月'] = 0
+    new = copy.deepcopy(old)
+    new['sales']['actual'][0]['2月'] = 3
+
+    changes = diff_datasets(old, new)
+    assert ('sales', None, '2月') in changes.footprints
+    assert changes.touches('sales', ('既存（25年以前）',), ('2月',))
+    assert not changes.touches('sales', ('既存（25年以前）',), ('1月',))
+
+
+def test_merge_shares_unchanged_blocks():
+    """変更のないブロックと行は既存オブジェクトを共有すること"""
+    old = _sample_data()
+    new = copy.deepcopy(old)
+    new['sales']['actual'][0]['1月'] = 11
+
+    merged = merge_datasets(old, new, diff_datasets(old, new))
+    assert merged['retention']['actual'] is old['retention']['actual']
+    assert merged['sales']['budget'] is old['sales']['budget']
+    assert merged['sales']['actual'][1] is old['sales']['actual'][1]
+    assert merged['sales']['actual'][0]['1月'] == 11
+
+
+def test_footprint_cache_invalidates_intersecting_entries():
+    """変更範囲と重なるエントリのみ無効化されること"""
+    cache = FootprintCache(maxsize=10)
+    cache.put('web', 1, ('sales', ('新規（WEB）',), ('1月',)))
+    cache.put('existing', 2, ('sales', ('既存（25年以前）',), ('1月',)))
+    cache.put('all', 3, ('sales', None, None))
+    cache.put('retention', 4, ('retention', None, None))
+
+    changes = ChangeSet()
+    changes.add('sales', 'actual', '新規（WEB）', '1月')
+    cache.invalidate(changes, version=2)
+
+    assert cache.get('web') is None and cache.get('all') is None
+    assert cache.get('existing') == 2 and cache.get('retention') == 4
+
+    # 無効化より前のバージョンで計算した結果は格納しない
+    cache.put('web', 5, ('sales', ('新規（WEB）',), ('1月',)), version=1)
+    assert cache.get('web') is None
+    cache.put('web', 6, ('sales', ('新規（WEB）',), ('1月',)), version=2)
+    assert cache.get('web') == 6
+
+
+def test_delta_csv_updates_cell_and_subtotals():
+    """差分CSVで実績セルと「計」「合計」行が更新され、他のブロックは共有されること"""
+    data = {
+        'sales': {
+            'actual': [
+                {'channel': '売上高', 'plan': '', 'section': 'sales', '1月': 0, '2月': 0},
+                {'channel': '新規（WEB）', 'plan': 'アプリ', 'section': 'sales', '1月': 10, '2月': 0},
+                {'channel': '', 'plan': 'スタンド', 'section': 'sales', '1月': 5, '2月': 0},
+                {'channel': '新規（WEB）', 'plan': '計', 'section': 'sales', '1月': 15, '2月': 0},
+                {'channel': '合計', 'plan': '', 'section': 'sales', '1月': 15, '2月': 0},
+            ],
+        },
+        'retention': {'actual': []},
+    }
+    rows = parse_delta_csv('channel,plan,section,value\n新規web,スタンド,売上高,8\n新規web,なし,sales,1\n')
+    new_data, changes, applied, rejected = apply_delta_rows(data, rows, '2月')
+
+    actual = new_data['sales']['actual']
+    assert applied == 1 and [line for line, _ in rejected] == [3]
+    assert [actual[i]['2月'] for i in (2, 3, 4)] == [8, 8, 8]
+    assert data['sales']['actual'][2]['2月'] == 0
+    assert actual[1] is data['sales']['actual'][1]
+    assert new_data['retention'] is data['retention']
+    assert ('sales', '新規（WEB）', '2月') in changes.footprints
+    assert ('sales', None, '2月') in changes.footprints
@@ -0,0 +1,41 @@
+"""
+初期表示の出力を埋め込んだレイアウトのテスト
+"""
+import json
+
+from data_manager import data_manager
+from main import app
+from utils.renderer_session import FlaskClientTransport, RendererSession, load_dependencies, walk
+
+
+def _session(records):
+    transport = FlaskClientTransport(app.server)
+    return RendererSession(transport, load_dependencies(transport), 'initial-layout-test', records)
+
+
+def test_layout_embeds_selections_and_tab1_outputs():
+    """レイアウトだけで月の選択肢・既定の月・タブ1の出力が揃っていること"""
+    response = app.server.test_client().get('/_dash-layout')
+    props = {cid: p for cid, p in walk(json.loads(response.get_data())) if isinstance(cid, str)}
+    catalog = data_manager.get_catalog()
+    assert props['month-selector']['value'] == catalog['default_month']
+    assert [option['value'] for option in props['month-selector']['options']] == catalog['months']
+    assert props['channel-filter-tab1']['options']
+    for output in ('funnel-metrics-bar', 'funnel-grid', 'channel-trends', 'stage-cv-cards'):
+        assert props[output].get('children'), output
+
+
+def test_initial_calls_skip_embedded_outputs_until_remount():
+    """ページ読み込み直後の初回呼び出しは送信せず、タブ切替での再マウントでは送信すること"""
+    records = []
+    session = _session(records)
+    session.load_page()
+    statuses = {label: status for label, _, status, _ in records}
+    assert statuses['funnel-grid.children'] == 204
+    assert not any(label.startswith('month-selector.options') for label in statuses)
+
+    records.clear()
+    session.click('tab-2-button')
+    session.click('tab-1-button')
+    statuses = {label: status for label, _, status, _ in records}
+    assert statuses['funnel-grid.children'] == 200
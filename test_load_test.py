@@ -0,0 +1,50 @@
+"""
+負荷試験ハーネスのテスト
+"""
+import dash
+from dash import ALL, Input, Output, State, dcc, html
+
+from benchmarks.load_test import FlaskClientTransport, percentile, run_load_test
+
+
+def _app():
+    """月の選択でカードが描画され、カードのクリックで選択が変わる最小のアプリ"""
+    app = dash.Dash(__name__)
+    app.layout = html.Div([
+        dcc.Dropdown(id='month-selector', options=['1月', '2月', '3月'], value='1月'),
+        html.Div(id='cards'),
+        html.Div(id='picked'),
+    ])
+
+    @app.callback(Output('cards', 'children'), [Input('month-selector', 'value')])
+    def render_cards(month):
+        return [html.Button(f'{month}{i}', id={'type': 'card', 'name': str(i)}) for i in range(3)]
+
+    @app.callback(Output('picked', 'children'), [Input({'type': 'card', 'name': ALL}, 'n_clicks')],
+                  [State('picked', 'children')], prevent_initial_call=True)
+    def pick(clicks, current):
+        return str(clicks)
+
+    return app
+
+
+def test_sessions_drive_chained_and_pattern_callbacks():
+    """ページ読み込み・月の変更・カードクリックがコールバックとして送信され、集計されること"""
+    app = _app()
+    report = run_load_test(lambda: FlaskClientTransport(app.server), sessions=3, actions=8, seed=1)
+
+    callbacks = report['callbacks']
+    assert report['errors'] == 0
+    assert callbacks['GET _dash-layout']['count'] == 3
+    assert callbacks['cards.children']['count'] > 3  # 初回 + 月の変更
+    assert callbacks['picked.children']['count'] > 0  # カードのクリック
+    assert report['requests'] == sum(row['count'] for row in callbacks.values())
+    assert report['p50_ms'] <= report['p95_ms'] <= report['p99_ms']
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) == 0.0
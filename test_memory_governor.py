@@ -0,0 +1,48 @@
+"""
+メモリ使用量に応じたキャッシュの削減のテスト
+"""
+import time
+
+import numpy as np
+
+from utils.cache_utils import LRUCache, approx_size
+from utils.compact_records import compact_dataset
+from utils.memory_governor import MemoryGovernor
+
+
+def _fill(cache, count, make_value, seconds):
+    for index in range(count):
+        cache.get(index)
+        time.sleep(seconds)
+        cache.put(index, make_value(index))
+
+
+def test_caches_report_bytes_and_recompute_time():
+    """キャッシュがおおよそのバイト数とミスから格納までの時間を報告すること"""
+    cache = LRUCache(maxsize=8, name='test_report')
+    _fill(cache, 4, lambda _: np.zeros(1000), 0.01)
+    assert 8000 * 4 <= cache.approx_bytes() < 8000 * 4 * 1.5
+    assert cache.stats()['miss_seconds'] >= 0.009
+    assert approx_size({'a': [np.zeros(100)] * 3}) < approx_size({'a': [np.zeros(100) for _ in range(3)]})
+
+    cache.put('other', 1)  # 直前のミスと異なるキーは時間を記録しない
+    assert cache.stats()['miss_seconds'] < 0.1
+
+    # コンパクト化したデータ（__slots__ のみの ColumnarRecords）も列の配列を数える
+    records = [{'channel': f'チャネル{index}', 'plan': 'x', '1月': float(index)} for index in range(1000)]
+    assert approx_size(compact_dataset({'sales': {'actual': records}})) > 8000 * 3
+
+
+def test_governor_evicts_cheap_large_entries_first():
+    """予算を超えたら、再計算時間に対して大きいキャッシュから必要な分だけ削除すること"""
+    cheap = LRUCache(maxsize=100, name='test_cheap')
+    expensive = LRUCache(maxsize=100, name='test_expensive')
+    _fill(cheap, 10, lambda index: str(index) * 100_000, 0)
+    _fill(expensive, 10, lambda index: str(index) * 1000, 0.005)
+
+    governor = MemoryGovernor(budget_bytes=1_000_000, caches=[expensive, cheap])
+    assert governor.check(rss=900_000) == 0
+    evicted = governor.check(rss=1_200_000)  # 予算の 95% まで約 25 万バイト減らす
+    assert 0 < evicted <= 5
+    assert len(cheap) == 10 - evicted and len(expensive) == 10
+    assert cheap.get(9) is not None and cheap.get(0) is None
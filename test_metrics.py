@@ -0,0 +1,67 @@
+"""
+コールバック計測と /metrics のテスト
+"""
+import dash
+from dash import Input, Output, html
+
+from utils import metrics
+
+
+def _client():
+    """正常・例外の2種類のコールバックを持つ最小のアプリ"""
+    app = dash.Dash(__name__)
+    app.layout = html.Div([html.Div(id='in'), html.Div(id='ok'), html.Div(id='ng')])
+
+    @app.callback(Output('ok', 'children'), [Input('in', 'children')])
+    def render_ok(value):
+        return 'x' * 2000
+
+    @app.callback(Output('ng', 'children'), [Input('in', 'children')])
+    def render_ng(value):
+        raise ValueError('boom')
+
+    metrics.init_app(app, data_version=lambda: 7)
+    return app.server.test_client()
+
+
+def _post(client, output):
+    return client.post('/_dash-update-component', json={
+        'output': f'{output}.children',
+        'outputs': {'id': output, 'property': 'children'},
+        'inputs': [{'id': 'in', 'property': 'children', 'value': 1}],
+        'changedPropIds': [], 'state': [],
+    })
+
+
+def test_metrics_endpoint_reports_callbacks_and_stages(monkeypatch):
+    """レイテンシ・応答サイズ・例外数・段階別時間が Prometheus 形式で出力されること"""
+    monkeypatch.setattr(metrics, 'enabled', True)
+    metrics.reset()
+    client = _client()
+
+    assert _post(client, 'ok').status_code == 200
+    assert _post(client, 'ng').status_code == 500
+    stages = metrics.stage_timer()
+    stages.mark('load_workbook')
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert '# TYPE sfa_callback_duration_seconds histogram' in text
+    assert 'sfa_callback_duration_seconds_count{callback="render_ok"} 1' in text
+    assert 'sfa_callback_response_bytes_bucket{callback="render_ok",le="1024"} 0' in text
+    assert 'sfa_callback_exceptions_total{callback="render_ng"} 1' in text
+    assert 'sfa_callback_requests_total{callback="render_ng",status="500"} 1' in text
+    assert 'sfa_ingest_stage_duration_seconds_count{stage="load_workbook"} 1' in text
+    assert 'sfa_data_version 7' in text
+    metrics.reset()
+
+
+def test_disabled_metrics_record_nothing(monkeypatch):
+    """無効時は記録も /metrics の登録も行わないこと"""
+    monkeypatch.setattr(metrics, 'enabled', False)
+    metrics.reset()
+    client = _client()
+
+    _post(client, 'ok')
+    metrics.stage_timer().mark('extract')
+    assert 'sfa_' not in client.get('/metrics').get_data(as_text=True)
+    assert 'sfa_callback' not in metrics.render()
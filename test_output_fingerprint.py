@@ -0,0 +1,61 @@
+"""
+出力フィンガープリントによる送信抑制のテスト
+"""
+import dash
+from dash import Input, Output, html
+
+from utils.output_fingerprint import LAYOUT_VERSION_KEY, remember_layout_outputs, skip_unchanged_outputs
+
+
+def _client():
+    """入力の偶奇だけを表示する最小のアプリ"""
+    app = dash.Dash(__name__)
+    app.layout = html.Div([html.Div(id='in'), html.Div(id='out')])
+
+    @app.callback(Output('out', 'children'), [Input('in', 'children')])
+    @skip_unchanged_outputs
+    def render(value):
+        return f"parity {value % 2}"
+
+    return app.server.test_client()
+
+
+def _post(client, value, session_id, triggered=True, layout_version=None):
+    return client.post('/_dash-update-component', json={
+        'output': 'out.children',
+        'outputs': {'id': 'out', 'property': 'children'},
+        'inputs': [{'id': 'in', 'property': 'children', 'value': value}],
+        'changedPropIds': ['in.children'] if triggered else [],
+        'state': [],
+        'sessionId': session_id,
+        LAYOUT_VERSION_KEY: layout_version,
+    })
+
+
+def test_unchanged_output_is_not_resent_to_same_session():
+    """同じセッションへの同一出力は no_update（204）になること"""
+    client = _client()
+    assert _post(client, 1, 'a', triggered=False).status_code == 200
+    assert _post(client, 3, 'a').status_code == 204
+    assert _post(client, 4, 'a').status_code == 200
+    # 別セッションと初回呼び出し（再マウント）は常に送信
+    assert _post(client, 4, 'b').status_code == 200
+    assert _post(client, 4, 'a', triggered=False).status_code == 200
+
+
+def test_initial_call_compares_with_layout_of_same_data_version():
+    """初回呼び出しはクライアントのレイアウトと同じデータバージョンで埋め込んだ出力とだけ比べること"""
+    client = _client()
+    output = {'id': 'out', 'property': 'children'}
+    remember_layout_outputs('old', [(output, 'parity 0')])
+    remember_layout_outputs('new', [(output, 'parity 1')])  # 後から別のバージョンのページが読み込まれた
+    assert _post(client, 2, 'c', triggered=False, layout_version='old').status_code == 204
+    assert _post(client, 1, 'd', triggered=False, layout_version='old').status_code == 200
+    assert _post(client, 1, 'e', triggered=False).status_code == 200
+
+
+def test_requests_without_session_are_passed_through():
+    """セッションIDのないリクエストは従来どおり送信されること"""
+    client = _client()
+    assert _post(client, 1, None).status_code == 200
+    assert _post(client, 1, None).status_code == 200
@@ -0,0 +1,94 @@
+"""
+投機的な事前計算のテスト
+"""
+import threading
+import time
+
+from data_manager import data_manager, get_dataframe_from_store
+from utils.cache_utils import ChangeSet
+from utils.prefetch import Prefetcher, variants
+from utils.section_cache import depends_on_sections
+
+
+def test_variants_change_one_input_at_a_time():
+    """前後の月と反対の切り替え状態を1つずつ変えた入力が候補になること"""
+    params = ['selected_month', 'plan_ratio_class', 'cumulative_class', 'channel_filter']
+    args = ('2月', 'control-button active', 'control-button', ['新規web'])
+    result = variants(params, args, ['1月', '2月', '3月'])
+    assert result == [
+        ('3月', 'control-button active', 'control-button', ['新規web']),
+        ('1月', 'control-button active', 'control-button', ['新規web']),
+        ('2月', 'control-button', 'control-button', ['新規web']),
+        ('2月', 'control-button active', 'control-button active', ['新規web']),
+    ]
+    assert variants(['selected_month'], ('12月',), ['11月', '12月']) == [('11月',)]
+    assert variants(['selected_stage'], ('1to2',), ['1月']) == []
+
+
+def test_prefetch_waits_for_idle_and_cancels_stale_work():
+    """実リクエストの処理中は開始せず、期限を過ぎた計算は破棄されること"""
+    prefetcher = Prefetcher(workers=1, queue_size=2, ttl=0.3)
+    done = threading.Event()
+    computed = []
+
+    def compute(name):
+        def run():
+            computed.append(name)
+            done.set()
+            return True
+        return run
+
+    prefetcher.request_started()
+    prefetcher.submit('stale', compute('stale'))
+    time.sleep(0.6)
+    prefetcher.request_finished()
+    assert prefetcher.pending() == 0 and computed == []
+
+    prefetcher.request_started()
+    for name in ('a', 'b', 'c'):
+        prefetcher.submit(name, compute(name))
+    assert prefetcher.pending() == 2
+    prefetcher.request_finished()
+    assert done.wait(2)
+    time.sleep(0.1)
+    assert computed == ['b', 'c']
+
+
+def test_real_request_abandons_running_speculation(monkeypatch):
+    """実行中の投機計算は実リクエストが来たら計算の区切りで中断し、出力を格納しないこと"""
+    monkeypatch.setattr(data_manager, 'snapshot', (None, {}, None))
+    monkeypatch.setattr(data_manager, '_caches', [])
+    for attr in ('version', 'last_changes'):
+        monkeypatch.setattr(data_manager, attr, getattr(data_manager, attr))
+    data = {'sales': {'actual': [{'channel': 'A', 'plan': 'x', '1月': 1}]}}
+    data_manager._publish(data, ChangeSet.everything(data))
+
+    started, release, abandoned = threading.Event(), threading.Event(), threading.Event()
+    finished = []
+
+    @depends_on_sections('sales')
+    def render(month):
+        current = data_manager.get_data()
+        started.set()
+        release.wait(2)
+        frame = get_dataframe_from_store(current, 'sales', 'actual')
+        finished.append(month)
+        return f"sales {month} {len(frame)}"
+
+    def speculation():
+        try:
+            return render.prefill('2月')
+        finally:
+            abandoned.set()
+
+    prefetcher = Prefetcher(workers=1, queue_size=4, ttl=5)
+    prefetcher.submit('2月', speculation)
+    assert started.wait(2)
+    prefetcher.request_started()
+    release.set()
+    assert abandoned.wait(2)
+    assert finished == [] and not render.is_cached('2月')
+
+    assert render('2月') == 'sales 2月 1'
+    prefetcher.request_finished()
+    assert finished == ['2月']
@@ -0,0 +1,70 @@
+"""
+オンデマンドプロファイリングのテスト
+"""
+import os
+
+import dash
+from dash import Input, Output, html
+
+from config import PERFORMANCE
+from utils import profiling
+
+
+def _client():
+    app = dash.Dash(__name__)
+    app.layout = html.Div([html.Div(id='in'), html.Div(id='out')])
+
+    @app.callback(Output('out', 'children'), [Input('in', 'children')])
+    def render_sum(value):
+        return str(sum(range(10000)))
+
+    profiling.init_app(app)
+    return app.server.test_client()
+
+
+def _post(client):
+    return client.post('/_dash-update-component', json={
+        'output': 'out.children', 'outputs': {'id': 'out', 'property': 'children'},
+        'inputs': [{'id': 'in', 'property': 'children', 'value': 1}], 'changedPropIds': [], 'state': [],
+    })
+
+
+def test_admin_token_enables_capture_and_index(tmp_path, monkeypatch):
+    """管理者トークンのクッキーがあるリクエストのみ保存され、一覧に表示されること"""
+    monkeypatch.setitem(PERFORMANCE, 'profile_dir', str(tmp_path))
+    monkeypatch.setitem(PERFORMANCE, 'profile_enabled', False)
+    monkeypatch.setenv('SFA_PROFILE_TOKEN', 'secret')
+    client = _client()
+
+    assert _post(client).status_code == 200
+    assert os.listdir(tmp_path) == []
+    assert client.get('/_profiles').status_code == 404
+
+    client.get('/?profile=wrong')
+    assert client.get('/_profiles?profile=日本').status_code == 404
+    assert _post(client).status_code == 200
+    assert os.listdir(tmp_path) == []
+
+    client.get('/?profile=secret')
+    assert _post(client).status_code == 200
+    entries = profiling.load_index()
+    assert [entry['name'] for entry in entries] == ['callback.render_sum']
+    assert entries[0]['hotspots']
+
+    page = client.get('/_profiles').get_data(as_text=True)
+    assert 'callback.render_sum' in page
+    assert client.get(f"/_profiles/{entries[0]['id']}.txt").status_code == 200
+
+
+def test_profiled_keeps_latest_reports(tmp_path, monkeypatch):
+    """環境変数による常時計測で、保持件数を超えた古いレポートが削除されること"""
+    monkeypatch.setitem(PERFORMANCE, 'profile_dir', str(tmp_path))
+    monkeypatch.setitem(PERFORMANCE, 'profile_enabled', True)
+    monkeypatch.setitem(PERFORMANCE, 'profile_keep', 2)
+
+    work = profiling.profiled('work')(lambda n: sum(range(n)))
+    for n in (10, 20, 30):
+        assert work(n) == sum(range(n))
+
+    assert len(profiling.load_index()) == 2
+    assert len(os.listdir(tmp_path)) == 6
@@ -0,0 +1,78 @@
+"""
+セクションバージョンによるコールバック出力キャッシュのテスト
+"""
+from data_manager import data_manager, section_digest
+from utils.cache_utils import ChangeSet
+from utils.section_cache import depends_on_sections
+
+
+def test_section_digest_depends_on_content_only():
+    """同じ内容なら同じバージョン、値が変われば別のバージョンになること"""
+    block = {'actual': [{'channel': 'A', 'plan': 'x', '1月': 1}]}
+    assert section_digest(block) == section_digest({'actual': [{'plan': 'x', 'channel': 'A', '1月': 1}]})
+    assert section_digest(block) != section_digest({'actual': [{'channel': 'A', 'plan': 'x', '1月': 2}]})
+
+
+def test_callback_recomputes_only_when_declared_section_changes(monkeypatch):
+    """依存セクション以外の変更では再計算されないこと"""
+    monkeypatch.setattr(data_manager, 'snapshot', (None, {}, None))
+    monkeypatch.setattr(data_manager, '_caches', [])
+    for attr in ('version', 'last_changes'):
+        monkeypatch.setattr(data_manager, attr, getattr(data_manager, attr))
+    data = {
+        'retention': {'actual': [{'channel': '', 'plan': 'アプリ', '1月': 0.9}]},
+        'sales': {'actual': [{'channel': 'A', 'plan': 'x', '1月': 1}]},
+    }
+    data_manager._publish(data, ChangeSet.everything(data))
+
+    calls = []
+
+    @depends_on_sections('retention')
+    def render(month):
+        calls.append(month)
+        return f"retention {month}"
+
+    assert render('1月') == render('1月') == 'retention 1月'
+    assert calls == ['1月']
+
+    changes = ChangeSet()
+    changes.add('sales', 'actual', 'A', '1月')
+    data_manager._publish(dict(data, sales={'actual': [{'channel': 'A', 'plan': 'x', '1月': 5}]}), changes)
+    render('1月')
+    assert calls == ['1月']
+
+    changes = ChangeSet()
+    changes.add('retention', 'actual', None, '1月')
+    data_manager._publish(dict(data, retention={'actual': [{'channel': '', 'plan': 'アプリ', '1月': 0.8}]}), changes)
+    render('1月')
+    render('2月')
+    assert calls == ['1月', '1月', '2月']
+
+
+def test_publish_during_computation_keeps_key_and_data_consistent(monkeypatch):
+    """計算中にデータが公開されても、キーのスナップショットのデータで計算し新しいデータでは計算し直すこと"""
+    monkeypatch.setattr(data_manager, 'snapshot', (None, {}, None))
+    monkeypatch.setattr(data_manager, '_caches', [])
+    for attr in ('version', 'last_changes'):
+        monkeypatch.setattr(data_manager, attr, getattr(data_manager, attr))
+    old = {'sales': {'actual': [{'channel': 'A', 'plan': 'x', '1月': 1}]}}
+    new = {'sales': {'actual': [{'channel': 'A', 'plan': 'x', '1月': 2}]}}
+    data_manager._publish(old, ChangeSet.everything(old))
+
+    catalogs = []
+
+    @depends_on_sections('sales')
+    def render(month):
+        if data_manager.data is old:
+            changes = ChangeSet()
+            changes.add('sales', 'actual', 'A', month)
+            data_manager._publish(new, changes)  # キーを決めた後、データを読む前に公開される
+        catalogs.append(data_manager.get_catalog())
+        return f"sales {data_manager.get_data()['sales']['actual'][0][month]}"
+
+    old_catalog = data_manager.catalog
+    assert render('1月') == 'sales 1'
+    assert render('1月') == 'sales 2'
+    assert data_manager.get_data() is new
+    # カタログもキーと同じスナップショットのものを参照する
+    assert catalogs[0] is old_catalog and catalogs[1] is data_manager.catalog is not old_catalog
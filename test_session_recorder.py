@@ -0,0 +1,71 @@
+"""
+セッション記録・再生のテスト
+"""
+import json
+import os
+
+import dash
+from dash import Input, Output, State, html
+
+from benchmarks.load_test import FlaskClientTransport
+from benchmarks.replay_sessions import compare_sessions, load_recordings, replay
+from config import PERFORMANCE
+from utils import session_recorder
+
+
+def _app(suffix=''):
+    app = dash.Dash(__name__)
+    app.layout = html.Div([html.Div(id='in'), html.Div(id='upload'), html.Div(id='out')])
+
+    @app.callback(Output('out', 'children'), [Input('in', 'children')], [State('upload', 'contents')])
+    def render(value, contents):
+        return f'{value}{suffix}'
+
+    session_recorder.init_app(app)
+    return app
+
+
+def _post(client, value, session='browser-1'):
+    return client.post('/_dash-update-component', json={
+        'output': 'out.children', 'outputs': {'id': 'out', 'property': 'children'},
+        'inputs': [{'id': 'in', 'property': 'children', 'value': value}], 'changedPropIds': ['in.children'],
+        'state': [{'id': 'upload', 'property': 'contents', 'value': 'data:application/xlsx;base64,SECRET'}],
+        'sessionId': session,
+    })
+
+
+def test_recorder_anonymizes_sessions_and_redacts_uploads(tmp_path, monkeypatch):
+    """セッションIDはハッシュ化され、アップロード内容は保存されないこと"""
+    monkeypatch.setattr(session_recorder, 'enabled', True)
+    monkeypatch.setitem(PERFORMANCE, 'record_dir', str(tmp_path))
+    client = _app().server.test_client()
+    _post(client, 1)
+    _post(client, 2)
+
+    [name] = os.listdir(tmp_path)
+    text = (tmp_path / name).read_text(encoding='utf-8')
+    assert 'browser-1' not in text and 'SECRET' not in text
+    entries = [json.loads(line) for line in text.splitlines()]
+    assert entries[0]['session'] == entries[1]['session'] == session_recorder.anonymize_session('browser-1')
+    assert entries[0]['t'] == 0 and entries[1]['t'] >= 0
+    assert entries[0]['payload']['state'][0]['redacted'] is True
+    assert entries[0]['fingerprint'] != entries[1]['fingerprint']
+
+
+def test_replay_detects_changed_outputs(tmp_path, monkeypatch):
+    """同じ実装の再生は一致し、出力が変わった実装では不一致が検出されること"""
+    monkeypatch.setattr(session_recorder, 'enabled', True)
+    monkeypatch.setitem(PERFORMANCE, 'record_dir', str(tmp_path))
+    client = _app().server.test_client()
+    for value in (1, 2, 3):
+        _post(client, value)
+    monkeypatch.setattr(session_recorder, 'enabled', False)
+
+    sessions = load_recordings([str(tmp_path)])
+    same, changed = _app(), _app(suffix='!')
+    result = compare_sessions(sessions, replay(sessions, lambda: FlaskClientTransport(same.server), speed=0))
+    assert result['requests'] == 3 and result['mismatches'] == []
+    assert result['callbacks']['out.children']['count'] == 3
+
+    result = compare_sessions(sessions, replay(sessions, lambda: FlaskClientTransport(changed.server), speed=0))
+    assert [m['index'] for m in result['mismatches']] == [0, 1, 2]
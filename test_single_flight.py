@@ -0,0 +1,66 @@
+"""
+同じ計算の同時実行をまとめるシングルフライトのテスト
+"""
+import fcntl
+import os
+import tempfile
+import threading
+import time
+
+from utils.single_flight import SingleFlight
+from utils.state_dir import private_dir
+
+
+def test_concurrent_identical_calls_compute_once():
+    """プロセス内の同時リクエストは1回だけ計算し、同じ結果を共有すること"""
+    flights = SingleFlight(lease_dir=None, timeout=5)
+    calls, results = [], []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'value': 42}
+
+    threads = [threading.Thread(target=lambda: results.append(flights.do('key', compute))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(2)
+    assert len(calls) == 1
+    assert results == [{'value': 42}] * 4
+    assert flights.do('key', compute) == {'value': 42} and len(calls) == 2
+
+
+def test_waiting_worker_reads_result_of_lease_holder(tmp_path):
+    """他のワーカーがリースを持っている間は待ち、その結果を JSON で受け取ること"""
+    leader, follower = SingleFlight(str(tmp_path), timeout=5), SingleFlight(str(tmp_path), timeout=5)
+    lock_path, wait_path, result_path = leader._paths('key')
+    fd = os.open(lock_path, os.O_CREAT | os.O_RDWR)
+    fcntl.flock(fd, fcntl.LOCK_EX)  # 別ワーカーが計算中の状態
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(follower.do('key', lambda: 'recomputed')))
+    waiter.start()
+    deadline = time.monotonic() + 2
+    while not os.path.exists(wait_path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert os.path.exists(wait_path)
+    leader._write_result(result_path, {'children': [1, 2]})
+    os.close(fd)
+    waiter.join(2)
+    assert results == [{'children': [1, 2]}]
+
+    # リースが空いていれば自分で計算する
+    assert follower.do('key', lambda: 'computed') == 'computed'
+
+
+def test_lease_directory_is_private_to_user(tmp_path, monkeypatch):
+    """リース用ディレクトリは所有者のみ読み書きでき、他のユーザーが使えるディレクトリは使わないこと"""
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    path = private_dir('single-flight')
+    assert path == str(tmp_path / f'sfa-{os.getuid()}' / 'single-flight')
+    assert os.stat(path).st_mode & 0o777 == 0o700
+
+    os.chmod(path, 0o777)  # 他のユーザーも書き込める（結果を仕込める）
+    fallback = private_dir('single-flight')
+    assert fallback != path and os.stat(fallback).st_mode & 0o777 == 0o700
@@ -0,0 +1,43 @@
+"""
+オフライン用アセットバンドルのテスト
+"""
+import gzip
+
+import dash
+from dash import html
+
+from utils import static_bundle
+
+
+def test_bundle_contains_used_icons_with_hashed_names():
+    """使用中のアイコンのみの CSS とハッシュ付きファイル名・圧縮版が作成されること"""
+    bundle = static_bundle.build_bundle()
+    icons_url = next(url for url in bundle.stylesheets if '/icons.' in url)
+    icons_css = bundle.files[icons_url[len(static_bundle.URL_PREFIX):]].variants['identity'].decode('utf-8')
+    assert '.fa-chart-line:before' in icons_css and '.fa-yen-sign:before' in icons_css
+    assert '.fa-skating:before' not in icons_css
+    assert '/_bundle/fa-solid-900.' in icons_css
+
+    style = bundle.files[bundle.urls['style.css'][len(static_bundle.URL_PREFIX):]]
+    assert gzip.decompress(style.variants['gzip']) == style.variants['identity']
+    assert static_bundle.build_bundle().urls == bundle.urls
+    assert 'https://' not in ''.join(bundle.stylesheets + bundle.scripts)
+
+
+def test_bundle_files_are_served_compressed_with_long_cache(monkeypatch):
+    """Accept-Encoding に応じた圧縮版・長期キャッシュ・ETag で配信されること"""
+    monkeypatch.setattr(static_bundle, 'enabled', True)
+    monkeypatch.setattr(static_bundle, '_bundle', None)
+    app = dash.Dash(__name__)
+    app.layout = html.Div()
+    static_bundle.init_app(app)
+    client = app.server.test_client()
+    url = static_bundle.asset_url('style.css', None)
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Cache-Control'] == static_bundle.CACHE_CONTROL
+    assert client.get(url).headers.get('Content-Encoding') is None
+    assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    assert client.get('/_bundle/missing.css').status_code == 404
+    assert static_bundle.assets_ignore() == r'^(style\.css|tab1\-specific\.css|edge\-polyfill\.js)$'
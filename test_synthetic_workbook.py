@@ -0,0 +1,32 @@
+"""
+合成PDCAワークブック生成のテスト
+"""
+from benchmarks.synthetic_workbook import generate_workbook, to_upload_contents
+from data_manager import process_excel_data
+
+
+def test_same_seed_generates_same_workbook():
+    """同じシード・パラメータからは同じバイト列、異なるシードからは異なるデータが生成されること"""
+    first, structure = generate_workbook(channels=3, plans_per_channel=2, seed=7)
+    second, _ = generate_workbook(channels=3, plans_per_channel=2, seed=7)
+    other, _ = generate_workbook(channels=3, plans_per_channel=2, seed=8)
+    assert first == second
+    assert first != other
+    assert structure['sections']['sales'] == (4, 4 + 1 + 3 * 3)  # 見出し + (プラン2 + 計) × 3 + 合計
+
+
+def test_generated_workbook_parses_with_extended_layout():
+    """拡張レイアウトが構成どおりに読み込め、合計行と実績月数が整合すること"""
+    content, structure = generate_workbook(channels=12, plans_per_channel=5, months=4,
+                                           fill_ratio=0.7, extra_sections=1, seed=1)
+    data, message = process_excel_data(to_upload_contents(content), structure)
+    assert data is not None, message
+    assert list(data) == ['sales', 'acquisition', 'unit_price', 'retention', 'indicators', 'extra_1']
+
+    actual = data['sales']['actual']
+    channels = {row['channel'] for row in actual} - {'売上高', '合計'}
+    assert len(channels) == 12 and 'チャネル012' in channels
+    subtotal = sum(row['3月'] for row in actual if row['plan'] == '計')
+    assert abs(actual[-1]['3月'] - subtotal) < 1e-6
+    assert all(row['5月'] == 0 for row in actual[1:])
+    assert any(row['1月'] == 0 for row in actual[1:-1] if row['plan'] != '計')  # 充填率による空セル
@@ -0,0 +1,66 @@
+"""
+データ公開後のウォームアップのテスト
+"""
+import dash
+from dash import ALL, Input, Output, html
+
+from utils.warmup import Warmer, toggle_clicks
+
+
+class _Data:
+    """公開中のデータとバージョンだけを持つデータマネージャー"""
+
+    def __init__(self):
+        self.data = {'sales': {}}
+        self.version = 1
+
+    def get_data(self):
+        return self.data
+
+    def get_main_channels(self):
+        return ['新規web']
+
+
+def test_toggle_clicks_visit_every_combination():
+    """グレイコード順のクリックで全ての組み合わせを1回ずつ辿ること"""
+    toggles = [('a1', 'a0'), ('b1', 'b0'), ('c1', 'c0')]
+    state = {'a': '0', 'b': '0', 'c': '0'}
+    seen = {tuple(state.values())}
+    for button in toggle_clicks(toggles):
+        state[button[0]] = button[1]
+        seen.add(tuple(state.values()))
+    assert len(seen) == 8 and state == {'a': '0', 'b': '0', 'c': '1'}
+
+
+def test_warm_up_runs_callbacks_for_current_version():
+    """ウォームアップで初期表示・切り替え・主要チャネルのカードのコールバックが実行されること"""
+    app = dash.Dash(__name__)
+    app.layout = html.Div([
+        html.Button(id='btn-single'), html.Button(id='btn-cumulative'),
+        html.Button(id={'type': 'trend-card', 'channel': '新規web'}),
+        html.Button(id={'type': 'trend-card', 'channel': 'その他'}),
+        html.Div(id='out'), html.Div(id='selected'),
+    ])
+    calls, selected = [], []
+
+    @app.callback(Output('out', 'children'), [Input('btn-single', 'n_clicks'), Input('btn-cumulative', 'n_clicks')])
+    def render(single, cumulative):
+        calls.append((single, cumulative))
+        return f'{single}-{cumulative}'
+
+    @app.callback(Output('selected', 'children'), [Input({'type': 'trend-card', 'channel': ALL}, 'n_clicks')])
+    def select(clicks):
+        selected.append(dash.callback_context.triggered_id)
+        return str(clicks)
+
+    data = _Data()
+    warmer = Warmer(app.server, data)
+    assert not warmer.is_ready()
+    warmer.run()
+    assert warmer.is_ready() and warmer.status()['state'] == 'ready'
+    assert (None, None) in calls and (1, None) in calls
+    assert {'type': 'trend-card', 'channel': '新規web'} in selected
+    assert {'type': 'trend-card', 'channel': 'その他'} not in selected
+
+    data.version = 2
+    assert not warmer.is_ready()
@@ -0,0 +1,177 @@
+"""
+重いコールバックの流入制御と優先度付き実行
+有効時（環境変数 SFA_ADMISSION=1）はコールバックリクエストの処理前に、重いコールバックの同時実行数を
+上限までに抑える。軽いコールバックは待たずに実行し、待ち行列では
+
+- ユーザーの操作をウォームアップより、予想処理時間の短いものを長いものより先に実行する
+- 同じセッション・同じ出力の新しいリクエストが来たら、待っている古いリクエストは 204 で打ち切る
+- 待ち行列があふれた・待ち時間が上限を超えた場合はタイムアウトを待たず 503（busy）を返す
+
+重いかどうかは設定済みのコールバック名と、処理時間の指数移動平均で判定する。
+同時実行の制御はプロセス内のため、gunicorn ではスレッド付きワーカー（--threads）で効果がある
+"""
+import itertools
+import threading
+import time
+
+import flask
+
+from config import PERFORMANCE
+from utils import metrics
+from utils.output_fingerprint import SESSION_KEY
+
+# 流入制御の有効/無効（環境変数 SFA_ADMISSION=1 で有効）
+enabled = PERFORMANCE['admission_enabled']
+
+# 処理時間の指数移動平均の重み
+EWMA_ALPHA = 0.3
+
+
+class Busy(Exception):
+    """待ち行列があふれた、または待ち時間の上限を超えた"""
+
+
+class Superseded(Exception):
+    """同じセッション・同じ出力の新しいリクエストに置き換えられた"""
+
+
+class _Ticket:
+    __slots__ = ('priority', 'key', 'superseded')
+
+    def __init__(self, priority, key):
+        self.priority = priority
+        self.key = key
+        self.superseded = False
+
+
+class AdmissionController:
+    """重いコールバックの実行枠と優先度付きの待ち行列"""
+
+    def __init__(self, slots=None, max_queue=None, max_wait=None, heavy_seconds=None, heavy=None):
+        self.slots = slots or PERFORMANCE['admission_slots']
+        self.max_queue = max_queue or PERFORMANCE['admission_queue']
+        self.max_wait = max_wait or PERFORMANCE['admission_wait']
+        self.heavy_seconds = heavy_seconds or PERFORMANCE['admission_heavy_ms'] / 1000
+        self.heavy = set(PERFORMANCE['admission_heavy_callbacks'] if heavy is None else heavy)
+        self.running = 0
+        self._durations = {}  # コールバック名 → 処理時間の指数移動平均（秒）
+        self._queue = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+    def expected_seconds(self, callback):
+        return self._durations.get(callback, self.heavy_seconds if callback in self.heavy else 0.0)
+
+    def is_heavy(self, callback):
+        return callback in self.heavy or self.expected_seconds(callback) >= self.heavy_seconds
+
+    def admit(self, callback, key=None, background=False):
+        """
+        実行枠を確保（軽いコールバックは即時）。確保した場合は True を返す
+
+        key : 同じ値の待ちリクエストを置き換えるキー（セッションと出力）
+        background : ウォームアップなどユーザーの操作でないリクエスト
+        """
+        if not self.is_heavy(callback):
+            return False
+        with self._cond:
+            if self.running < self.slots and not self._queue:
+                self.running += 1
+                return True
+            if len(self._queue) >= self.max_queue:
+                raise Busy()
+            if key is not None:
+                for waiting in self._queue:
+                    if waiting.key == key:
+                        waiting.superseded = True
+            ticket = _Ticket((background, self.expected_seconds(callback), next(self._sequence)), key)
+            self._queue.append(ticket)
+            self._cond.notify_all()
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while True:
+                    if ticket.superseded:
+                        raise Superseded()
+                    if self.running < self.slots and ticket is min(self._queue, key=lambda t: t.priority):
+                        self.running += 1
+                        return True
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise Busy()
+                    self._cond.wait(remaining)
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+    def release(self, callback, seconds, admitted):
+        """処理時間を記録し、確保した実行枠を返す"""
+        with self._cond:
+            previous = self._durations.get(callback)
+            self._durations[callback] = seconds if previous is None else (
+                EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * previous)
+            if admitted:
+                self.running -= 1
+                self._cond.notify_all()
+
+    def queued(self):
+        with self._cond:
+            return len(self._queue)
+
+
+# プロセス内で共有する流入制御
+controller = AdmissionController()
+
+
+def init_app(app):
+    """Dashアプリに流入制御のフックを登録（無効時は何もしない）"""
+    if not enabled:
+        return
+
+    server = app.server
+    update_path = f"{app.config.requests_pathname_prefix}_dash-update-component"
+    callback_names = {}
+
+    def callback_name(output):
+        name = callback_names.get(output)
+        if name is None:
+            callback = app.callback_map.get(output, {}).get('callback')
+            name = callback_names[output] = getattr(callback, '__name__', output)
+        return name
+
+    @server.before_request
+    def _admit():
+        if flask.request.path != update_path:
+            return None
+        body = flask.request.get_json(silent=True) or {}
+        output = body.get('output', '')
+        if app.callback_map.get(output, {}).get('long'):
+            # background コールバックはジョブの登録・結果の確認だけのため制限しない
+            return None
+        name = callback_name(output)
+        session = body.get(SESSION_KEY)
+        start = time.perf_counter()
+        try:
+            admitted = controller.admit(name, key=(session, output) if session else None,
+                                        background=str(session or '').startswith('warmup-'))
+        except Superseded:
+            metrics.inc('sfa_admission_total', callback=name, result='superseded')
+            return flask.Response(status=204)
+        except Busy:
+            metrics.inc('sfa_admission_total', callback=name, result='busy')
+            response = flask.jsonify({'busy': True, 'message': 'サーバーが混み合っています'})
+            response.status_code = 503
+            response.headers['Retry-After'] = '1'
+            return response
+        waited = time.perf_counter() - start
+        if admitted:
+            metrics.inc('sfa_admission_total', callback=name, result='admitted')
+            metrics.observe('sfa_admission_wait_seconds', waited, callback=name)
+        flask.g.admission = (name, admitted, time.perf_counter())
+        return None
+
+    @server.teardown_request
+    def _release(exc):
+        state = flask.g.pop('admission', None)
+        if state is not None:
+            name, admitted, start = state
+            controller.release(name, time.perf_counter() - start, admitted)
@@ -0,0 +1,326 @@
+"""
+重いコールバックのバックグラウンド実行（プロセスプール + SQLite、ブローカー不要）
+有効時（環境変数 SFA_BACKGROUND=1）はファネルグリッド・プラン別カードなどの重いコールバックを
+Dash の background コールバックとして登録し、リクエストスレッドではなくワーカーごとのプロセスプールで計算する
+
+- 結果・進捗・ジョブの状態は SQLite（utils/disk_cache.DiskCache）に保存し、どのワーカーへのポーリングでも返せる
+- キーに公開中のデータの内容バージョンを含め、同じデータ・同じ入力の結果は計算し直さない
+- 入力が再度変わるとブラウザが前のジョブを取り消す。計算中のジョブは report_progress() の呼び出し時に中断する
+- プールの子プロセスは fork 時点のデータを持つため、データの公開時にプールを作り直す
+"""
+import contextvars
+import logging
+import multiprocessing
+import os
+import threading
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from dash import Output, no_update
+from dash._callback_context import context_value
+from dash._utils import AttributeDict
+from dash.exceptions import PreventUpdate
+from dash.long_callback._proxy_set_props import ProxySetProps
+from dash.long_callback.managers import BaseLongCallbackManager
+
+from config import PERFORMANCE
+from utils import metrics
+from utils.cache_utils import cache_registry
+from utils.disk_cache import DiskCache
+from utils.output_fingerprint import remember_sent_outputs
+from utils.state_dir import private_dir
+
+logger = logging.getLogger(__name__)
+
+# バックグラウンド実行の有効/無効（環境変数 SFA_BACKGROUND=1 で有効、fork できない環境では無効）
+enabled = PERFORMANCE['background_enabled'] and 'fork' in multiprocessing.get_all_start_methods()
+
+_ACTIVE = ('queued', 'running')
+_NO_UPDATE = {'_dash_no_update': '_dash_no_update'}
+
+# 名前 → マネージャー（子プロセスでジョブの関数・保存先を引くため）
+_MANAGERS = {}
+
+# 実行中のジョブ（マネージャー, 結果のキー, ジョブID）
+_current_job = contextvars.ContextVar('sfa_background_job', default=None)
+
+
+def _is_no_update(result):
+    """no_update を含む結果か（入力が同じでも次回は計算し直す）"""
+    values = result if isinstance(result, (list, tuple)) else [result]
+    return any(value is no_update or value == _NO_UPDATE for value in values)
+
+
+class Cancelled(BaseException):
+    """ジョブが取り消された（コールバック内の except Exception で握りつぶされないよう BaseException）"""
+
+
+def report_progress(done, total):
+    """
+    バックグラウンド実行中なら進捗を保存し、取り消されていれば Cancelled を送出する
+
+    通常のリクエスト・初期表示の埋め込みなどでは何もしない
+    """
+    current = _current_job.get()
+    if current is None:
+        return
+    manager, key, job = current
+    if manager.status(job).get('status') == 'cancelled':
+        raise Cancelled()
+    manager.store.put(('progress', key), [f'計算中 {done}/{total}'])
+
+
+def _data_digest():
+    # 循環インポートを避けるため実行時に参照
+    from data_manager import data_manager
+
+    return tuple(sorted(data_manager.section_versions.items()))
+
+
+def _reset_after_fork():
+    """fork 時に他のスレッドが持っていたロック・計算中の待ち合わせを子プロセスで作り直す"""
+    from utils import single_flight
+
+    for cache in list(cache_registry):
+        cache._lock = threading.Lock()
+    single_flight.flights._calls = {}
+    single_flight.flights._lock = threading.Lock()
+    metrics._lock = threading.Lock()
+
+
+class _Job:
+    """プールへ渡すジョブの関数（クロージャは pickle できないため名前で引く）"""
+
+    def __init__(self, manager_name, function_key):
+        self.manager_name = manager_name
+        self.function_key = function_key
+
+    def __call__(self, key, job, args, context):
+        # fork 元のスレッドのリクエストコンテキストを引き継がないよう、空のコンテキストで実行する
+        contextvars.Context().run(self._run, key, job, args, context)
+
+    def _run(self, key, job, args, context):
+        manager = _MANAGERS[self.manager_name]
+        fn = manager.job_functions[self.function_key]
+        if manager.status(job).get('status') == 'cancelled':
+            return
+        manager.set_status(job, 'running', key)
+
+        def _set_props(_id, props):
+            manager.store.put(('props', key), {_id: props})
+
+        callback_context = AttributeDict(**context)
+        callback_context.ignore_register_page = False
+        callback_context.updated_props = ProxySetProps(_set_props)
+        context_value.set(callback_context)
+        _current_job.set((manager, key, job))
+        try:
+            if isinstance(args, dict):
+                result = fn(**args)
+            elif isinstance(args, (list, tuple)):
+                result = fn(*args)
+            else:
+                result = fn(args)
+        except Cancelled:
+            manager.set_status(job, 'cancelled', key)
+            return
+        except PreventUpdate:
+            result = _NO_UPDATE
+        except Exception as err:
+            result = {'long_callback_error': {'msg': str(err), 'tb': traceback.format_exc()}}
+        manager.store.put(('result', key), result)
+        manager.set_status(job, 'done', key)
+
+
+class LocalCallbackManager(BaseLongCallbackManager):
+    """
+    プロセスプールと SQLite による background コールバックのマネージャー
+
+    name : 子プロセスでマネージャーを引く名前
+    path : 結果・進捗・ジョブの状態を保存する SQLite ファイル
+    workers : プロセスプールの大きさ
+    cache_by : キャッシュキーに含める値を返す関数の一覧（既定は公開中のデータの内容バージョン）
+    """
+
+    def __init__(self, name='default', path=None, workers=None, cache_by=None, max_bytes=None):
+        self.name = name
+        self.workers = workers or PERFORMANCE['background_workers']
+        # 既定はユーザー専用の一時ディレクトリ（他のユーザーに結果を書き換えさせない）
+        self.store = DiskCache(path or PERFORMANCE['background_store_path']
+                               or os.path.join(private_dir('stores'), 'background.sqlite3'),
+                               max_bytes=max_bytes or PERFORMANCE['background_store_max_mb'] * 1024 * 1024)
+        self.job_functions = {}  # 登録キー → コールバック関数（基底クラスの functions とは別）
+        self._pool = None
+        self._pid = None
+        self._futures = {}
+        self._lock = threading.Lock()
+        _MANAGERS[name] = self
+        super().__init__(cache_by or [_data_digest])
+
+    # --- ジョブの状態 -------------------------------------------------------------
+
+    def status(self, job):
+        return self.store.get(('job', job)) or {}
+
+    def set_status(self, job, status, key):
+        self.store.put(('job', job), {'status': status, 'key': key, 'pid': os.getpid()})
+
+    def _alive(self, state):
+        try:
+            os.kill(state['pid'], 0)
+            return True
+        except (KeyError, TypeError, ProcessLookupError):
+            return False
+        except PermissionError:
+            return True
+
+    # --- プロセスプール -----------------------------------------------------------
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                # fork 前のプールは子プロセスに引き継がれないためプロセスごとに作る
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('fork'),
+                                                 initializer=_reset_after_fork)
+                self._pid, self._futures = os.getpid(), {}
+            return self._pool
+
+    def invalidate(self, changes, version=None):
+        """データの公開時に呼ばれる。待っているジョブを取り消し、プールを作り直す"""
+        with self._lock:
+            pool, futures = self._pool, self._futures
+            self._pool, self._futures = None, {}
+        if pool is None or self._pid != os.getpid():
+            return
+        for job, (key, future) in futures.items():
+            if future.cancel() or not future.done():
+                self.set_status(job, 'cancelled', key)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    # --- BaseLongCallbackManager ---------------------------------------------------
+
+    def make_job_fn(self, fn, progress, key=None):
+        # 進捗は引数ではなく report_progress() で保存するため、コールバックの引数は変えない
+        self.job_functions[key] = fn
+        return _Job(self.name, key)
+
+    def call_job_fn(self, key, job_fn, args, context):
+        job = uuid.uuid4().hex
+        fn = self.job_functions.get(job_fn.function_key)
+        is_cached = getattr(fn, 'is_cached', None)
+        if is_cached is not None and isinstance(args, (list, tuple)) and is_cached(*args):
+            # このプロセスのセクションキャッシュにある出力はリクエスト内で返す（未変更出力の送信抑制も効く）
+            try:
+                result = fn(*args)
+            except PreventUpdate:
+                result = _NO_UPDATE
+            # no_update はこのセッションだけの結果のため、ジョブごとに保存する
+            self.store.put(('job_result', job) if _is_no_update(result) else ('result', key), result)
+            self.set_status(job, 'done', key)
+            metrics.inc('sfa_background_jobs_total', result='inline')
+            return job
+        if self.store.get(('result', key)) is not None:
+            # 同じデータ・同じ入力の結果が保存済み（他のワーカー・再起動前の計算を含む）
+            self.set_status(job, 'done', key)
+            metrics.inc('sfa_background_jobs_total', result='cached')
+            return job
+        self.set_status(job, 'queued', key)
+        future = self._executor().submit(job_fn, key, job, args, dict(context))
+        with self._lock:
+            self._futures[job] = (key, future)
+        future.add_done_callback(lambda _: self._futures.pop(job, None))
+        metrics.inc('sfa_background_jobs_total', result='submitted')
+        return job
+
+    def terminate_job(self, job):
+        """ジョブを取り消す（待ち行列からは外し、計算中なら次の進捗報告で中断させる）"""
+        if job is None:
+            return
+        state = self.status(job)
+        if state.get('status') not in _ACTIVE:
+            return
+        self.set_status(job, 'cancelled', state.get('key'))
+        entry = self._futures.get(job)
+        if entry is not None:
+            entry[1].cancel()
+        metrics.inc('sfa_background_jobs_total', result='cancelled')
+
+    def terminate_unhealthy_job(self, job):
+        state = self.status(job)
+        if state.get('status') in _ACTIVE and not self._alive(state):
+            self.set_status(job, 'failed', state.get('key'))
+            return True
+        return False
+
+    def job_running(self, job):
+        state = self.status(job)
+        return state.get('status') in _ACTIVE and self._alive(state)
+
+    def get_progress(self, key):
+        progress = self.store.get(('progress', key))
+        if progress:
+            self.store.delete(('progress', key))
+        return progress
+
+    def result_ready(self, key):
+        return self.store.get(('result', key)) is not None
+
+    def get_result(self, key, job):
+        result = self.store.get(('job_result', job)) if job else None
+        if result is not None:
+            self.store.delete(('job_result', job))
+            remember_sent_outputs(result)
+            return result
+        result = self.store.get(('result', key))
+        if result is None:
+            return self.UNDEFINED
+        # エラー・no_update は次の呼び出しで計算し直す
+        failed = isinstance(result, dict) and 'long_callback_error' in result
+        if _is_no_update(result) or failed:
+            self.store.delete(('result', key))
+        self.store.delete(('progress', key))
+        if not failed:
+            # プールで計算した結果・保存済みの結果もクライアントが保持する内容として記録する
+            remember_sent_outputs(result)
+        return result
+
+    def get_updated_props(self, key):
+        props = self.store.get(('props', key))
+        if props is None:
+            return {}
+        self.store.delete(('props', key))
+        return props
+
+
+# プロセス内で共有するマネージャー（無効時は作らない）
+manager = LocalCallbackManager() if enabled else None
+
+
+def callback_options(progress_id):
+    """
+    重いコールバックを background にする app.callback の引数（無効時は空）
+
+    progress_id : 進捗を表示するコンポーネントのID（完了後は空に戻す）
+    """
+    if not enabled:
+        return {}
+    return {
+        'background': True,
+        'manager': manager,
+        'progress': [Output(progress_id, 'children')],
+        'progress_default': [''],
+        'interval': PERFORMANCE['background_interval_ms'],
+    }
+
+
+def init_app(app, data_manager):
+    """データの公開時にプロセスプールを作り直す（無効時は何もしない）"""
+    if enabled:
+        data_manager.register_cache(manager)
@@ -0,0 +1,328 @@
+"""
+キャッシュのユーティリティ
+フィルタ結果のLRUキャッシュ、正規化済みフィルタキー、変更範囲による無効化を提供
+"""
+import math
+import sys
+import threading
+import time
+import types
+import weakref
+from collections import OrderedDict, namedtuple
+
+from config import CHANNEL_ALIASES, PERFORMANCE
+
+
+def _canonical_tuple(values):
+    """値の重複を除き、型混在でも安定した順序のタプルにする"""
+    return tuple(sorted(set(values), key=lambda v: (type(v).__name__, str(v))))
+
+
+class FilterKey(namedtuple('FilterKey', ['channels', 'plans'])):
+    """
+    apply_filters() の正規化済みフィルタ条件（不変・ハッシュ可能）
+
+    channels : Excel上のチャネル名へ展開済みのタプル（None はフィルタなし）
+    plans    : プラン名のタプル（None はフィルタなし）
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_filters(cls, channel_filter, plan_filter):
+        """フィルタ値から FilterKey を作成（正規化できない場合は None）"""
+        if not isinstance(channel_filter, (list, tuple, set, frozenset, type(None))):
+            return None
+        if not isinstance(plan_filter, (list, tuple, set, frozenset, type(None))):
+            return None
+
+        channels = None
+        if channel_filter:
+            expanded = []
+            for ch in channel_filter:
+                expanded.extend(CHANNEL_ALIASES.get(ch, [ch]))
+            channels = _canonical_tuple(expanded)
+
+        plans = _canonical_tuple(plan_filter) if plan_filter else None
+        return cls(channels, plans)
+
+
+class ChangeSet:
+    """
+    データ変更の範囲
+
+    footprints : (section, channel, month) の集合（None はその次元の全体）
+    blocks     : 変更のあった (section, data_type) の集合
+    structural : 行構成（channel/plan）や月列が変わったか
+    """
+
+    def __init__(self):
+        self.footprints = set()
+        self.blocks = set()
+        self.structural = False
+
+    @classmethod
+    def everything(cls, data=None):
+        """全データが変わったことを表す変更セット"""
+        changes = cls()
+        changes.structural = True
+        changes.footprints.add((None, None, None))
+        for section, section_data in (data or {}).items():
+            for data_type in section_data:
+                changes.blocks.add((section, data_type))
+        return changes
+
+    def add(self, section, data_type, channel=None, month=None):
+        """変更セルを追加"""
+        self.blocks.add((section, data_type))
+        self.footprints.add((section, channel, month))
+
+    @property
+    def sections(self):
+        """変更のあったセクション（全体変更の場合は None を含む）"""
+        return {section for section, _, _ in self.footprints}
+
+    def touches(self, section, channels=None, months=None):
+        """指定範囲（None は全体）が変更と重なるか"""
+        for fp_section, fp_channel, fp_month in self.footprints:
+            if fp_section is not None and section is not None and fp_section != section:
+                continue
+            if fp_channel is not None and channels is not None and fp_channel not in channels:
+                continue
+            if fp_month is not None and months is not None and fp_month not in months:
+                continue
+            return True
+        return False
+
+    def __bool__(self):
+        return bool(self.footprints)
+
+    def summary(self):
+        """ログ用の要約"""
+        if (None, None, None) in self.footprints:
+            return '全体'
+        return ', '.join(sorted(f'{section}/{data_type}' for section, data_type in self.blocks))
+
+
+# 生成済みのキャッシュ（計測・メモリ管理から参照）
+cache_registry = weakref.WeakSet()
+
+# キャッシュ以外のメモリ使用量の報告元（名前 → おおよそのバイト数を返す関数）
+memory_sources = {}
+
+# 再計算時間の指数移動平均の重み
+COST_EWMA_ALPHA = 0.3
+
+_OPAQUE_TYPES = (type, types.ModuleType, types.FunctionType, types.MethodType, types.BuiltinFunctionType)
+# クラス間で共有されるため数えないオブジェクトのモジュール（plotly の検証器）
+_SHARED_MODULES = ('_plotly_utils', 'plotly.validators')
+
+
+def approx_size(value):
+    """
+    オブジェクトのおおよそのバイト数（コンテナ・属性をたどり、同じオブジェクトは1回だけ数える）
+
+    numpy 配列は nbytes、DataFrame・Series は memory_usage() を使う。属性は __dict__ と __slots__ をたどる
+    """
+    seen = set()
+    stack = [value]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if (id(obj) in seen or isinstance(obj, _OPAQUE_TYPES)
+                or type(obj).__module__.startswith(_SHARED_MODULES)):
+            continue
+        seen.add(id(obj))
+        if hasattr(obj, 'memory_usage') and hasattr(obj, 'dtypes'):  # DataFrame・Series
+            usage = obj.memory_usage(deep=True)
+            total += int(usage.sum() if hasattr(usage, 'sum') else usage)
+            continue
+        nbytes = getattr(obj, 'nbytes', None)
+        if isinstance(nbytes, int):
+            total += nbytes
+            continue
+        total += sys.getsizeof(obj, 0)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        else:
+            if hasattr(obj, '__dict__'):
+                stack.append(obj.__dict__)
+            stack.extend(_slot_values(obj))
+    return total
+
+
+def _slot_values(obj):
+    """__slots__ で定義された属性の値（ColumnarRecords などは __dict__ を持たない）"""
+    for cls in type(obj).__mro__:
+        slots = cls.__dict__.get('__slots__', ())
+        for name in ((slots,) if isinstance(slots, str) else slots):
+            if name not in ('__dict__', '__weakref__') and hasattr(obj, name):
+                yield getattr(obj, name)
+
+
+class LRUCache:
+    """スレッドセーフなLRUキャッシュ（ヒット率の統計付き）"""
+
+    def __init__(self, maxsize=256, name='cache'):
+        self.name = name
+        self.maxsize = maxsize
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # ミスから格納までの時間（再計算にかかる時間）の指数移動平均
+        self.miss_seconds = 0.0
+        self._pending = threading.local()
+        cache_registry.add(self)
+
+    def get(self, key, default=None):
+        """キャッシュから取得（見つからなければ default）"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        self._pending.miss = (key, time.perf_counter())
+        return default
+
+    def put(self, key, value, version=None):
+        """
+        キャッシュへ格納（上限を超えたら最も古いものを削除）
+
+        version を指定した場合、キャッシュのバージョンと異なれば（計算中に無効化された）格納しない
+        """
+        pending = getattr(self._pending, 'miss', None)
+        self._pending.miss = None
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            if pending is not None and pending[0] == key:
+                seconds = time.perf_counter() - pending[1]
+                self.miss_seconds = (seconds if not self.miss_seconds
+                                     else COST_EWMA_ALPHA * seconds + (1 - COST_EWMA_ALPHA) * self.miss_seconds)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """全エントリを削除"""
+        with self._lock:
+            self._entries.clear()
+
+    def trim(self, count):
+        """最近使われていないものから count 件削除（削除した件数を返す）"""
+        with self._lock:
+            count = min(count, len(self._entries))
+            for _ in range(count):
+                self._entries.popitem(last=False)
+            return count
+
+    def approx_bytes(self, sample=16):
+        """最近使われたエントリから見積もった合計のおおよそのバイト数"""
+        with self._lock:
+            size = len(self._entries)
+            values = [value for _, value in zip(range(sample), reversed(self._entries.values()))]
+        if not values:
+            return 0
+        return math.ceil(approx_size(values) / len(values) * size)
+
+    def set_version(self, version):
+        """データバージョンを設定（変わった場合はエントリを破棄）"""
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+
+    def invalidate(self, changes, version=None):
+        """
+        データ変更に応じて無効化
+
+        既定では行構成が変わった場合のみ全削除（値の変化に依存しないキャッシュ向け）
+        """
+        with self._lock:
+            if changes.structural:
+                self._entries.clear()
+            if version is not None:
+                self.version = version
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        """格納済みか（ヒット率・LRU順序には影響しない）"""
+        with self._lock:
+            return key in self._entries
+
+    def stats(self):
+        """ヒット率などの統計を取得"""
+        total = self.hits + self.misses
+        return {
+            'name': self.name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'version': self.version,
+            'miss_seconds': round(self.miss_seconds, 6)
+        }
+
+
+class FootprintCache(LRUCache):
+    """
+    (section, channel, month) のフットプリント付きLRUキャッシュ
+
+    データ変更時は変更範囲と重なるエントリのみを無効化する
+    """
+
+    def put(self, key, value, footprint=(None, None, None), version=None):
+        """フットプリント (section, channels, months) 付きで格納"""
+        super().put(key, (value, footprint), version)
+
+    def get(self, key, default=None):
+        entry = super().get(key, None)
+        if entry is None:
+            return default
+        return entry[0]
+
+    def invalidate(self, changes, version=None):
+        """変更範囲と重なるエントリのみ削除"""
+        with self._lock:
+            if changes.structural:
+                self._entries.clear()
+            else:
+                stale = [
+                    key for key, (_, (section, channels, months)) in self._entries.items()
+                    if changes.touches(section, channels, months)
+                ]
+                for key in stale:
+                    del self._entries[key]
+            if version is not None:
+                self.version = version
+
+
+def frame_signature(df):
+    """
+    DataFrameのフィルタ対象構造（index・channel・plan列）の署名
+
+    フィルタ結果は値の列に依存しないため、数値が変わっても署名は変わらない
+    """
+    if 'channel' not in df.columns or 'plan' not in df.columns:
+        return None
+    try:
+        return (len(df), hash((tuple(df.index), tuple(df['channel']), tuple(df['plan']))))
+    except TypeError:
+        # ハッシュできない値が含まれる場合はキャッシュしない
+        return None
+
+
+# apply_filters() 結果（行位置の配列）のキャッシュ
+filter_cache = LRUCache(maxsize=PERFORMANCE['filter_cache_size'], name='filter')
+
+# KPI値・月別トレンドなど集計結果のキャッシュ
+derived_cache = FootprintCache(maxsize=PERFORMANCE['derived_cache_size'], name='derived')
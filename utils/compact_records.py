@@ -0,0 +1,106 @@
+"""
+列指向のコンパクトなレコード表現
+データブロック（dict のリスト）を列ごとの numpy 配列に置き換え、fork 後のワーカーが参照しても
+参照カウントの更新で共有ページが複製されないようにする（行は参照時に dict として組み立てる）
+"""
+from collections.abc import Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def _column_array(values):
+    """列の値を型がそろっていれば numpy 配列に、そうでなければタプルにする"""
+    kinds = {type(value) for value in values}
+    if kinds == {float}:
+        return np.array(values, dtype=np.float64)
+    if kinds == {int}:
+        try:
+            return np.array(values, dtype=np.int64)
+        except OverflowError:
+            return tuple(values)
+    return tuple(values)
+
+
+class ColumnarRecords(Sequence):
+    """列ごとの配列で保持する読み取り専用のレコード列（すべての行が同じキーを持つ場合のみ）"""
+
+    __slots__ = ('columns', '_arrays', '_length')
+
+    def __init__(self, columns, arrays, length):
+        self.columns = tuple(columns)
+        self._arrays = arrays
+        self._length = length
+
+    @classmethod
+    def from_records(cls, records):
+        """dict のリストから作成（行ごとにキーが異なる場合は None）"""
+        if not records:
+            return None
+        columns = tuple(records[0].keys())
+        if any(tuple(record.keys()) != columns for record in records):
+            return None
+        arrays = {col: _column_array([record[col] for record in records]) for col in columns}
+        return cls(columns, arrays, len(records))
+
+    def __len__(self):
+        return self._length
+
+    def _row(self, index):
+        return {col: (array[index].item() if isinstance(array, np.ndarray) else array[index])
+                for col, array in self._arrays.items()}
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(i) for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('ColumnarRecords index out of range')
+        return self._row(index)
+
+    def __iter__(self):
+        columns = [array.tolist() if isinstance(array, np.ndarray) else array for array in self._arrays.values()]
+        for values in zip(*columns):
+            yield dict(zip(self.columns, values))
+
+    def __eq__(self, other):
+        if isinstance(other, (ColumnarRecords, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def to_list(self):
+        return list(self)
+
+    def to_frame(self):
+        """DataFrame に変換（dict のリストから作成した場合と同じ列・型）"""
+        return pd.DataFrame({col: (array.copy() if isinstance(array, np.ndarray) else list(array))
+                             for col, array in self._arrays.items()}, columns=list(self.columns))
+
+
+def records_to_frame(records):
+    """レコード列（dict のリスト・ColumnarRecords）から DataFrame を作成"""
+    if isinstance(records, ColumnarRecords):
+        return records.to_frame()
+    return pd.DataFrame(records)
+
+
+def compact_dataset(data):
+    """データの各ブロックを ColumnarRecords に置き換えた新しいデータ（変換できないブロックはそのまま）"""
+    compacted = {}
+    for section, section_data in data.items():
+        compacted[section] = {}
+        for data_type, records in section_data.items():
+            if isinstance(records, list):
+                records = ColumnarRecords.from_records(records) or records
+            compacted[section][data_type] = records
+    return compacted
+
+
+def json_default(value):
+    """json.dumps 用（ColumnarRecords を dict のリストとして出力）"""
+    if isinstance(value, ColumnarRecords):
+        return value.to_list()
+    return str(value)
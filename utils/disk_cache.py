@@ -0,0 +1,187 @@
+"""
+ワーカー・再起動をまたいで共有するコールバック出力のディスクキャッシュ
+有効時（環境変数 SFA_RESULT_STORE=1）はセクション依存コールバックの出力を SQLite に保存し、
+どのワーカーが計算した結果も全ワーカーで再利用する。プロセスを再起動しても残るため、
+デプロイ・スリープ後の最初の表示も計算し直さない
+
+- キー: コールバック・依存セクションの内容バージョン・入力（section_cache のキー）
+- 値: Dash の応答と同じ JSON（読み出した値のコンポーネント・図は辞書のまま）
+- 容量: 合計サイズが上限を超えたら最近使われていないものから削除する
+- コードの変更: アプリのソースから決まる世代が変わったら古い世代の結果を破棄する
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from config import PERFORMANCE
+from utils import metrics
+from utils.single_flight import decode, encode
+from utils.state_dir import private_dir
+
+logger = logging.getLogger(__name__)
+
+# ディスクキャッシュの有効/無効（環境変数 SFA_RESULT_STORE=1 で有効）
+enabled = PERFORMANCE['result_store_enabled']
+
+# 最終利用時刻を更新する間隔（秒、読み出しのたびに書き込まないため）
+_TOUCH_SECONDS = 60
+# 上限を超えたときにこの割合まで減らす
+_EVICT_RATIO = 0.9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    generation TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+"""
+
+
+def code_generation():
+    """読み込み済みのアプリのソース（exe では実行ファイル）とライブラリのバージョンから世代を決める"""
+    import dash
+    import plotly
+
+    digest = hashlib.sha1(f'{dash.__version__}:{plotly.__version__}'.encode())
+    if getattr(sys, 'frozen', False):
+        stat = os.stat(sys.executable)
+        digest.update(f'{stat.st_size}:{stat.st_mtime_ns}'.encode())
+        return digest.hexdigest()
+
+    root = os.path.dirname(os.path.abspath(sys.modules['config'].__file__))
+    paths = sorted({os.path.abspath(module.__file__) for module in list(sys.modules.values())
+                    if (getattr(module, '__file__', None) or '').endswith('.py')})
+    for path in paths:
+        if path.startswith(root + os.sep):
+            with open(path, 'rb') as f:
+                digest.update(os.path.relpath(path, root).encode() + b'\0' + f.read())
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    SQLite のコールバック出力キャッシュ（スレッド・プロセスごとに接続を持つ）
+
+    path : データベースファイル
+    max_bytes : 保存する値の合計サイズの上限
+    generation : 世代（None なら code_generation()）
+    """
+
+    def __init__(self, path, max_bytes=None, generation=None):
+        self.path = path
+        self.max_bytes = max_bytes or PERFORMANCE['result_store_max_mb'] * 1024 * 1024
+        self.generation = generation
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._prepared = False
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        # fork 前の接続は使わない
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), mode=0o700, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        with self._lock:
+            if not self._prepared:
+                if self.generation is None:
+                    self.generation = code_generation()
+                conn.executescript(_SCHEMA)
+                removed = conn.execute('DELETE FROM results WHERE generation != ?', (self.generation,)).rowcount
+                if removed:
+                    logger.info(f"コードの変更により古いディスクキャッシュを {removed} 件削除しました")
+                self._prepared = True
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @staticmethod
+    def _key(key):
+        return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """保存済みの出力を返す（ない場合・読み出せない場合は None）"""
+        try:
+            conn = self._connect()
+            row = conn.execute('SELECT value, accessed FROM results WHERE key = ? AND generation = ?',
+                               (self._key(key), self.generation)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[1] > _TOUCH_SECONDS:
+                conn.execute('UPDATE results SET accessed = ? WHERE key = ?', (now, self._key(key)))
+            return decode(row[0])
+        except (sqlite3.Error, OSError, ValueError):
+            logger.debug("ディスクキャッシュを読み出せませんでした", exc_info=True)
+            return None
+
+    def put(self, key, value):
+        """出力を保存し、上限を超えたら最近使われていないものから削除する"""
+        try:
+            text = encode(value)
+        except (TypeError, ValueError):
+            return
+        try:
+            conn = self._connect()
+            conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                         (self._key(key), self.generation, text, len(text), time.time()))
+            total = conn.execute('SELECT total(size) FROM results').fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(conn)
+        except (sqlite3.Error, OSError):
+            logger.debug("ディスクキャッシュに保存できませんでした", exc_info=True)
+
+    def _evict(self, conn):
+        evicted = conn.execute("""
+            DELETE FROM results WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY accessed DESC, key) AS running FROM results
+                ) WHERE running > ?
+            )""", (int(self.max_bytes * _EVICT_RATIO),)).rowcount
+        metrics.inc('sfa_disk_cache_evicted_total', evicted)
+
+    def delete(self, key):
+        try:
+            self._connect().execute('DELETE FROM results WHERE key = ?', (self._key(key),))
+        except (sqlite3.Error, OSError):
+            logger.debug("ディスクキャッシュから削除できませんでした", exc_info=True)
+
+    def clear(self):
+        try:
+            self._connect().execute('DELETE FROM results')
+        except (sqlite3.Error, OSError):
+            logger.debug("ディスクキャッシュを削除できませんでした", exc_info=True)
+
+    def stats(self):
+        """件数と合計サイズ"""
+        try:
+            count, size = self._connect().execute('SELECT count(*), total(size) FROM results').fetchone()
+        except (sqlite3.Error, OSError):
+            count, size = 0, 0
+        return {'entries': count, 'bytes': int(size)}
+
+
+# プロセス内で共有するディスクキャッシュ（既定はユーザー専用の一時ディレクトリ、他のユーザーに結果を書き換えさせない）
+result_store = DiskCache(PERFORMANCE['result_store_path']
+                         or os.path.join(private_dir('stores'), 'results.sqlite3'))
+
+
+def cached(key, compute, name='callback'):
+    """有効時は保存済みの出力を返し、ない場合は計算して保存する"""
+    if not enabled:
+        return compute()
+    result = result_store.get(key)
+    metrics.inc('sfa_disk_cache_total', callback=name, result='hit' if result is not None else 'miss')
+    if result is None:
+        result = compute()
+        if result is not None:
+            result_store.put(key, result)
+    return result
@@ -0,0 +1,272 @@
+"""
+コールバックのファンアウト分析
+有効時（環境変数 SFA_FANOUT=1）はコールバックの実行を起点の入力とリクエストの時刻でユーザー操作単位の
+トレースにまとめ、操作ごとのサーバー呼び出し数・合計処理時間・同一内容の重複計算数を /_fanout に表示する
+"""
+import html
+import json
+import threading
+import time
+from collections import Counter, deque
+
+import flask
+
+from config import PERFORMANCE
+from utils.output_fingerprint import SESSION_KEY
+
+# 分析の有効/無効（環境変数 SFA_FANOUT=1 で有効）
+enabled = PERFORMANCE['fanout_enabled']
+
+# 初回表示・タブ切り替え時のトリガーなしの呼び出し
+INITIAL_ACTION = 'initial'
+
+
+def note(kind, *key):
+    """コールバック内の計算を記録（同じトレース内で同じ kind・key が繰り返されたものを重複とみなす）"""
+    if not enabled or not flask.has_request_context():
+        return
+    computations = flask.g.get('fanout_computations')
+    if computations is not None:
+        computations[(kind, repr(key))] += 1
+
+
+def stringify_id(component_id):
+    """コンポーネントIDを changedPropIds と同じ文字列形式に変換"""
+    if isinstance(component_id, dict):
+        return json.dumps(component_id, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return str(component_id)
+
+
+def _output_props(outputs):
+    if isinstance(outputs, dict):
+        outputs = [outputs]
+    props = set()
+    for output in outputs or []:
+        if isinstance(output, list):
+            props |= _output_props(output)
+        elif isinstance(output, dict) and 'id' in output:
+            props.add(f"{stringify_id(output['id'])}.{output.get('property')}")
+    return props
+
+
+def _trigger_values(inputs, triggers):
+    """起点の入力の値（プロパティID → repr）"""
+    values = {}
+    for item in inputs or []:
+        for entry in item if isinstance(item, list) else [item]:
+            if isinstance(entry, dict) and 'id' in entry:
+                prop_id = f"{stringify_id(entry['id'])}.{entry.get('property')}"
+                if prop_id in triggers:
+                    values[prop_id] = repr(entry.get('value'))
+    return values
+
+
+def action_label(prop_ids):
+    """起点の入力から操作名を作成（パターンIDは type で代表する）"""
+    labels = set()
+    for prop_id in prop_ids:
+        component, _, prop = prop_id.rpartition('.')
+        if component.startswith('{'):
+            try:
+                component = json.loads(component).get('type', component)
+            except ValueError:
+                pass
+        labels.add(f'{component}.{prop}')
+    return ' + '.join(sorted(labels)) or INITIAL_ACTION
+
+
+class Trace:
+    """1回のユーザー操作から連鎖したコールバック実行"""
+
+    def __init__(self, action, triggers, start, trigger_values=None):
+        self.action = action
+        self.triggers = frozenset(triggers)
+        self.trigger_values = trigger_values or {}
+        self.start = start
+        self.end = start
+        self.outputs = set()
+        self.calls = []
+        self.computations = Counter()
+
+    def accepts(self, triggers, start, window, trigger_values=None):
+        """このトレースの続き（出力からの連鎖・新規コンポーネントの初期呼び出し・同じ入力値からの並列呼び出し）か"""
+        if start - self.end > window:
+            return False
+        if not triggers or set(triggers) <= self.outputs:
+            return True
+        # 同じ値の起点からの並列呼び出し（ボタンの連打などは値が変わるため別の操作になる）
+        return set(triggers) <= self.triggers and (trigger_values or {}) == {
+            prop_id: value for prop_id, value in self.trigger_values.items() if prop_id in triggers}
+
+    def add(self, callback, triggers, start, end, status, outputs, computations):
+        self.calls.append({
+            'callback': callback,
+            'trigger': action_label(triggers) if triggers else INITIAL_ACTION,
+            'duration_ms': round((end - start) * 1000, 2),
+            'status': status,
+        })
+        self.end = max(self.end, end)
+        self.outputs |= outputs
+        self.computations.update(computations)
+
+    @property
+    def server_ms(self):
+        return sum(call['duration_ms'] for call in self.calls)
+
+    def redundant(self):
+        """計算の種類 → 重複した回数"""
+        counts = Counter()
+        for (kind, _), count in self.computations.items():
+            if count > 1:
+                counts[kind] += count - 1
+        return counts
+
+    def summary(self):
+        return {
+            'action': self.action,
+            'fanout': len(self.calls),
+            'server_ms': round(self.server_ms, 2),
+            'wall_ms': round((self.end - self.start) * 1000, 2),
+            'redundant': sum(self.redundant().values()),
+            'calls': list(self.calls),
+        }
+
+
+class TraceBuilder:
+    """セッションごとのリクエストをユーザー操作単位のトレースにまとめる"""
+
+    def __init__(self, window=None, keep=None, sessions=None):
+        self.window = PERFORMANCE['fanout_window'] if window is None else window
+        self.traces = deque(maxlen=keep or PERFORMANCE['fanout_traces'])
+        self.max_sessions = sessions or PERFORMANCE['fingerprint_sessions']
+        self._current = {}
+        self._lock = threading.Lock()
+
+    def add(self, session, callback, triggers, start, end, status=200, outputs=(), computations=(),
+            trigger_values=None):
+        """1回のコールバック実行を記録し、属するトレースを返す"""
+        with self._lock:
+            trace = self._current.get(session)
+            if trace is None or not trace.accepts(triggers, start, self.window, trigger_values):
+                trace = Trace(action_label(triggers), triggers, start, trigger_values)
+                self.traces.append(trace)
+                self._current.pop(session, None)
+                self._current[session] = trace
+                # 保持するセッション数を制限
+                if len(self._current) > self.max_sessions:
+                    self._current.pop(next(iter(self._current)))
+            trace.add(callback, triggers, start, end, status, set(outputs), computations)
+            return trace
+
+    def reset(self):
+        with self._lock:
+            self.traces.clear()
+            self._current.clear()
+
+    def report(self):
+        """操作ごとの集計（平均サーバー時間の大きい順）"""
+        with self._lock:
+            traces = list(self.traces)
+            by_action = {}
+            for trace in traces:
+                by_action.setdefault(trace.action, []).append(trace)
+
+            actions = []
+            for action, group in by_action.items():
+                fanouts = [len(trace.calls) for trace in group]
+                server = [trace.server_ms for trace in group]
+                redundant = Counter()
+                callbacks = Counter()
+                for trace in group:
+                    redundant.update(trace.redundant())
+                    callbacks.update(call['callback'] for call in trace.calls)
+                actions.append({
+                    'action': action,
+                    'traces': len(group),
+                    'mean_fanout': round(sum(fanouts) / len(group), 2),
+                    'max_fanout': max(fanouts),
+                    'mean_server_ms': round(sum(server) / len(group), 2),
+                    'max_server_ms': round(max(server), 2),
+                    'mean_redundant': round(sum(redundant.values()) / len(group), 2),
+                    'redundant_by_kind': dict(redundant.most_common()),
+                    'callbacks': dict(callbacks.most_common()),
+                })
+            recent = [trace.summary() for trace in traces[-20:]]
+        actions.sort(key=lambda row: row['mean_server_ms'], reverse=True)
+        return {'window_s': self.window, 'actions': actions, 'recent': recent[::-1]}
+
+
+def _render(report):
+    """操作別の集計ページ"""
+    rows = []
+    for row in report['actions']:
+        redundant = '<br>'.join(f'{html.escape(kind)}: {count}' for kind, count in row['redundant_by_kind'].items())
+        callbacks = '<br>'.join(f'{html.escape(name)} ×{count}' for name, count in row['callbacks'].items())
+        rows.append(
+            f"<tr><td>{html.escape(row['action'])}</td><td>{row['traces']}</td>"
+            f"<td>{row['mean_fanout']}（最大 {row['max_fanout']}）</td>"
+            f"<td>{row['mean_server_ms']} ms（最大 {row['max_server_ms']} ms）</td>"
+            f"<td>{row['mean_redundant']}<br>{redundant}</td><td>{callbacks}</td></tr>"
+        )
+    body = ''.join(rows) or "<tr><td colspan='6'>記録されたトレースはありません</td></tr>"
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>コールバックのファンアウト</title>"
+        "<style>body{font-family:sans-serif;font-size:13px}td,th{border-bottom:1px solid #ddd;"
+        "padding:4px 8px;vertical-align:top;text-align:left}</style></head><body>"
+        "<h3>操作別のコールバック呼び出し（平均サーバー時間の大きい順）</h3><table><tr><th>操作</th><th>回数</th>"
+        "<th>呼び出し数</th><th>合計サーバー時間</th><th>重複計算</th><th>コールバック（合計）</th></tr>"
+        f"{body}</table><p><a href='/_fanout.json'>JSON</a></p></body></html>"
+    )
+
+
+# プロセス内で共有するトレース
+builder = TraceBuilder()
+
+
+def init_app(app):
+    """Dashアプリにトレース用のフックと /_fanout を登録（無効時は何もしない）"""
+    if not enabled:
+        return
+
+    server = app.server
+    update_path = f"{app.config.requests_pathname_prefix}_dash-update-component"
+    callback_names = {}
+
+    def callback_name(output):
+        name = callback_names.get(output)
+        if name is None:
+            callback = app.callback_map.get(output, {}).get('callback')
+            name = callback_names[output] = getattr(callback, '__name__', output)
+        return name
+
+    @server.before_request
+    def _start_trace():
+        if flask.request.path == update_path:
+            flask.g.fanout_start = time.perf_counter()
+            flask.g.fanout_computations = Counter()
+
+    @server.after_request
+    def _record_trace(response):
+        start = flask.g.pop('fanout_start', None)
+        if start is None:
+            return response
+        computations = flask.g.pop('fanout_computations', None) or ()
+        payload = flask.request.get_json(silent=True) or {}
+        session = payload.get(SESSION_KEY)
+        if session:
+            triggers = payload.get('changedPropIds') or []
+            builder.add(
+                session, callback_name(payload.get('output', '')), triggers,
+                start, time.perf_counter(), response.status_code,
+                _output_props(payload.get('outputs')), computations,
+                _trigger_values(payload.get('inputs'), triggers),
+            )
+        return response
+
+    @server.route('/_fanout')
+    def _fanout():
+        return _render(builder.report())
+
+    @server.route('/_fanout.json')
+    def _fanout_json():
+        return flask.jsonify(builder.report())
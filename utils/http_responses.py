@@ -0,0 +1,145 @@
+"""
+HTTP応答の圧縮と条件付きキャッシュ
+- 一定サイズ以上のテキスト系応答を gzip / brotli（インストール時）で圧縮する（ストリーミング応答は逐次圧縮）
+- _dash-layout・_dash-dependencies にアプリのビルドとデータバージョンから決まる ETag を付け、
+  If-None-Match が一致すればレイアウトを生成せず 304 を返す
+"""
+import hashlib
+import os
+import zlib
+
+import dash
+import flask
+
+from config import PERFORMANCE
+
+try:
+    import brotli
+except ImportError:  # brotli は任意（なければ gzip のみ）
+    brotli = None
+
+# 圧縮対象の Content-Type
+COMPRESSIBLE_TYPES = ('application/json', 'text/html', 'text/css', 'text/plain',
+                      'text/javascript', 'application/javascript', 'image/svg+xml')
+
+# ビルドIDの計算に含めるソース
+BUILD_SOURCES = ('main.py', 'config.py', 'data_manager.py', 'callbacks', 'components', 'layouts', 'utils', 'assets')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_build_id = None
+
+
+def build_id():
+    """アプリのビルドID（環境変数 SFA_BUILD_ID、なければソースと Dash のバージョンから計算）"""
+    global _build_id
+    if _build_id is None:
+        _build_id = os.environ.get('SFA_BUILD_ID') or _source_digest()
+    return _build_id
+
+
+def _source_digest():
+    digest = hashlib.sha1(dash.__version__.encode('utf-8'))
+    for source in BUILD_SOURCES:
+        path = os.path.join(ROOT, source)
+        paths = [path] if os.path.isfile(path) else sorted(
+            os.path.join(current, name)
+            for current, dirs, names in os.walk(path) if '__pycache__' not in current
+            for name in names if not name.endswith('.pyc'))
+        for file_path in paths:
+            digest.update(os.path.relpath(file_path, ROOT).encode('utf-8'))
+            with open(file_path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def _choose_encoding():
+    accepted = flask.request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compressor(encoding):
+    """compress(chunk) と flush() を持つ圧縮器"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=PERFORMANCE['brotli_quality'])
+        return compressor.process, compressor.finish
+    # wbits=31 で gzip 形式（ヘッダーの時刻は 0 なので同じ内容は同じバイト列になる）
+    compressor = zlib.compressobj(PERFORMANCE['gzip_level'], zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def _stream(chunks, encoding):
+    compress, flush = _compressor(encoding)
+    for chunk in chunks:
+        data = compress(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield flush()
+
+
+def compress_response(response):
+    """条件を満たす応答を圧縮（対象外の応答はそのまま返す）"""
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < PERFORMANCE['compress_min_bytes']:
+            return response
+        compress, flush = _compressor(encoding)
+        response.set_data(compress(body) + flush())
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_app(app, data_version=None):
+    """
+    Dashアプリに圧縮と ETag のフックを登録
+
+    data_version : レイアウトの内容のバージョン（公開中のデータ・最終更新時刻が変わると変わる値）を返す関数
+    他のフックが圧縮前の応答を参照できるよう、最初に登録する（after_request は登録と逆順に実行される）
+    """
+    server = app.server
+    prefix = app.config.requests_pathname_prefix
+    conditional_paths = {f'{prefix}_dash-layout', f'{prefix}_dash-dependencies'}
+
+    def current_etag():
+        version = data_version() if data_version else 0
+        return f'{build_id()}-{version}'
+
+    @server.before_request
+    def _not_modified():
+        if flask.request.method != 'GET' or flask.request.path not in conditional_paths:
+            return None
+        # 生成中にデータが更新されても古い内容に新しい ETag を付けないよう、生成前に決める
+        etag = flask.g.response_etag = current_etag()
+        if not flask.request.if_none_match.contains_weak(etag):
+            return None
+        response = flask.Response(status=304)
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    @server.after_request
+    def _finalize_response(response):
+        etag = flask.g.pop('response_etag', None)
+        if etag is not None and response.status_code == 200:
+            # 毎回検証させ、変わっていなければ 304 で本文を送らない
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'no-cache'
+        if PERFORMANCE['compress_enabled']:
+            response = compress_response(response)
+        return response
@@ -0,0 +1,72 @@
+"""
+初期表示の出力をレイアウトに埋め込む
+ページ読み込み時のレイアウトに公開中のデータの選択肢・既定の月と、セクション依存コールバックの
+初期出力を埋め込み、最初の画面をレイアウトの応答だけで表示する。
+埋め込んだ出力はレイアウトのデータバージョンごとにフィンガープリントを記録し、
+ページ読み込み直後の初回呼び出しで同じ内容なら送信しない
+"""
+import logging
+
+from utils.output_fingerprint import LAYOUT_VERSION_ID, remember_layout_outputs
+from utils.section_cache import SECTION_CALLBACKS
+
+logger = logging.getLogger(__name__)
+
+
+def _component(layout, component_id):
+    try:
+        return layout[component_id]
+    except KeyError:
+        return None
+
+
+def set_outputs(layout, outputs, values):
+    """Output の一覧に対応する値をレイアウト内のコンポーネントへ設定"""
+    for output, value in zip(outputs, values):
+        setattr(layout[output.component_id], output.component_property, value)
+
+
+def _specs(entry):
+    output = entry['output']
+    return output if isinstance(output, list) else [output]
+
+
+def embed_section_outputs(app, layout, data_version):
+    """
+    入力・出力がすべてレイアウト内にあるセクション依存コールバックを実行し、出力を埋め込む
+
+    出力は section_output_cache に格納されるため、初回呼び出しでも再計算しない
+    data_version : 公開中のデータバージョンを返す関数（レイアウトに埋め込み、記録のキーにする）
+    """
+    version = data_version()
+    embedded = []
+    for entry in app.callback_map.values():
+        callback = SECTION_CALLBACKS.get(getattr(entry['callback'], '__name__', None))
+        outputs = _specs(entry)
+        if callback is None or any(isinstance(output.component_id, dict) for output in outputs):
+            continue
+        targets = [_component(layout, output.component_id) for output in outputs]
+        sources = [_component(layout, item['id']) if isinstance(item['id'], str) else None
+                   for item in entry['inputs'] + entry['state']]
+        if None in targets or None in sources:
+            continue
+
+        args = [getattr(source, item['property'], None)
+                for source, item in zip(sources, entry['inputs'] + entry['state'])]
+        try:
+            result = callback(*args)
+        except Exception:
+            logger.exception(f"{callback.__name__} の初期出力を計算できませんでした")
+            continue
+        values = list(result) if len(outputs) > 1 or isinstance(entry['output'], list) else [result]
+        if len(values) != len(outputs):
+            continue
+        set_outputs(layout, outputs, values)
+        embedded.extend(({'id': output.component_id, 'property': output.component_property}, value)
+                        for output, value in zip(outputs, values))
+
+    marker = _component(layout, LAYOUT_VERSION_ID)
+    # 埋め込みの途中でデータが公開された場合は、どのバージョンの出力か確定しないため記録しない
+    if marker is not None and data_version() == version:
+        setattr(marker, 'data-version', str(version))
+        remember_layout_outputs(version, embedded)
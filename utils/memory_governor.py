@@ -0,0 +1,139 @@
+"""
+メモリ使用量に応じたキャッシュの削減
+すべての LRUCache（cache_registry）と memory_sources に登録した報告元がおおよそのバイト数を報告し、
+ワーカーごとの監視スレッドがプロセスの RSS を予算（環境変数 SFA_MEMORY_BUDGET_MB）と比べる。
+予算を超えたら、再計算時間に対してメモリを多く使っているキャッシュから古いエントリを削除する
+
+キャッシュごとの使用量は予算の設定に関係なく /metrics の sfa_cache_bytes で確認できる
+"""
+import ctypes
+import ctypes.util
+import gc
+import logging
+import math
+import os
+import threading
+import time
+
+from config import PERFORMANCE
+from utils import metrics
+from utils.cache_utils import approx_size, cache_registry, memory_sources
+from utils.memory_report import process_rss_bytes
+
+logger = logging.getLogger(__name__)
+
+# 予算を超えたときにこの割合まで減らす
+LOW_WATERMARK = 0.95
+# ヒットしたことのないキャッシュの利用頻度（0 だとどれも同じ評価になるため）
+_MIN_HIT_RATE = 0.01
+
+
+def benefit_per_byte(stats, approx_bytes):
+    """1バイトあたりの保持する価値（ヒット率 × 再計算時間 / エントリのバイト数）"""
+    if not stats['size'] or not approx_bytes:
+        return math.inf
+    entry_bytes = approx_bytes / stats['size']
+    return max(stats['hit_rate'], _MIN_HIT_RATE) * stats['miss_seconds'] / entry_bytes
+
+
+def _release_free_memory():
+    """解放済みのヒープを OS へ返す（glibc のみ、ほかの環境では何もしない）"""
+    gc.collect()
+    try:
+        ctypes.CDLL(ctypes.util.find_library('c')).malloc_trim(0)
+    except (OSError, AttributeError, TypeError):
+        pass
+
+
+class MemoryGovernor:
+    """
+    RSS の予算を超えたらキャッシュを削減する
+
+    budget_bytes : RSS の予算（0 なら削減しない）
+    interval : RSS を確認する間隔（秒）
+    """
+
+    def __init__(self, budget_bytes=None, interval=None, caches=cache_registry):
+        self.budget_bytes = (PERFORMANCE['memory_budget_mb'] * 1024 * 1024 if budget_bytes is None
+                             else budget_bytes)
+        self.interval = interval or PERFORMANCE['memory_check_seconds']
+        self.caches = caches
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def check(self, rss=None):
+        """RSS が予算を超えていれば削減する（削除したエントリ数を返す）"""
+        if self.budget_bytes <= 0:
+            return 0
+        rss = process_rss_bytes() if rss is None else rss
+        if rss is None or rss <= self.budget_bytes:
+            return 0
+        return self.relieve(rss - self.budget_bytes * LOW_WATERMARK)
+
+    def relieve(self, excess_bytes):
+        """1バイトあたりの価値が低いキャッシュから excess_bytes 分のエントリを削除"""
+        with self._lock:
+            candidates = []
+            for cache in list(self.caches):
+                approx_bytes = cache.approx_bytes()
+                if len(cache) and approx_bytes:
+                    candidates.append((benefit_per_byte(cache.stats(), approx_bytes), cache, approx_bytes))
+            candidates.sort(key=lambda candidate: candidate[0])
+
+            evicted = 0
+            remaining = excess_bytes
+            for _, cache, approx_bytes in candidates:
+                if remaining <= 0:
+                    break
+                entry_bytes = approx_bytes / max(len(cache), 1)
+                removed = cache.trim(math.ceil(remaining / entry_bytes))
+                remaining -= removed * entry_bytes
+                evicted += removed
+                metrics.inc('sfa_memory_evicted_total', removed, cache=cache.name)
+                logger.info(f"メモリ予算の超過によりキャッシュ {cache.name} から {removed} 件削除しました")
+        if evicted:
+            _release_free_memory()
+        return evicted
+
+    def ensure_running(self):
+        """監視スレッドを起動（fork 前のスレッドは引き継がれないためプロセスごと）"""
+        if self.budget_bytes <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._watch, name='sfa-memory-governor', daemon=True)
+            self._thread.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception:
+                logger.exception("キャッシュの削減に失敗しました")
+
+
+# プロセス内で共有する監視
+governor = MemoryGovernor()
+
+
+def init_app(app, data_manager):
+    """公開中のデータの使用量を報告元に登録し、リクエストのたびに監視スレッドを確認する"""
+    dataset_bytes = {}
+
+    def _dataset_bytes():
+        # データは公開・コンパクト化（バージョンは変わらない）のたびに差し替わるため、同じデータは1回だけ見積もる
+        data = data_manager.data
+        key = (data_manager.version, id(data))
+        if key not in dataset_bytes:
+            dataset_bytes.clear()
+            dataset_bytes[key] = approx_size(data)
+        return dataset_bytes[key]
+
+    memory_sources['dataset'] = _dataset_bytes
+
+    if governor.budget_bytes > 0:
+        app.server.before_request(governor.ensure_running)
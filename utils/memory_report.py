@@ -0,0 +1,107 @@
+"""
+プロセスのメモリ内訳（Linux の /proc/<pid>/smaps_rollup）
+gunicorn のマスターとワーカーごとに、ワーカー固有のメモリ（USS）とfork元と共有しているメモリ・
+按分後の実使用量（PSS）を集計する
+
+使い方:
+  python -m utils.memory_report <マスターのPID>
+"""
+import argparse
+import os
+import sys
+
+# smaps_rollup の項目 → 集計キー
+_FIELDS = {
+    'Rss': 'rss_kib',
+    'Pss': 'pss_kib',
+    'Shared_Clean': 'shared_kib',
+    'Shared_Dirty': 'shared_kib',
+    'Private_Clean': 'unique_kib',
+    'Private_Dirty': 'unique_kib',
+}
+
+
+def process_memory(pid='self'):
+    """プロセスのメモリ内訳（KiB、取得できない環境では None）"""
+    usage = dict.fromkeys(_FIELDS.values(), 0)
+    path = f'/proc/{pid}/smaps_rollup'
+    if not os.path.exists(path):
+        path = f'/proc/{pid}/smaps'
+    try:
+        with open(path) as f:
+            for line in f:
+                name, _, rest = line.partition(':')
+                key = _FIELDS.get(name)
+                if key is not None:
+                    usage[key] += int(rest.split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return usage
+
+
+def process_rss_bytes():
+    """このプロセスの現在の RSS（バイト、取得できない環境では None）"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def child_pids(pid):
+    """子プロセスのPID一覧"""
+    children = []
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        return []
+    return sorted(children)
+
+
+def worker_report(master_pid=None):
+    """
+    マスターと全ワーカーのメモリ内訳
+
+    master_pid : 省略時はこのプロセスの親（ワーカー内から呼び出す場合）
+    """
+    master_pid = master_pid or os.getppid()
+    workers = []
+    for pid in child_pids(master_pid):
+        usage = process_memory(pid)
+        if usage is not None:
+            workers.append({'pid': pid, **usage})
+    master = process_memory(master_pid)
+    total_pss = sum(worker['pss_kib'] for worker in workers) + (master['pss_kib'] if master else 0)
+    return {
+        'master': {'pid': master_pid, **master} if master else None,
+        'workers': workers,
+        'total_pss_kib': total_pss,
+    }
+
+
+def format_report(report):
+    lines = [f"{'プロセス':<16}{'PID':>8}{'RSS':>10}{'PSS':>10}{'固有':>10}{'共有':>10}  (MiB)"]
+    rows = ([('master', report['master'])] if report['master'] else []) + [
+        (f'worker {index}', worker) for index, worker in enumerate(report['workers'], 1)]
+    for name, usage in rows:
+        lines.append(f"{name:<16}{usage['pid']:>8}" + ''.join(
+            f"{usage[key] / 1024:>10.1f}" for key in ('rss_kib', 'pss_kib', 'unique_kib', 'shared_kib')))
+    lines.append(f"合計 PSS {report['total_pss_kib'] / 1024:.1f} MiB")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='gunicorn マスター・ワーカーのメモリ内訳')
+    parser.add_argument('pid', type=int, help='マスタープロセスのPID')
+    args = parser.parse_args(argv)
+    if process_memory(args.pid) is None:
+        print(f'PID {args.pid} のメモリ情報を取得できません（Linux のみ対応）')
+        return 1
+    print(format_report(worker_report(args.pid)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
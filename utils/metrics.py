@@ -0,0 +1,268 @@
+"""
+コールバック・データ取り込みの計測
+コールバックごとのレイテンシ・応答サイズ・例外数・キャッシュヒット率と取り込み処理の段階別時間を記録し、
+/metrics に Prometheus テキスト形式で公開する（無効時は計測処理を行わない）
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+
+import flask
+
+from config import PERFORMANCE
+from utils.cache_utils import cache_registry, memory_sources
+from utils.memory_report import process_rss_bytes
+
+# 計測の有効/無効（環境変数 SFA_METRICS=1 で有効）
+enabled = PERFORMANCE['metrics_enabled']
+
+# ヒストグラムのバケット
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# メトリクスの説明（名前 → (種類, 説明)）
+METRIC_HELP = {
+    'sfa_callback_duration_seconds': ('histogram', 'コールバックの処理時間（シリアライズを含む）'),
+    'sfa_callback_response_bytes': ('histogram', 'コールバック応答のサイズ'),
+    'sfa_callback_requests_total': ('counter', 'コールバックのリクエスト数（HTTPステータス別）'),
+    'sfa_callback_exceptions_total': ('counter', 'コールバックで発生した例外の数'),
+    'sfa_callback_cache_total': ('counter', 'セクション依存キャッシュの参照結果（hit/miss）'),
+    'sfa_ingest_stage_duration_seconds': ('histogram', 'データ取り込み処理の段階別の時間'),
+    'sfa_cache_hits_total': ('counter', 'キャッシュのヒット数'),
+    'sfa_cache_misses_total': ('counter', 'キャッシュのミス数'),
+    'sfa_cache_entries': ('gauge', 'キャッシュのエントリ数'),
+    'sfa_cache_bytes': ('gauge', 'キャッシュ・公開中のデータのおおよそのメモリ使用量（バイト）'),
+    'sfa_cache_miss_seconds': ('gauge', 'キャッシュのミス時の再計算時間（指数移動平均）'),
+    'sfa_process_rss_bytes': ('gauge', 'プロセスの RSS（バイト）'),
+    'sfa_memory_budget_bytes': ('gauge', 'RSS の予算（バイト、0 は無制限）'),
+    'sfa_memory_evicted_total': ('counter', 'メモリ予算の超過によりキャッシュから削除したエントリ数'),
+    'sfa_data_version': ('gauge', '公開中のデータバージョン'),
+    'sfa_admission_total': ('counter', '重いコールバックの流入制御の結果（admitted/superseded/busy）'),
+    'sfa_admission_wait_seconds': ('histogram', '重いコールバックの実行枠を待った時間'),
+    'sfa_background_jobs_total': ('counter', 'バックグラウンド実行のジョブ（submitted/inline/cached/cancelled）'),
+    'sfa_disk_cache_total': ('counter', 'ディスクキャッシュの参照数（hit/miss）'),
+    'sfa_disk_cache_evicted_total': ('counter', '容量の上限によりディスクキャッシュから削除した数'),
+    'sfa_single_flight_total': ('counter', '他のリクエストの計算結果を共有した数（shared/shared_worker/fallback）'),
+    'sfa_prefetch_total': ('counter', '投機計算の結果（computed/cached/cancelled/dropped/abandoned）'),
+    'sfa_warmup_duration_seconds': ('histogram', 'データ公開後のウォームアップの時間'),
+}
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_NULL_CONTEXT = nullcontext()
+
+
+class Histogram:
+    """累積バケット付きヒストグラム"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _ErrorLogCounter(logging.Handler):
+    """コールバック処理中に出力された ERROR ログを数える"""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+
+    def emit(self, record):
+        if flask.has_request_context() and 'metrics_start' in flask.g:
+            flask.g.metrics_errors = flask.g.get('metrics_errors', 0) + 1
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    """ヒストグラムに値を記録"""
+    if not enabled:
+        return
+    key = (name, _labels_key(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+
+def inc(name, amount=1, **labels):
+    """カウンタを加算"""
+    if not enabled:
+        return
+    key = (name, _labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+@contextmanager
+def _timed_stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('sfa_ingest_stage_duration_seconds', time.perf_counter() - start, stage=name)
+
+
+def stage(name):
+    """取り込み処理の段階の時間を計測するコンテキストマネージャ"""
+    if not enabled:
+        return _NULL_CONTEXT
+    return _timed_stage(name)
+
+
+class StageTimer:
+    """連続する処理段階の時間を計測（mark() で直前の mark() からの時間を記録）"""
+
+    def __init__(self):
+        self._last = time.perf_counter()
+
+    def mark(self, name):
+        now = time.perf_counter()
+        observe('sfa_ingest_stage_duration_seconds', now - self._last, stage=name)
+        self._last = now
+
+
+class _NullStageTimer:
+    def mark(self, name):
+        pass
+
+
+_NULL_STAGE_TIMER = _NullStageTimer()
+
+
+def stage_timer():
+    """取り込み処理の段階別計測用タイマー"""
+    return StageTimer() if enabled else _NULL_STAGE_TIMER
+
+
+def reset():
+    """記録済みのメトリクスを破棄"""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(data_version=None):
+    """Prometheus テキスト形式で出力"""
+    samples = {}
+    with _lock:
+        for (name, labels), histogram in sorted(_histograms.items(), key=lambda item: item[0]):
+            lines = samples.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append((f'{name}_bucket', labels + (('le', bound),), cumulative))
+            lines.append((f'{name}_bucket', labels + (('le', '+Inf'),), histogram.count))
+            lines.append((f'{name}_sum', labels, histogram.sum))
+            lines.append((f'{name}_count', labels, histogram.count))
+        for (name, labels), value in sorted(_counters.items()):
+            samples.setdefault(name, []).append((name, labels, value))
+
+    for cache in sorted(cache_registry, key=lambda c: c.name):
+        stats = cache.stats()
+        labels = (('cache', stats['name']),)
+        samples.setdefault('sfa_cache_hits_total', []).append(('sfa_cache_hits_total', labels, stats['hits']))
+        samples.setdefault('sfa_cache_misses_total', []).append(('sfa_cache_misses_total', labels, stats['misses']))
+        samples.setdefault('sfa_cache_entries', []).append(('sfa_cache_entries', labels, stats['size']))
+        samples.setdefault('sfa_cache_bytes', []).append(('sfa_cache_bytes', labels, cache.approx_bytes()))
+        samples.setdefault('sfa_cache_miss_seconds', []).append(
+            ('sfa_cache_miss_seconds', labels, stats['miss_seconds']))
+    for name, approx_bytes in sorted(memory_sources.items()):
+        samples.setdefault('sfa_cache_bytes', []).append(('sfa_cache_bytes', (('cache', name),), approx_bytes()))
+
+    rss = process_rss_bytes()
+    if rss is not None:
+        samples['sfa_process_rss_bytes'] = [('sfa_process_rss_bytes', (), rss)]
+    samples['sfa_memory_budget_bytes'] = [
+        ('sfa_memory_budget_bytes', (), PERFORMANCE['memory_budget_mb'] * 1024 * 1024)]
+
+    if data_version is not None:
+        samples['sfa_data_version'] = [('sfa_data_version', (), data_version)]
+
+    output = []
+    for name in sorted(samples):
+        metric_type, help_text = METRIC_HELP.get(name, ('untyped', name))
+        output.append(f'# HELP {name} {help_text}')
+        output.append(f'# TYPE {name} {metric_type}')
+        for sample_name, labels, value in samples[name]:
+            output.append(f'{sample_name}{_format_labels(labels)} {_format_value(value)}')
+    return '\n'.join(output) + '\n'
+
+
+def init_app(app, data_version=None):
+    """
+    Dashアプリに計測用のフックと /metrics エンドポイントを登録（無効時は何もしない）
+
+    data_version : 公開中のデータバージョンを返す関数
+    """
+    if not enabled:
+        return
+
+    server = app.server
+    update_path = f"{app.config.requests_pathname_prefix}_dash-update-component"
+    callback_names = {}
+
+    def callback_name(output):
+        name = callback_names.get(output)
+        if name is None:
+            callback = app.callback_map.get(output, {}).get('callback')
+            name = callback_names[output] = getattr(callback, '__name__', output)
+        return name
+
+    # コールバック内で捕捉されログ出力された例外も計上する
+    root_logger = logging.getLogger()
+    if not any(isinstance(handler, _ErrorLogCounter) for handler in root_logger.handlers):
+        root_logger.addHandler(_ErrorLogCounter())
+
+    @server.before_request
+    def _start_timer():
+        if flask.request.path == update_path:
+            flask.g.metrics_start = time.perf_counter()
+
+    @server.after_request
+    def _record_callback(response):
+        start = flask.g.pop('metrics_start', None)
+        if start is None:
+            return response
+        body = flask.request.get_json(silent=True) or {}
+        name = callback_name(body.get('output', ''))
+        observe('sfa_callback_duration_seconds', time.perf_counter() - start, callback=name)
+        observe('sfa_callback_response_bytes', response.calculate_content_length() or 0, BYTES_BUCKETS, callback=name)
+        inc('sfa_callback_requests_total', callback=name, status=response.status_code)
+        # 未処理の例外（500）はFlaskがERRORログを出力するため、ログ件数で数える
+        errors = flask.g.pop('metrics_errors', 0) or (1 if response.status_code >= 500 else 0)
+        if errors:
+            inc('sfa_callback_exceptions_total', errors, callback=name)
+        return response
+
+    @server.route('/metrics')
+    def _metrics():
+        version = data_version() if data_version else None
+        return flask.Response(render(version), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
@@ -0,0 +1,217 @@
+"""
+出力フィンガープリントによる未変更出力の送信抑制
+セッション（ページ読み込み）ごとにクライアントが保持している出力のフィンガープリントを記録し、
+同じ内容を再送する代わりに no_update を返す
+"""
+import functools
+import hashlib
+import json
+import threading
+from collections import defaultdict
+
+import flask
+from dash import callback_context, no_update
+from dash._callback import NoUpdate
+from plotly.io.json import to_json_plotly
+
+from config import PERFORMANCE
+from utils.cache_utils import LRUCache
+
+# リクエストにセッションIDを付与するキー
+SESSION_KEY = 'sessionId'
+# リクエストにレイアウトを作ったデータバージョンを付与するキー
+LAYOUT_VERSION_KEY = 'layoutVersion'
+# レイアウトを作ったデータバージョンを data-version 属性に持つ非表示要素のID
+LAYOUT_VERSION_ID = 'layout-version'
+
+# ページ読み込みごとのセッションIDとレイアウトのデータバージョンをコールバックリクエストに付与するレンダラーフック
+RENDERER_HOOKS = {
+    'request_pre': (
+        "function(payload) {"
+        " window.__dashSessionId = window.__dashSessionId"
+        " || (Date.now().toString(36) + Math.random().toString(36).slice(2));"
+        f" payload.{SESSION_KEY} = window.__dashSessionId;"
+        f" var layout = document.getElementById('{LAYOUT_VERSION_ID}');"
+        f" if (layout) {{ payload.{LAYOUT_VERSION_KEY} = layout.getAttribute('data-version'); }}"
+        " }"
+    )
+}
+
+
+class _SessionOutputs:
+    """1セッションが保持している出力のフィンガープリント"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.held = {}
+        self.in_flight = defaultdict(int)
+        self.overlapped = set()
+
+    def start(self, key):
+        """計算開始（同じ出力のリクエストが重なったかを記録）"""
+        self.in_flight[key] += 1
+        if self.in_flight[key] > 1:
+            self.overlapped.add(key)
+
+    def finish(self, key):
+        """計算終了（他のリクエストと重なっていたかを返す）"""
+        self.in_flight[key] -= 1
+        overlapped = key in self.overlapped
+        if self.in_flight[key] <= 0:
+            del self.in_flight[key]
+            self.overlapped.discard(key)
+        return overlapped
+
+
+# セッションID → _SessionOutputs
+session_outputs = LRUCache(maxsize=PERFORMANCE['fingerprint_sessions'], name='output_fingerprint')
+
+# レイアウトに埋め込んだ初期出力（データバージョン → 出力の識別子 → フィンガープリント）
+layout_outputs = LRUCache(maxsize=8, name='layout_outputs')
+
+# 同じ出力オブジェクト（キャッシュ済み出力など）のシリアライズを繰り返さないためのメモ
+_fingerprint_memo = LRUCache(maxsize=256, name='fingerprint_memo')
+_sessions_lock = threading.Lock()
+
+
+def _request_value(name):
+    if not flask.has_request_context():
+        return None
+    body = flask.request.get_json(silent=True)
+    return body.get(name) if isinstance(body, dict) else None
+
+
+def get_session_id():
+    """現在のコールバックリクエストのセッションID（なければ None）"""
+    return _request_value(SESSION_KEY)
+
+
+def fingerprint(value):
+    """出力値のフィンガープリント（Dashと同じJSONシリアライズのハッシュ）"""
+    memo = _fingerprint_memo.get(id(value))
+    if memo is not None and memo[0] is value:
+        return memo[1]
+    digest = hashlib.sha1(to_json_plotly(value).encode('utf-8')).hexdigest()
+    _fingerprint_memo.put(id(value), (value, digest))
+    return digest
+
+
+def _output_key(output):
+    """出力の識別子（{'id': ..., 'property': ...} のJSON）"""
+    return json.dumps(output, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def remember_layout_outputs(version, outputs):
+    """
+    レイアウトに埋め込んだ出力 [(出力, 値)] をデータバージョンごとに記録
+
+    ページ読み込み直後の初回呼び出しでは、そのクライアントのレイアウトと同じバージョンの記録とだけ比べる
+    """
+    fingerprints = {_output_key(output): fingerprint(value) for output, value in outputs}
+    with _sessions_lock:
+        held = layout_outputs.get(str(version))
+        layout_outputs.put(str(version), dict(held or {}, **fingerprints))
+
+
+def _layout_fingerprints():
+    """現在のリクエストのレイアウトに埋め込まれた出力のフィンガープリント（不明なら空）"""
+    version = _request_value(LAYOUT_VERSION_KEY)
+    return (layout_outputs.get(str(version)) if version is not None else None) or {}
+
+
+def _session_outputs(session_id):
+    with _sessions_lock:
+        state = session_outputs.get(session_id)
+        if state is None:
+            state = _SessionOutputs()
+            session_outputs.put(session_id, state)
+        return state
+
+
+def remember_sent_outputs(result):
+    """
+    skip_unchanged_outputs を経由せずに送信する出力（background コールバックの結果など）を記録
+
+    プロセスプールで計算した結果はリクエストの外で作られるため、ポーリングの応答で返すときに
+    クライアントが保持する内容として記録する（記録しないと古い内容と比べて no_update を返してしまう）
+    """
+    session_id = get_session_id()
+    if session_id is None:
+        return
+    outputs = callback_context.outputs_list
+    multi = isinstance(outputs, list)
+    keys = [_output_key(output) for output in (outputs if multi else [outputs])]
+    values = list(result) if multi and isinstance(result, (list, tuple)) else [result]
+    state = _session_outputs(session_id)
+    with state.lock:
+        if len(values) != len(keys):
+            for key in keys:
+                state.held.pop(key, None)
+            return
+        for key, value in zip(keys, values):
+            if not NoUpdate.is_no_update(value):
+                state.held[key] = fingerprint(value)
+
+
+def skip_unchanged_outputs(func):
+    """
+    クライアントが既に同じ内容を保持している出力は no_update を返すデコレータ
+
+    @app.callback(...) の内側に付ける。初回呼び出し（タブ切替で再マウントされた場合を含む）と
+    同じ出力へのリクエストが重なった場合は常に送信する。ただしページ読み込み直後の初回呼び出しで
+    レイアウトに埋め込んだ出力と同じ内容の場合は送信しない
+    """
+    @functools.wraps(func)
+    def wrapper(*args):
+        session_id = get_session_id()
+        if session_id is None:
+            return func(*args)
+
+        outputs = callback_context.outputs_list
+        multi = isinstance(outputs, list)
+        keys = [_output_key(output) for output in (outputs if multi else [outputs])]
+        initial = not callback_context.triggered
+        layout_fingerprints = _layout_fingerprints() if initial else {}
+        state = _session_outputs(session_id)
+
+        with state.lock:
+            for key in keys:
+                state.start(key)
+        try:
+            result = func(*args)
+        except Exception:
+            with state.lock:
+                for key in keys:
+                    state.finish(key)
+            raise
+
+        values = list(result) if multi else [result]
+        if len(values) != len(keys):
+            with state.lock:
+                for key in keys:
+                    state.finish(key)
+                    state.held.pop(key, None)
+            return result
+
+        fingerprints = [None if value is no_update else fingerprint(value) for value in values]
+        sent = []
+        with state.lock:
+            for key, value, digest in zip(keys, values, fingerprints):
+                overlapped = state.finish(key)
+                if digest is None:
+                    # コールバック自身が no_update を返した場合はクライアントの値は変わらない
+                    sent.append(value)
+                    continue
+                if not initial and not overlapped and state.held.get(key) == digest:
+                    sent.append(no_update)
+                elif initial and not overlapped and key not in state.held and layout_fingerprints.get(key) == digest:
+                    # ページ読み込み時のレイアウトに同じ内容が埋め込まれている（タブ切替での再マウントは送信）
+                    sent.append(no_update)
+                else:
+                    sent.append(value)
+                # 重なったリクエストは応答の適用順が分からないため記録しない
+                state.held[key] = None if overlapped else digest
+
+        return sent if multi else sent[0]
+
+    return wrapper
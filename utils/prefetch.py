@@ -0,0 +1,207 @@
+"""
+コールバック出力の投機的な事前計算
+有効時（環境変数 SFA_PREFETCH=1）はセクション依存コールバックの実行後、同じフィルタ状態で
+前後の月・計画比/計画差・累月/単月を反対にした入力の出力をバックグラウンドで計算し、
+コールバック出力のキャッシュに格納しておく（次のクリックがキャッシュヒットになる）
+
+- 同時に実行する投機計算はワーカースレッド数（既定 1）まで
+- 実リクエストの処理中は開始せず、待ち時間が上限を超えたもの・待ち行列からあふれたものは破棄する
+- 実行中の投機計算は実リクエストが来たら中断する（計算の区切りで checkpoint() が Cancelled を送出）
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+
+import flask
+
+from config import PERFORMANCE
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# 投機計算の有効/無効（環境変数 SFA_PREFETCH=1 で有効）
+enabled = PERFORMANCE['prefetch_enabled']
+
+# 表示切り替えの入力（ボタンの className）→ 反対の状態
+TOGGLE_PARAMS = ('plan_ratio_class', 'cumulative_class')
+MONTH_PARAM = 'selected_month'
+
+# 実行中の投機計算の中断フラグ（投機計算のワーカースレッドの中だけ設定）
+_cancel_flag = ContextVar('sfa_prefetch_cancel', default=None)
+
+
+class Cancelled(BaseException):
+    """実リクエストが来たため中断した投機計算（コールバック内の except Exception で握りつぶされないよう BaseException）"""
+
+
+def checkpoint():
+    """計算の区切りで呼び出し、投機計算の中で実リクエストが来ていれば Cancelled を送出（それ以外では何もしない）"""
+    flag = _cancel_flag.get()
+    if flag is not None and flag.is_set():
+        raise Cancelled()
+
+
+def _toggled(class_name):
+    classes = (class_name or '').split()
+    if 'active' in classes:
+        return ' '.join(c for c in classes if c != 'active')
+    return ' '.join(classes + ['active'])
+
+
+def variants(params, args, months):
+    """
+    入力を1か所だけ変えた投機計算の候補
+
+    params : コールバックの引数名
+    months : 月の選択肢（表示順）
+    """
+    args = list(args)
+    candidates = []
+    if MONTH_PARAM in params and months:
+        index = params.index(MONTH_PARAM)
+        if args[index] in months:
+            position = months.index(args[index])
+            for neighbour in (position + 1, position - 1):
+                if 0 <= neighbour < len(months):
+                    candidates.append(args[:index] + [months[neighbour]] + args[index + 1:])
+    for param in TOGGLE_PARAMS:
+        if param in params:
+            index = params.index(param)
+            candidates.append(args[:index] + [_toggled(args[index])] + args[index + 1:])
+    return [tuple(candidate) for candidate in candidates]
+
+
+class Prefetcher:
+    """
+    投機計算の待ち行列
+
+    submit(key, compute) で登録し、実リクエストがない間にワーカースレッドで compute() を実行する
+    実行中に実リクエストが来たら中断フラグを立てる（compute() の中の checkpoint() で中断）
+    """
+
+    def __init__(self, workers=None, queue_size=None, ttl=None):
+        self.workers = workers or PERFORMANCE['prefetch_workers']
+        self.queue_size = queue_size or PERFORMANCE['prefetch_queue']
+        self.ttl = ttl or PERFORMANCE['prefetch_ttl']
+        self.active_requests = 0
+        self._tasks = OrderedDict()  # キー → (登録時刻, 計算関数)
+        self._running = set()  # 実行中の投機計算の中断フラグ
+        self._cond = threading.Condition()
+        self._threads = []
+        self._pid = os.getpid()
+
+    def request_started(self):
+        with self._cond:
+            self.active_requests += 1
+            for flag in self._running:
+                flag.set()
+
+    def request_finished(self):
+        with self._cond:
+            self.active_requests = max(0, self.active_requests - 1)
+            if not self.active_requests:
+                self._cond.notify_all()
+
+    def submit(self, key, compute):
+        """投機計算を登録（同じキーが待ち行列にあれば何もしない）"""
+        with self._cond:
+            if key in self._tasks:
+                return
+            self._tasks[key] = (time.monotonic(), compute)
+            while len(self._tasks) > self.queue_size:
+                self._tasks.popitem(last=False)
+                metrics.inc('sfa_prefetch_total', result='dropped')
+            self._ensure_workers()
+            self._cond.notify()
+
+    def _ensure_workers(self):
+        # fork 前のスレッドは子プロセスに引き継がれないためプロセスごとに起動する
+        if self._pid != os.getpid():
+            self._pid, self._threads = os.getpid(), []
+            self.active_requests = 0
+            self._running = set()
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name='sfa-prefetch', daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _next(self):
+        """実リクエストがなくなるまで待ち、期限内の次の計算とその中断フラグを取り出す"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                for key, (queued, _) in list(self._tasks.items()):
+                    if now - queued > self.ttl:
+                        del self._tasks[key]
+                        metrics.inc('sfa_prefetch_total', result='cancelled')
+                if self._tasks and not self.active_requests:
+                    flag = threading.Event()
+                    self._running.add(flag)
+                    return self._tasks.popitem(last=False)[1][1], flag
+                self._cond.wait(self.ttl)
+
+    def _work(self):
+        while True:
+            compute, flag = self._next()
+            token = _cancel_flag.set(flag)
+            try:
+                computed = compute()
+            except Cancelled:
+                metrics.inc('sfa_prefetch_total', result='abandoned')
+                continue
+            except Exception:
+                logger.exception("投機計算に失敗しました")
+                continue
+            finally:
+                _cancel_flag.reset(token)
+                with self._cond:
+                    self._running.discard(flag)
+            metrics.inc('sfa_prefetch_total', result='computed' if computed else 'cached')
+
+    def pending(self):
+        with self._cond:
+            return len(self._tasks)
+
+
+# プロセス内で共有する待ち行列
+prefetcher = Prefetcher()
+
+
+def speculate(callback, args):
+    """
+    コールバックの実行後に呼び出し、前後の月・反対の切り替え状態の出力を予約
+
+    callback : depends_on_sections で包んだ関数（params・prefill を持つ）
+    """
+    if not enabled or not flask.has_request_context():
+        return
+    # 循環インポートを避けるため実行時に参照
+    from data_manager import data_manager
+
+    catalog = data_manager.get_catalog() or {}
+    for variant in variants(callback.params, args, catalog.get('months') or []):
+        prefetcher.submit((callback.__module__, callback.__qualname__, repr(variant)),
+                          lambda variant=variant: callback.prefill(*variant))
+
+
+def init_app(app):
+    """Dashアプリに実リクエストの処理中を数えるフックを登録（無効時は何もしない）"""
+    if not enabled:
+        return
+
+    server = app.server
+    update_path = f"{app.config.requests_pathname_prefix}_dash-update-component"
+
+    @server.before_request
+    def _count_request():
+        if flask.request.path == update_path:
+            flask.g.prefetch_counted = True
+            prefetcher.request_started()
+
+    @server.teardown_request
+    def _uncount_request(exc):
+        if flask.g.pop('prefetch_counted', False):
+            prefetcher.request_finished()
@@ -0,0 +1,246 @@
+"""
+オンデマンドのプロファイリング
+登録済みコールバックとデータ取り込みを cProfile・tracemalloc で計測し、レポートをディスクへ保存する
+
+有効化:
+  - 環境変数 SFA_PROFILE=1 : すべてのコールバック・取り込みを計測
+  - 管理者用クエリパラメータ ?profile=<SFA_PROFILE_TOKEN> : そのブラウザからのリクエストのみ計測（?profile=0 で解除）
+保存したレポートは /_profiles で一覧できる
+"""
+import cProfile
+import functools
+import hmac
+import html
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+import flask
+
+from config import PERFORMANCE
+
+logger = logging.getLogger(__name__)
+
+# 計測対象の判定に使うクッキー
+PROFILE_COOKIE = 'sfa_profile'
+
+_capture_lock = threading.Lock()
+_local = threading.local()
+
+
+def _token():
+    return os.environ.get('SFA_PROFILE_TOKEN', '')
+
+
+def _matches_token(candidate, token):
+    # 非ASCIIの文字列は compare_digest が TypeError を送出するためバイト列で比べる
+    return hmac.compare_digest(candidate.encode('utf-8'), token.encode('utf-8'))
+
+
+def _is_admin_request():
+    """管理者トークン付きのブラウザからのリクエストか"""
+    token = _token()
+    if not token or not flask.has_request_context():
+        return False
+    candidate = flask.request.cookies.get(PROFILE_COOKIE) or flask.request.args.get('profile') or ''
+    return _matches_token(candidate, token)
+
+
+def should_profile():
+    """現在の処理を計測するか"""
+    return PERFORMANCE['profile_enabled'] or _is_admin_request()
+
+
+def _safe_name(name):
+    return re.sub(r'[^0-9A-Za-z_.-]+', '_', name)[:80]
+
+
+def _top_functions(profiler, limit):
+    """内部時間の長い関数（ホットスポット）"""
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, lineno, funcname), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': f"{os.path.basename(filename)}:{lineno}({funcname})",
+            'calls': calls,
+            'tottime': round(tottime, 6),
+            'cumtime': round(cumtime, 6),
+        })
+    rows.sort(key=lambda row: row['tottime'], reverse=True)
+    return rows[:limit]
+
+
+def _prune(directory, keep):
+    """古いレポートを削除（最新 keep 件を残す）"""
+    indexes = sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+    for name in indexes[:-keep] if keep else indexes:
+        stem = name[:-len('.json')]
+        for suffix in ('.json', '.pstats', '.txt'):
+            path = os.path.join(directory, stem + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _save_report(name, profiler, snapshot, duration, peak):
+    """pstats・メモリ割り当てレポート・索引用JSONを保存"""
+    directory = PERFORMANCE['profile_dir']
+    os.makedirs(directory, exist_ok=True)
+    stem = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{_safe_name(name)}"
+
+    profiler.dump_stats(os.path.join(directory, stem + '.pstats'))
+
+    report = io.StringIO()
+    report.write(f"{name}  処理時間 {duration * 1000:.1f} ms  ピークメモリ {peak / 1024:.1f} KiB\n\n")
+    report.write("== メモリ割り当て（行別・上位） ==\n")
+    allocations = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ]).statistics('lineno')
+    for stat in allocations[:30]:
+        report.write(f"{stat}\n")
+    report.write("\n== 関数別の処理時間（累積・上位） ==\n")
+    pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(30)
+    with open(os.path.join(directory, stem + '.txt'), 'w', encoding='utf-8') as f:
+        f.write(report.getvalue())
+
+    summary = {
+        'name': name,
+        'captured_at': datetime.now().isoformat(timespec='seconds'),
+        'duration_ms': round(duration * 1000, 1),
+        'peak_kib': round(peak / 1024, 1),
+        'hotspots': _top_functions(profiler, 5),
+    }
+    with open(os.path.join(directory, stem + '.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    _prune(directory, PERFORMANCE['profile_keep'])
+    return stem
+
+
+def profile_call(name, func, *args, **kwargs):
+    """計測対象なら cProfile・tracemalloc 付きで実行してレポートを保存"""
+    # 入れ子の計測（コールバック内の update_data など）と同時計測は行わない
+    if getattr(_local, 'active', False) or not should_profile():
+        return func(*args, **kwargs)
+    if not _capture_lock.acquire(blocking=False):
+        return func(*args, **kwargs)
+
+    _local.active = True
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - start
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            try:
+                stem = _save_report(name, profiler, snapshot, duration, peak)
+                logger.info(f"プロファイルを保存しました: {stem}")
+            except OSError as e:
+                logger.warning(f"プロファイルを保存できませんでした: {e}")
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        _local.active = False
+        _capture_lock.release()
+
+
+def profiled(name):
+    """関数を計測対象にするデコレータ（無効時はそのまま実行）"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return profile_call(name, func, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def load_index(limit=None):
+    """保存済みレポートの索引（新しい順）"""
+    directory = PERFORMANCE['profile_dir']
+    if not os.path.isdir(directory):
+        return []
+    entries = []
+    for name in sorted((n for n in os.listdir(directory) if n.endswith('.json')), reverse=True)[:limit]:
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            continue
+        entry['id'] = name[:-len('.json')]
+        entries.append(entry)
+    return entries
+
+
+def _render_index(entries):
+    """レポート一覧ページ"""
+    rows = []
+    for entry in entries:
+        hotspots = '<br>'.join(
+            f"{html.escape(h['function'])} — {h['tottime'] * 1000:.1f} ms（{h['calls']}回）"
+            for h in entry.get('hotspots', [])
+        )
+        rows.append(
+            f"<tr><td>{html.escape(entry['captured_at'])}</td><td>{html.escape(entry['name'])}</td>"
+            f"<td>{entry['duration_ms']} ms</td><td>{entry['peak_kib']} KiB</td><td>{hotspots}</td>"
+            f"<td><a href='/_profiles/{entry['id']}.txt'>レポート</a> / "
+            f"<a href='/_profiles/{entry['id']}.pstats'>pstats</a></td></tr>"
+        )
+    body = ''.join(rows) or "<tr><td colspan='6'>保存されたプロファイルはありません</td></tr>"
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>プロファイル一覧</title>"
+        "<style>body{font-family:sans-serif;font-size:13px}td,th{border-bottom:1px solid #ddd;"
+        "padding:4px 8px;vertical-align:top;text-align:left}</style></head><body>"
+        "<h3>プロファイル一覧（最新）</h3><table><tr><th>日時</th><th>対象</th><th>処理時間</th>"
+        f"<th>ピークメモリ</th><th>ホットスポット（内部時間）</th><th></th></tr>{body}</table></body></html>"
+    )
+
+
+def init_app(app):
+    """登録済みコールバックを計測対象にし、管理者用の切り替えと一覧ページを登録"""
+    for spec in app.callback_map.values():
+        callback = spec.get('callback')
+        if callback is not None and not getattr(callback, '_profiled', False):
+            wrapper = profiled(f"callback.{getattr(callback, '__name__', 'callback')}")(callback)
+            wrapper._profiled = True
+            spec['callback'] = wrapper
+
+    server = app.server
+
+    @server.after_request
+    def _toggle_profile_cookie(response):
+        value = flask.request.args.get('profile')
+        if value is None or not _token():
+            return response
+        if value == '0':
+            response.delete_cookie(PROFILE_COOKIE)
+        elif _matches_token(value, _token()):
+            response.set_cookie(PROFILE_COOKIE, value, httponly=True, samesite='Strict')
+        return response
+
+    @server.route('/_profiles')
+    @server.route('/_profiles/<path:filename>')
+    def _profiles(filename=None):
+        if not should_profile():
+            flask.abort(404)
+        if filename is None:
+            return _render_index(load_index(PERFORMANCE['profile_keep']))
+        if not re.fullmatch(r'[0-9A-Za-z_.-]+\.(txt|pstats)', filename):
+            flask.abort(404)
+        return flask.send_from_directory(os.path.abspath(PERFORMANCE['profile_dir']), filename,
+                                         mimetype='text/plain' if filename.endswith('.txt') else None)
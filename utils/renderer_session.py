@@ -0,0 +1,257 @@
+"""
+ダッシュレンダラーの再現
+/_dash-dependencies の定義に従い、ブラウザと同じ形式で /_dash-update-component へリクエストを送り、
+応答で変わったプロパティ・新しく表示されたコンポーネントを起点にコールバックを連鎖させる。
+データ公開後のウォームアップ（utils/warmup）と負荷試験（benchmarks/load_test）で使う
+"""
+import http.client
+import json
+import time
+
+from utils.output_fingerprint import LAYOUT_VERSION_ID, LAYOUT_VERSION_KEY, SESSION_KEY
+
+UPDATE_PATH = '/_dash-update-component'
+# background コールバックの結果を待つ時間の上限（秒）
+BACKGROUND_TIMEOUT = 60
+WILDCARDS = (['ALL'], ['MATCH'], ['ALLSMALLER'])
+
+# 表示切り替えの操作 → (切り替え後のボタン, 初期状態のボタン)
+TOGGLE_BUTTONS = {
+    'period': ('btn-single', 'btn-cumulative'),
+    'data_type': ('btn-plan-diff', 'btn-plan-ratio'),
+    'analysis': ('btn-revenue', 'btn-acquisition'),
+    'tab': ('tab-2-button', 'tab-1-button'),
+}
+MAX_CHAIN = 10  # 1回の操作で連鎖するコールバックの最大段数
+
+
+class FlaskClientTransport:
+    """Flask のテストクライアントでプロセス内のアプリへ送信"""
+
+    def __init__(self, server):
+        self.client = server.test_client()
+
+    def request(self, method, path, body=None):
+        response = self.client.open(path, method=method, json=body)
+        return response.status_code, response.get_data()
+
+    def close(self):
+        pass
+
+
+def stringify_id(component_id):
+    """Dash と同じ形式のID文字列（辞書IDはキー順のJSON）"""
+    if isinstance(component_id, dict):
+        return json.dumps(component_id, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return component_id
+
+
+def _split_prop(spec):
+    component_id, _, prop = spec.rpartition('.')
+    return component_id, prop
+
+
+def _parse_outputs(output):
+    """依存関係の output 文字列を (ID文字列, プロパティ) の一覧に分解"""
+    if output.startswith('..'):
+        return [_split_prop(part) for part in output[2:-2].split('...')]
+    return [_split_prop(output)]
+
+
+def output_label(output):
+    """集計用のコールバック名（先頭2つの出力）"""
+    outputs = _parse_outputs(output)
+    return '+'.join(f'{cid}.{prop}' for cid, prop in outputs[:2]) + ('+…' if len(outputs) > 2 else '')
+
+
+def _pattern(component_id):
+    """パターンマッチIDなら辞書、通常IDなら None"""
+    if component_id.startswith('{'):
+        return json.loads(component_id)
+    return None
+
+
+def _matches(pattern, component_id):
+    return isinstance(component_id, dict) and component_id.keys() == pattern.keys() and all(
+        value in WILDCARDS or component_id[key] == value for key, value in pattern.items())
+
+
+def walk(tree):
+    """レイアウトツリー内のIDを持つコンポーネント (ID, props) を列挙"""
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict) and 'props' in node:
+            props = node['props'] or {}
+            if 'id' in props:
+                yield props['id'], props
+            stack.append(props.get('children'))
+
+
+class Dependency:
+    """コールバックの入出力定義"""
+
+    def __init__(self, spec):
+        self.output = spec['output']
+        self.outputs = _parse_outputs(spec['output'])
+        self.inputs = [(item['id'], item['property']) for item in spec['inputs']]
+        self.state = [(item['id'], item['property']) for item in spec['state']]
+        self.prevent_initial_call = spec.get('prevent_initial_call', False)
+        self.background = spec.get('long')  # background コールバックは {'interval': ミリ秒}
+        self.label = output_label(spec['output'])
+        self.patterns = {cid: _pattern(cid) for cid, _ in self.inputs + self.state if _pattern(cid)}
+
+
+def load_dependencies(transport):
+    """/_dash-dependencies からコールバックの入出力定義を取得"""
+    status, content = transport.request('GET', '/_dash-dependencies')
+    if status != 200:
+        raise RuntimeError(f'/_dash-dependencies の取得に失敗しました（{status}）')
+    return [Dependency(spec) for spec in json.loads(content)]
+
+
+class RendererSession:
+    """
+    1ブラウザ分の状態を保持し、ダッシュレンダラーと同様にコールバックを連鎖させる
+
+    records : (ラベル, 秒, ステータス, 応答バイト数) を追記するリスト（省略時は記録しない）
+    """
+
+    def __init__(self, transport, dependencies, session_id, records=None):
+        self.transport = transport
+        self.dependencies = dependencies
+        self.session_id = session_id
+        self.records = records if records is not None else []
+        self.props = {}       # (ID文字列, プロパティ) → 値
+        self.components = {}  # ID文字列 → 元のID
+
+    # --- 通信 -----------------------------------------------------------------
+
+    def _timed(self, label, method, path, body=None):
+        start = time.perf_counter()
+        try:
+            status, content = self.transport.request(method, path, body)
+        except (http.client.HTTPException, OSError):
+            status, content = 0, b''
+        self.records.append((label, time.perf_counter() - start, status, len(content)))
+        return status, content
+
+    def load_page(self):
+        """レイアウトを取得して初回のコールバックを実行"""
+        status, content = self._timed('GET _dash-layout', 'GET', '/_dash-layout')
+        if status != 200:
+            return
+        new_ids = self._mount(json.loads(content))
+        self._run(set(), new_ids)
+
+    def _mount(self, tree):
+        new_ids = set()
+        for component_id, props in walk(tree):
+            key = stringify_id(component_id)
+            self.components[key] = component_id
+            new_ids.add(key)
+            for prop, value in props.items():
+                if prop != 'children':
+                    self.props[(key, prop)] = value
+        return new_ids
+
+    # --- コールバックの実行 ------------------------------------------------------
+
+    def _resolve(self, component_id, prop):
+        """入力の値（パターンマッチは一致するコンポーネントの一覧）"""
+        pattern = _pattern(component_id)
+        if pattern is None:
+            return {'id': component_id, 'property': prop, 'value': self.props.get((component_id, prop))}
+        return [{'id': self.components[key], 'property': prop, 'value': self.props.get((key, prop))}
+                for key in sorted(self.components) if _matches(pattern, self.components[key])]
+
+    def _mounted(self, dependency):
+        ids = [cid for cid, _ in dependency.outputs + dependency.inputs if not _pattern(cid)]
+        return all(cid in self.components for cid in ids)
+
+    def _triggered_by(self, dependency, changed):
+        for component_id, prop in dependency.inputs:
+            pattern = dependency.patterns.get(component_id)
+            for key, changed_prop in changed:
+                if changed_prop != prop:
+                    continue
+                if key == component_id or (pattern and _matches(pattern, self.components.get(key))):
+                    yield f'{key}.{prop}'
+
+    def _call(self, dependency, changed_ids):
+        outputs = [{'id': cid, 'property': prop} for cid, prop in dependency.outputs]
+        payload = {
+            'output': dependency.output,
+            'outputs': outputs if dependency.output.startswith('..') else outputs[0],
+            'inputs': [self._resolve(cid, prop) for cid, prop in dependency.inputs],
+            'changedPropIds': changed_ids,
+            'state': [self._resolve(cid, prop) for cid, prop in dependency.state],
+            SESSION_KEY: self.session_id,
+            LAYOUT_VERSION_KEY: self.props.get((LAYOUT_VERSION_ID, 'data-version')),
+        }
+        status, content = self._timed(dependency.label, 'POST', UPDATE_PATH, payload)
+        if status == 200 and content and dependency.background:
+            status, content = self._poll(dependency, payload, json.loads(content))
+        if status != 200 or not content:
+            return set(), set()
+
+        changed, new_ids = set(), set()
+        for key, props in json.loads(content).get('response', {}).items():
+            for prop, value in props.items():
+                if prop == 'children':
+                    new_ids |= self._mount(value)
+                if self.props.get((key, prop)) != value:
+                    self.props[(key, prop)] = value
+                    changed.add((key, prop))
+        return changed, new_ids
+
+    def _poll(self, dependency, payload, job):
+        """background コールバックの結果が出るまでブラウザと同じ間隔で確認する"""
+        path = f"{UPDATE_PATH}?cacheKey={job['cacheKey']}&job={job['job']}"
+        deadline = time.monotonic() + BACKGROUND_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(dependency.background.get('interval', 1000) / 1000)
+            status, content = self._timed(f'{dependency.label} (poll)', 'POST', path, payload)
+            if status != 200 or not content or 'response' in json.loads(content):
+                return status, content
+        return 0, b''
+
+    def _run(self, changed, new_ids):
+        """変更されたプロパティ・新しく表示されたコンポーネントを起点にコールバックを連鎖実行"""
+        for _ in range(MAX_CHAIN):
+            calls = []
+            for dependency in self.dependencies:
+                if not self._mounted(dependency):
+                    continue
+                triggered = list(self._triggered_by(dependency, changed))
+                initial = not dependency.prevent_initial_call and any(
+                    cid in new_ids for cid, _ in dependency.outputs + dependency.inputs)
+                if triggered or initial:
+                    calls.append((dependency, triggered))
+            if not calls:
+                return
+            changed, new_ids = set(), set()
+            for dependency, triggered in calls:
+                more_changed, more_ids = self._call(dependency, triggered)
+                changed |= more_changed
+                new_ids |= more_ids
+
+    # --- ユーザー操作 -----------------------------------------------------------
+
+    def click(self, key):
+        """ボタン・カードをクリック"""
+        self.props[(key, 'n_clicks')] = (self.props.get((key, 'n_clicks')) or 0) + 1
+        self._run({(key, 'n_clicks')}, set())
+
+    def select(self, key, prop, value):
+        """ドロップダウンなどの値を変更"""
+        self.props[(key, prop)] = value
+        self._run({(key, prop)}, set())
+
+    def cards(self):
+        """パターンマッチIDの入力を持つ表示中のコンポーネント（カード）のID文字列"""
+        patterns = [p for dependency in self.dependencies for p in dependency.patterns.values()]
+        return [key for key, component_id in self.components.items()
+                if any(_matches(pattern, component_id) for pattern in patterns)]
@@ -0,0 +1,108 @@
+"""
+セクション単位のバージョンによるコールバック出力キャッシュ
+コールバックが依存するセクションを宣言し、そのセクションと入力が変わらなければ再計算しない
+"""
+import functools
+import inspect
+import json
+import logging
+
+from config import PERFORMANCE
+from utils import disk_cache, metrics, prefetch, single_flight
+from utils.cache_utils import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# コールバック出力のキャッシュ（キーにセクションバージョンを含むため明示的な無効化は不要）
+section_output_cache = LRUCache(maxsize=PERFORMANCE['section_output_cache_size'], name='section_output')
+
+# 関数名 → 依存セクション（計測・プリフェッチなどから参照）
+SECTION_DEPENDENCIES = {}
+
+# 関数名 → キャッシュ付きの関数（初期表示の埋め込みなどから参照）
+SECTION_CALLBACKS = {}
+
+
+def _input_key(args):
+    """コールバック引数をハッシュ可能なキーにする"""
+    try:
+        return json.dumps(args, sort_keys=True, ensure_ascii=False, default=str)
+    except (TypeError, ValueError):
+        return None
+
+
+def _data_manager():
+    # 循環インポートを避けるため実行時に参照
+    from data_manager import data_manager
+
+    return data_manager
+
+
+def depends_on_sections(*sections):
+    """
+    コールバックが参照するセクションを宣言するデコレータ
+
+    @app.callback(...) の内側に付ける。宣言したセクションのバージョンと
+    コールバック引数が前回と同じ場合は、計算済みの出力をそのまま返す
+    """
+    def decorator(func):
+        SECTION_DEPENDENCIES[func.__name__] = sections
+
+        def cache_key(snapshot, args):
+            input_key = _input_key(args)
+            if input_key is None:
+                return None
+            return (func.__module__, func.__qualname__, _data_manager().get_section_versions(sections, snapshot),
+                    input_key)
+
+        def compute(key, snapshot, args):
+            # キーと同じスナップショットのデータで計算する（計算中に公開されても別のデータの出力を格納しない）
+            def run():
+                prefetch.checkpoint()  # 待ち合わせ中に実リクエストが来た投機計算は開始しない
+                with _data_manager().pinned(snapshot):
+                    return func(*args)
+
+            # 同じ入力の同時リクエスト（他のワーカーを含む）は1回だけ計算し、結果はディスクでも共有する
+            return single_flight.do(key, lambda: disk_cache.cached(key, run, func.__name__), func.__name__)
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            snapshot = _data_manager().snapshot
+            key = cache_key(snapshot, args)
+            if key is None:
+                return func(*args)
+
+            result = section_output_cache.get(key)
+            metrics.inc('sfa_callback_cache_total', callback=func.__name__, result='hit' if result is not None else 'miss')
+            if result is not None:
+                logger.debug(f"{func.__name__}: セクション {', '.join(sections)} に変更がないためキャッシュを使用")
+            else:
+                result = compute(key, snapshot, args)
+                if result is not None:
+                    section_output_cache.put(key, result)
+            prefetch.speculate(wrapper, args)
+            return result
+
+        def prefill(*args):
+            """未計算の入力なら計算してキャッシュへ格納（投機計算用、計算した場合は True）"""
+            snapshot = _data_manager().snapshot
+            key = cache_key(snapshot, args)
+            if key is None or key in section_output_cache:
+                return False
+            result = compute(key, snapshot, args)
+            if result is not None:
+                section_output_cache.put(key, result)
+            return True
+
+        def is_cached(*args):
+            """計算済みの入力か（ヒット率・LRU順序には影響しない）"""
+            key = cache_key(_data_manager().snapshot, args)
+            return key is not None and key in section_output_cache
+
+        wrapper.sections = sections
+        wrapper.params = list(inspect.signature(func).parameters)
+        wrapper.prefill = prefill
+        wrapper.is_cached = is_cached
+        SECTION_CALLBACKS[func.__name__] = wrapper
+        return wrapper
+    return decorator
@@ -0,0 +1,124 @@
+"""
+コールバックリクエストの記録（セッションの再生用）
+有効時（環境変数 SFA_RECORD=1）は /_dash-update-component へのリクエストをセッションごとの経過時間・
+処理時間・応答のフィンガープリントとともに JSON Lines で保存する。
+セッションIDはハッシュ化し、アップロードされたファイルの内容・ファイル名は保存しない
+"""
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from datetime import datetime
+
+import flask
+
+from config import PERFORMANCE
+from utils.output_fingerprint import SESSION_KEY
+
+logger = logging.getLogger(__name__)
+
+# 記録の有効/無効（環境変数 SFA_RECORD=1 で有効）
+enabled = PERFORMANCE['record_enabled']
+
+# 保存しないプロパティ（アップロードされたファイル）と保存する値の最大長
+REDACTED_PROPS = ('contents', 'filename', 'last_modified')
+MAX_VALUE_LENGTH = 2000
+
+# セッションIDのハッシュ化に使う鍵（--preload 時は全ワーカーで共通）
+_salt = os.environ.get('SFA_RECORD_SALT', '').encode('utf-8') or secrets.token_bytes(16)
+_lock = threading.Lock()
+_session_starts = {}
+
+
+def anonymize_session(session_id):
+    """セッションIDを復元できない短いIDに変換"""
+    return hmac.new(_salt, str(session_id).encode('utf-8'), hashlib.sha1).hexdigest()[:16]
+
+
+def _sanitize_item(item):
+    if isinstance(item, list):
+        return [_sanitize_item(entry) for entry in item]
+    if not isinstance(item, dict):
+        return item
+    value = item.get('value')
+    if item.get('property') in REDACTED_PROPS or (
+            isinstance(value, str) and len(value) > MAX_VALUE_LENGTH):
+        return {**item, 'value': None, 'redacted': True}
+    return item
+
+
+def sanitize_payload(payload):
+    """リクエストからセッションID・アップロード内容を除いたもの"""
+    sanitized = {key: value for key, value in payload.items() if key != SESSION_KEY}
+    for key in ('inputs', 'state'):
+        if key in sanitized:
+            sanitized[key] = [_sanitize_item(item) for item in sanitized[key]]
+    return sanitized
+
+
+def response_fingerprint(response):
+    """応答本文のフィンガープリント（204 など本文がない場合は None）"""
+    body = response.get_data() if not response.direct_passthrough else b''
+    return hashlib.sha1(body).hexdigest() if body else None
+
+
+def _session_offset(session, now):
+    """セッション最初のリクエストからの経過秒"""
+    with _lock:
+        start = _session_starts.setdefault(session, now)
+        # 保持するセッション数を制限
+        if len(_session_starts) > PERFORMANCE['fingerprint_sessions']:
+            _session_starts.pop(next(iter(_session_starts)))
+    return now - start
+
+
+def _write(entry):
+    directory = PERFORMANCE['record_dir']
+    path = os.path.join(directory, f"{datetime.now().strftime('%Y%m%d')}-{os.getpid()}.jsonl")
+    line = json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n'
+    with _lock:
+        os.makedirs(directory, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+def init_app(app):
+    """Dashアプリにリクエスト記録用のフックを登録（無効時は何もしない）"""
+    if not enabled:
+        return
+
+    server = app.server
+    update_path = f"{app.config.requests_pathname_prefix}_dash-update-component"
+
+    @server.before_request
+    def _start_recording():
+        if flask.request.path == update_path:
+            flask.g.record_start = time.time()
+
+    @server.after_request
+    def _record_request(response):
+        start = flask.g.pop('record_start', None)
+        if start is None:
+            return response
+        payload = flask.request.get_json(silent=True) or {}
+        session = payload.get(SESSION_KEY)
+        if not session:
+            return response
+        session = anonymize_session(session)
+        try:
+            _write({
+                'session': session,
+                't': round(_session_offset(session, start), 4),
+                'output': payload.get('output'),
+                'payload': sanitize_payload(payload),
+                'status': response.status_code,
+                'duration_ms': round((time.time() - start) * 1000, 2),
+                'fingerprint': response_fingerprint(response),
+            })
+        except OSError as e:
+            logger.warning(f"リクエストを記録できませんでした: {e}")
+        return response
@@ -0,0 +1,195 @@
+"""
+同じ計算の同時実行を1回にまとめる（シングルフライト）
+同じデータバージョン・同じ入力のコールバック出力が同時に要求された場合、最初のリクエストだけが計算し、
+後続のリクエストはその結果を待って共有する
+
+- プロセス内: キーごとのイベントで待ち合わせる
+- ワーカー間: ユーザー専用の一時ディレクトリ（utils/state_dir）のロックファイル（flock）をリースとして使い、待っているワーカーがいれば
+  計算した側が結果を JSON で書き出す（計算中のワーカーが落ちた場合はOSがロックを解放する）
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from plotly.io.json import to_json_plotly
+
+from config import PERFORMANCE
+from utils import metrics
+from utils.state_dir import private_dir
+
+try:
+    import fcntl
+except ImportError:  # Windows（exe は単一プロセスのためプロセス内のみ）
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# シングルフライトの有効/無効（環境変数 SFA_SINGLE_FLIGHT=0 で無効）
+enabled = PERFORMANCE['single_flight_enabled']
+
+_POLL_SECONDS = 0.02
+# ロックファイルを削除するまでの時間（秒、計算中のリースを消さないよう十分長くする）
+_LEASE_FILE_TTL = 3600
+
+
+def encode(value):
+    """コールバック出力を Dash の応答と同じ JSON に変換"""
+    return to_json_plotly(value)
+
+
+def decode(text):
+    """encode() の結果を出力として返せる値に戻す（コンポーネント・図は辞書のまま）"""
+    return json.loads(text)
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'failed')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.failed = False
+
+
+class SingleFlight:
+    """
+    キーごとの計算の待ち合わせ
+
+    lease_dir : ワーカー間のリース用ディレクトリ（None ならプロセス内のみ）
+    """
+
+    def __init__(self, lease_dir=None, timeout=None, result_ttl=None):
+        self.lease_dir = lease_dir if fcntl is not None else None
+        self.timeout = timeout or PERFORMANCE['single_flight_timeout']
+        self.result_ttl = result_ttl or PERFORMANCE['single_flight_result_ttl']
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    def do(self, key, compute, name='callback'):
+        """key の計算を1回にまとめて実行し、結果を返す"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if call.done.wait(self.timeout) and not call.failed:
+                metrics.inc('sfa_single_flight_total', callback=name, result='shared')
+                return call.result
+            # 計算した側が失敗・タイムアウトした場合は自分で計算する
+            metrics.inc('sfa_single_flight_total', callback=name, result='fallback')
+            return compute()
+
+        try:
+            call.result = self._lead(key, compute, name)
+            return call.result
+        except BaseException:
+            call.failed = True
+            raise
+        finally:
+            call.done.set()
+            with self._lock:
+                del self._calls[key]
+
+    # --- ワーカー間 -------------------------------------------------------------
+
+    def _paths(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        base = os.path.join(self.lease_dir, digest)
+        return base + '.lock', base + '.wait', base + '.json'
+
+    def _lead(self, key, compute, name):
+        if self.lease_dir is None:
+            return compute()
+        try:
+            os.makedirs(self.lease_dir, mode=0o700, exist_ok=True)
+            lock_path, wait_path, result_path = self._paths(key)
+            fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o600)
+            os.utime(lock_path)
+        except OSError:
+            return compute()
+
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # 他のワーカーが計算中: 待っていることを知らせてリースの解放を待つ
+                started = time.time()
+                with open(wait_path, 'w'):
+                    pass
+                if self._wait_lease(fd):
+                    shared = self._read_result(result_path, started)
+                    if shared is not None:
+                        metrics.inc('sfa_single_flight_total', callback=name, result='shared_worker')
+                        return shared
+                else:
+                    metrics.inc('sfa_single_flight_total', callback=name, result='fallback')
+                    return compute()
+
+            result = compute()
+            if os.path.exists(wait_path):
+                self._write_result(result_path, result)
+                os.remove(wait_path)
+            return result
+        finally:
+            os.close(fd)  # ロックも解放される
+
+    def _wait_lease(self, fd):
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                time.sleep(_POLL_SECONDS)
+        return False
+
+    def _read_result(self, path, since):
+        try:
+            if os.path.getmtime(path) < since:
+                return None
+            with open(path, encoding='utf-8') as f:
+                return decode(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _write_result(self, path, result):
+        try:
+            text = encode(result)
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(temp_path, path)
+        except (OSError, TypeError, ValueError):
+            logger.warning("シングルフライトの結果を書き出せませんでした", exc_info=True)
+        self._cleanup()
+
+    def _cleanup(self):
+        """期限を過ぎた結果・ロックファイルを削除（最大でも result_ttl ごとに1回）"""
+        now = time.time()
+        if now - self._last_cleanup < self.result_ttl:
+            return
+        self._last_cleanup = now
+        try:
+            for entry in os.scandir(self.lease_dir):
+                ttl = self.result_ttl if entry.name.endswith('.json') else _LEASE_FILE_TTL
+                if now - entry.stat().st_mtime > ttl:
+                    os.remove(entry.path)
+        except OSError:
+            pass
+
+
+# プロセス内で共有する待ち合わせ（ワーカー間のリースは既定でユーザー専用の一時ディレクトリ）
+flights = SingleFlight(PERFORMANCE['single_flight_dir'] or private_dir('single-flight'))
+
+
+def do(key, compute, name='callback'):
+    """有効時は同じ key の同時計算を1回にまとめる"""
+    if not enabled:
+        return compute()
+    return flights.do(key, compute, name)
@@ -0,0 +1,46 @@
+"""
+ワーカー間で共有する状態ファイル（リース・SQLite など）の置き場所
+一時ディレクトリは他のユーザーと共有されるため、ユーザーごとのディレクトリ（sfa-<uid>、所有者のみ読み書き可）を作り、
+他のユーザーが先に作ったディレクトリ・権限の緩いディレクトリは使わない
+"""
+import getpass
+import logging
+import os
+import stat
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+def _is_private(path):
+    """このユーザーが所有し、他のユーザーが読み書きできないディレクトリか（シンボリックリンクは不可）"""
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        return False
+    if not hasattr(os, 'getuid'):  # Windows（一時ディレクトリ自体がユーザーごと）
+        return True
+    return info.st_uid == os.getuid() and not info.st_mode & 0o077
+
+
+def private_dir(name):
+    """
+    一時ディレクトリ下のこのユーザー専用のディレクトリ sfa-<uid>/name を返す
+
+    安全に使えない場合はプロセス専用の新しいディレクトリを返す（ワーカー間では共有されない）
+    """
+    owner = os.getuid() if hasattr(os, 'getuid') else getpass.getuser()
+    root = os.path.join(tempfile.gettempdir(), f'sfa-{owner}')
+    path = os.path.join(root, name)
+    try:
+        for directory in (root, path):
+            try:
+                os.mkdir(directory, 0o700)
+            except FileExistsError:
+                pass
+            if not _is_private(directory):
+                raise PermissionError(f'{directory} は他のユーザーが作成したか、権限が緩いため使用できません')
+        return path
+    except OSError as e:
+        fallback = tempfile.mkdtemp(prefix=f'sfa-{name}-')
+        logger.warning(f"{e}。代わりに {fallback} を使用します")
+        return fallback
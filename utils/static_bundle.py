@@ -0,0 +1,353 @@
+"""
+オフライン用の静的アセットバンドル
+CDN から読み込んでいる Bootstrap・Inter・Font Awesome をリポジトリ内の vendor/ から配信し、
+assets/ の CSS・JS とあわせて内容ハッシュ付きのファイル名・長期キャッシュ・gzip/brotli 圧縮済みで返す。
+Font Awesome はレイアウト・カードで使われているアイコンのみの CSS を生成する
+（fontTools がインストールされていればフォントもそのアイコンだけに絞る）
+
+有効化: 環境変数 SFA_OFFLINE_ASSETS=1（exe では常に有効）
+
+使い方:
+  python -m utils.static_bundle build --output static_bundle   # 配信されるファイルを書き出す（リバースプロキシ用）
+  python -m utils.static_bundle fetch-inter                    # Inter を Google Fonts から vendor/inter/ へ取得（要ネットワーク）
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import logging
+import mimetypes
+import os
+import re
+import sys
+import urllib.request
+from collections import namedtuple
+
+import flask
+
+from config import PERFORMANCE
+
+try:
+    import brotli
+except ImportError:  # brotli は任意（なければ gzip のみ）
+    brotli = None
+
+try:
+    from fontTools import subset as font_subset
+except ImportError:  # fontTools は任意（なければフォントは絞り込まない）
+    font_subset = None
+
+logger = logging.getLogger(__name__)
+
+# バンドルの有効/無効（環境変数 SFA_OFFLINE_ASSETS=1 で有効）
+enabled = PERFORMANCE['offline_assets']
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VENDOR_DIR = os.path.join(ROOT, 'vendor')
+ASSETS_DIR = os.path.join(ROOT, 'assets')
+
+# バンドル経由で配信する assets/ のファイル（Dash の自動読み込みからは除外する）
+BUNDLED_ASSETS = {'stylesheets': ('style.css', 'tab1-specific.css'), 'scripts': ('edge-polyfill.js',)}
+
+# 使用アイコンを探すソース
+ICON_SOURCES = ('components', 'layouts', 'callbacks', 'main.py', 'main_exe.py')
+
+URL_PREFIX = '/_bundle/'
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+COMPRESSIBLE_TYPES = ('text/css', 'text/javascript', 'application/javascript', 'image/svg+xml')
+# 圧縮しても小さくならない程度のファイルは圧縮しない
+MIN_COMPRESS_BYTES = 512
+
+INTER_CSS_URL = 'https://fonts.googleapis.com/css2?family=Inter:wght@300..700&display=swap'
+# 未取得時の Inter（端末にインストールされていれば使い、なければ既存の代替フォントになる）
+INTER_FALLBACK_CSS = "@font-face{font-family:'Inter';font-style:normal;font-weight:300 700;src:local('Inter')}\n"
+
+FONT_AWESOME_BASE_CSS = (
+    '.fa,.fas,.fa-solid{-moz-osx-font-smoothing:grayscale;-webkit-font-smoothing:antialiased;'
+    'display:inline-block;font-style:normal;font-variant:normal;line-height:1;text-rendering:auto;'
+    'font-family:"Font Awesome 6 Free";font-weight:900}\n'
+)
+
+Asset = namedtuple('Asset', ['content_type', 'etag', 'variants'])
+
+
+class Bundle:
+    """内容ハッシュ付きのファイル名 → 配信内容（エンコーディング → バイト列）"""
+
+    def __init__(self):
+        self.files = {}
+        self.urls = {}
+        self.stylesheets = []
+        self.scripts = []
+
+    def add(self, name, content):
+        """ファイルを追加し、ハッシュ付きのファイル名を返す"""
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        stem, ext = os.path.splitext(os.path.basename(name))
+        hashed = f'{stem}.{digest}{ext}'
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if ext == '.woff2':
+            content_type = 'font/woff2'
+        self.files[hashed] = Asset(content_type, digest, _compress(content, content_type))
+        return hashed
+
+    def url(self, hashed):
+        return URL_PREFIX + hashed
+
+    def write(self, directory):
+        """配信されるファイル（.gz・.br を含む）と manifest.json を書き出す"""
+        os.makedirs(directory, exist_ok=True)
+        suffixes = {'identity': '', 'gzip': '.gz', 'br': '.br'}
+        for hashed, asset in self.files.items():
+            for encoding, content in asset.variants.items():
+                with open(os.path.join(directory, hashed + suffixes[encoding]), 'wb') as f:
+                    f.write(content)
+        with open(os.path.join(directory, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump({'files': self.urls, 'stylesheets': self.stylesheets, 'scripts': self.scripts}, f, indent=2)
+
+
+def _compress(content, content_type):
+    variants = {'identity': content}
+    if content_type not in COMPRESSIBLE_TYPES or len(content) < MIN_COMPRESS_BYTES:
+        return variants
+    compressed = gzip.compress(content, 9, mtime=0)
+    if len(compressed) < len(content):
+        variants['gzip'] = compressed
+    if brotli is not None:
+        compressed = brotli.compress(content, quality=11)
+        if len(compressed) < len(content):
+            variants['br'] = compressed
+    return variants
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _strip_source_map(css):
+    return re.sub(r'/\*# sourceMappingURL=[^*]*\*/', '', css)
+
+
+def _rewrite_urls(css, base_dir, bundle):
+    """CSS 内の相対 url() を同じバンドル内のハッシュ付きファイルに置き換える"""
+    def replace(match):
+        target = match.group(2)
+        if re.match(r'^(data:|https?:|/)', target):
+            return match.group(0)
+        path = os.path.normpath(os.path.join(base_dir, target.split('?')[0].split('#')[0]))
+        if not os.path.exists(path):
+            return match.group(0)
+        return f'url({bundle.url(bundle.add(path, _read(path)))})'
+    return re.sub(r'url\((["\']?)([^)"\']+)\1\)', replace, css)
+
+
+def used_icons(sources=ICON_SOURCES, root=ROOT):
+    """ソース中の className で使われている Font Awesome のアイコン名"""
+    icons = set()
+    pattern = re.compile(r'["\']fa[srb]? ((?:fa-[a-z0-9-]+ ?)+)')
+    for source in sources:
+        path = os.path.join(root, source)
+        paths = [path] if os.path.isfile(path) else [
+            os.path.join(current, name)
+            for current, _, names in os.walk(path) for name in names if name.endswith('.py')]
+        for file_path in paths:
+            with open(file_path, encoding='utf-8') as f:
+                for match in pattern.finditer(f.read()):
+                    icons.update(name[len('fa-'):] for name in match.group(1).split())
+    return icons
+
+
+def icon_codepoints(css):
+    """Font Awesome の CSS からアイコン名 → コードポイント（\\f201 など）を取得"""
+    codepoints = {}
+    for selectors, content in re.findall(r'((?:\.fa-[a-z0-9-]+:before,?)+)\{content:"(\\[0-9a-f]+)"\}', css):
+        for name in re.findall(r'\.fa-([a-z0-9-]+):before', selectors):
+            codepoints[name] = content
+    return codepoints
+
+
+def _subset_font(content, codepoints):
+    """フォントを指定のコードポイントのみに絞る（fontTools がない場合はそのまま）"""
+    if font_subset is None or brotli is None:
+        return content
+    options = font_subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = []
+    font = font_subset.load_font(io.BytesIO(content), options)
+    subsetter = font_subset.Subsetter(options)
+    subsetter.populate(unicodes=[int(codepoint.lstrip('\\'), 16) for codepoint in codepoints])
+    subsetter.subset(font)
+    output = io.BytesIO()
+    font_subset.save_font(font, output, options)
+    return output.getvalue()
+
+
+def _font_awesome_css(bundle, vendor_dir):
+    directory = os.path.join(vendor_dir, 'fontawesome')
+    codepoints = icon_codepoints(_read(os.path.join(directory, 'fontawesome.min.css')).decode('utf-8'))
+    # ソースを同梱していない場合はすべてのアイコンを含める
+    icons = sorted(used_icons()) or sorted(codepoints)
+    missing = [icon for icon in icons if icon not in codepoints]
+    if missing:
+        logger.warning(f"Font Awesome に見つからないアイコン: {', '.join(missing)}")
+    used = {icon: codepoints[icon] for icon in icons if icon in codepoints}
+
+    font = _subset_font(_read(os.path.join(directory, 'fa-solid-900.woff2')), set(used.values()))
+    font_url = bundle.url(bundle.add('fa-solid-900.woff2', font))
+    rules = ''.join(f'.fa-{icon}:before{{content:"{content}"}}' for icon, content in used.items())
+    return (
+        '@font-face{font-family:"Font Awesome 6 Free";font-style:normal;font-weight:900;font-display:block;'
+        f'src:url({font_url}) format("woff2")}}\n{FONT_AWESOME_BASE_CSS}{rules}\n'
+    )
+
+
+def _inter_css(bundle, vendor_dir):
+    path = os.path.join(vendor_dir, 'inter', 'inter.css')
+    if not os.path.exists(path):
+        return INTER_FALLBACK_CSS
+    return _rewrite_urls(_read(path).decode('utf-8'), os.path.dirname(path), bundle)
+
+
+def build_bundle(vendor_dir=VENDOR_DIR, assets_dir=ASSETS_DIR):
+    """vendor/ と assets/ からバンドルを作成（読み込み順: Bootstrap → フォント → アイコン → assets/ の CSS）"""
+    bundle = Bundle()
+    bootstrap = os.path.join(vendor_dir, 'bootstrap', 'bootstrap.min.css')
+    stylesheets = [
+        ('bootstrap.min.css', _strip_source_map(_read(bootstrap).decode('utf-8'))),
+        ('inter.css', _inter_css(bundle, vendor_dir)),
+        ('icons.css', _font_awesome_css(bundle, vendor_dir)),
+    ]
+    for name in BUNDLED_ASSETS['stylesheets']:
+        path = os.path.join(assets_dir, name)
+        stylesheets.append((name, _rewrite_urls(_read(path).decode('utf-8'), assets_dir, bundle)))
+    for name, css in stylesheets:
+        bundle.urls[name] = bundle.url(bundle.add(name, css.encode('utf-8')))
+        bundle.stylesheets.append(bundle.urls[name])
+    for name in BUNDLED_ASSETS['scripts']:
+        bundle.urls[name] = bundle.url(bundle.add(name, _read(os.path.join(assets_dir, name))))
+        bundle.scripts.append(bundle.urls[name])
+    return bundle
+
+
+_bundle = None
+
+
+def get_bundle():
+    """有効時はプロセス内で共有するバンドル（初回に作成）、無効時は None"""
+    global _bundle
+    if not enabled:
+        return None
+    if _bundle is None:
+        _bundle = build_bundle()
+        logger.info(f"オフライン用アセットを作成しました（{len(_bundle.files)} ファイル）")
+    return _bundle
+
+
+def stylesheets(default):
+    """Dash の external_stylesheets（無効時は default のまま）"""
+    bundle = get_bundle()
+    return list(bundle.stylesheets) if bundle else default
+
+
+def scripts(default=None):
+    """Dash の external_scripts"""
+    bundle = get_bundle()
+    return list(bundle.scripts) if bundle else list(default or [])
+
+
+def asset_url(name, default):
+    """バンドルに含めたファイルのURL（無効時は default）"""
+    bundle = get_bundle()
+    return bundle.urls.get(name, default) if bundle else default
+
+
+def assets_ignore(default=''):
+    """Dash の assets_ignore（バンドルに含めた assets/ のファイルを自動読み込みから除外）"""
+    if get_bundle() is None:
+        return default
+    names = BUNDLED_ASSETS['stylesheets'] + BUNDLED_ASSETS['scripts']
+    pattern = '^(' + '|'.join(re.escape(name) for name in names) + ')$'
+    return f'{default}|{pattern}' if default else pattern
+
+
+def _asset_response(asset):
+    accepted = flask.request.accept_encodings
+    for encoding in ('br', 'gzip'):
+        if encoding in asset.variants and accepted[encoding]:
+            response = flask.Response(asset.variants[encoding], content_type=asset.content_type)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = flask.Response(asset.variants['identity'], content_type=asset.content_type)
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.set_etag(asset.etag)
+    return response
+
+
+def init_app(app):
+    """バンドルの配信ルートを登録（無効時は何もしない）"""
+    bundle = get_bundle()
+    if bundle is None:
+        return
+
+    @app.server.route(URL_PREFIX + '<filename>')
+    def _bundle_file(filename):
+        asset = bundle.files.get(filename)
+        if asset is None:
+            flask.abort(404)
+        if asset.etag in flask.request.if_none_match:
+            response = flask.Response(status=304)
+            response.headers['Cache-Control'] = CACHE_CONTROL
+            response.set_etag(asset.etag)
+            return response
+        return _asset_response(asset)
+
+
+def fetch_inter(vendor_dir=VENDOR_DIR):
+    """Inter の woff2 と @font-face を Google Fonts から取得して vendor/inter/ に保存"""
+    directory = os.path.join(vendor_dir, 'inter')
+    os.makedirs(directory, exist_ok=True)
+    # woff2 を返すブラウザとして取得する
+    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0 Safari/537.36'}
+    with urllib.request.urlopen(urllib.request.Request(INTER_CSS_URL, headers=headers), timeout=30) as response:
+        css = response.read().decode('utf-8')
+
+    def download(match):
+        url = match.group(1)
+        name = f"inter-{hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]}.woff2"
+        with urllib.request.urlopen(url, timeout=30) as response, open(os.path.join(directory, name), 'wb') as f:
+            f.write(response.read())
+        return f'url({name})'
+
+    css = re.sub(r'url\((https://[^)]+)\)', download, css)
+    with open(os.path.join(directory, 'inter.css'), 'w', encoding='utf-8') as f:
+        f.write(css)
+    return directory
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='オフライン用の静的アセットバンドル')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='配信されるファイルを書き出す')
+    build.add_argument('--output', default='static_bundle', help='出力先ディレクトリ')
+    commands.add_parser('fetch-inter', help='Inter を vendor/inter/ に取得する（要ネットワーク）')
+    args = parser.parse_args(argv)
+
+    if args.command == 'fetch-inter':
+        print(f'Inter を保存しました: {fetch_inter()}')
+        return 0
+
+    bundle = build_bundle()
+    bundle.write(args.output)
+    for hashed, asset in sorted(bundle.files.items()):
+        sizes = '  '.join(f'{encoding} {len(content) / 1024:.1f} KiB' for encoding, content in asset.variants.items())
+        print(f'{hashed:<40}{sizes}')
+    print(f'\n{args.output}/ に書き出しました')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""
+データ公開後のウォームアップとヘルスチェック
+データバージョンが公開されるたびにバックグラウンドのスレッドでよく使われる画面状態
+（最新月・フィルタなし・表示切り替えの全組み合わせ・主要チャネルごとのカード選択）のコールバックを
+プロセス内で実行し、フィルタ結果・KPI値・月別トレンド（CV率の元データ）とコールバック出力のキャッシュを埋める。
+/healthz は生存確認と読み込み状況、/readyz はウォームアップ完了まで 503 を返す（ロードバランサー用）
+
+スレッドは fork 後に残らないため、/healthz・/readyz への最初の問い合わせで開始し、以後は公開のたびに再実行する。
+app_preload では fork 前に同期実行し、ウォームアップ済みのキャッシュをワーカー間で共有する
+"""
+import logging
+import os
+import threading
+import time
+
+import flask
+
+from config import PERFORMANCE
+from utils import metrics
+from utils.renderer_session import TOGGLE_BUTTONS, FlaskClientTransport, RendererSession, load_dependencies
+
+logger = logging.getLogger(__name__)
+
+# ウォームアップの有効/無効（環境変数 SFA_WARMUP=0 で無効）
+enabled = PERFORMANCE['warmup_enabled']
+
+
+class Superseded(Exception):
+    """ウォームアップ中に新しいデータバージョンが公開された"""
+
+
+def toggle_clicks(toggles):
+    """
+    表示切り替えの全組み合わせを1クリックずつ辿るボタンの順序（グレイコード）
+
+    toggles : (切り替え後のボタン, 初期状態のボタン) の一覧
+    """
+    for step in range(1, 2 ** len(toggles)):
+        bit = (step & -step).bit_length() - 1
+        switched = (step ^ (step >> 1)) >> bit & 1
+        yield toggles[bit][0 if switched else 1]
+
+
+class Warmer:
+    """
+    データバージョンごとのウォームアップ
+
+    DataManager.register_cache で登録し、公開時の invalidate() で再実行を予約する
+    """
+
+    def __init__(self, server=None, data_manager=None):
+        self.server = server
+        self.data_manager = data_manager
+        self.active = False  # 公開のたびにバックグラウンドで実行するか
+        self.state = 'idle'  # idle / running / ready / failed
+        self.version = None  # ウォームアップ済み（実行中）のデータバージョン
+        self.steps_done = 0
+        self.steps_total = 0
+        self.duration = None
+        self.error = None
+        self._pid = None  # 実行したプロセス（fork 後の子プロセスでは実行中の状態を引き継がない）
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # --- 予約・実行 -------------------------------------------------------------
+
+    def invalidate(self, changes, version=None):
+        if self.active:
+            self.start()
+
+    def start(self):
+        """バックグラウンドでのウォームアップを開始し、以後の公開でも自動で実行する"""
+        if not enabled or self.server is None:
+            return
+        with self._lock:
+            self.active = True
+            # fork 前のスレッドは子プロセスでは is_alive() が False になる
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self.version == self.data_manager.version and self.state in ('ready', 'failed'):
+                return
+            self._thread = threading.Thread(target=self._run_until_current, name='sfa-warmup', daemon=True)
+            self._thread.start()
+
+    def _run_until_current(self):
+        while self.data_manager.version != self.version or self.state not in ('ready', 'failed'):
+            self.run()
+
+    def run(self):
+        """公開中のデータバージョンのウォームアップを同期実行（途中で更新された場合は中断）"""
+        version = self.data_manager.version
+        self.version, self.state, self.error, self._pid = version, 'running', None, os.getpid()
+        self.steps_done = self.steps_total = 0
+        start = time.perf_counter()
+        try:
+            if self.data_manager.get_data() is not None:
+                self._replay(version)
+        except Superseded:
+            logger.info(f"データバージョン {version} のウォームアップを中断しました（新しいバージョンが公開されました）")
+            return
+        except Exception as e:
+            self.state, self.error = 'failed', str(e)
+            logger.exception(f"データバージョン {version} のウォームアップに失敗しました")
+            return
+        finally:
+            self.duration = time.perf_counter() - start
+        metrics.observe('sfa_warmup_duration_seconds', self.duration)
+        self.state = 'ready'
+        logger.info(f"データバージョン {version} のウォームアップが完了しました"
+                    f"（{self.steps_done} 操作、{self.duration:.1f} 秒）")
+
+    def _replay(self, version):
+        """ブラウザと同じ順序でコールバックを実行"""
+        transport = FlaskClientTransport(self.server)
+        session = RendererSession(transport, load_dependencies(transport), f'warmup-{os.getpid()}-{version}')
+        main_channels = set(self.data_manager.get_main_channels())
+
+        def main_channel_cards(exclude=()):
+            return [key for key in session.cards() if key not in exclude
+                    and session.components[key].get('channel') in main_channels]
+
+        clicks = list(toggle_clicks(list(TOGGLE_BUTTONS.values())))
+        self.steps_total = 1 + len(clicks)
+        self._step(version, session.load_page)
+        tab1_cards = main_channel_cards()
+        # 全組み合わせを辿った後はタブ2（他の切り替えは初期状態）になる
+        for button in clicks:
+            self._step(version, session.click, button)
+        tab2_cards = main_channel_cards(exclude=tab1_cards)
+
+        # 主要チャネルのカードを選択・解除（タブ2 → タブ1の順で、最後は初期表示に戻る）
+        self.steps_total += 2 * (len(tab1_cards) + len(tab2_cards)) + 1
+        for card in tab2_cards:
+            self._step(version, session.click, card)
+            self._step(version, session.click, card)
+        self._step(version, session.click, TOGGLE_BUTTONS['tab'][1])
+        for card in tab1_cards:
+            self._step(version, session.click, card)
+            self._step(version, session.click, card)
+
+    def _step(self, version, action, *args):
+        if self.data_manager.version != version:
+            raise Superseded()
+        action(*args)
+        self.steps_done += 1
+
+    # --- 状態 -----------------------------------------------------------------
+
+    def is_ready(self):
+        """公開中のバージョンのウォームアップが終わっているか（失敗時も処理は可能なため準備完了とする）"""
+        if not enabled or self.data_manager.get_data() is None:
+            return True
+        return self.version == self.data_manager.version and self.state in ('ready', 'failed')
+
+    def status(self):
+        stale = self.state == 'running' and self._pid != os.getpid()
+        return {
+            'state': 'idle' if stale else self.state,
+            'version': self.version,
+            'steps_done': self.steps_done,
+            'steps_total': self.steps_total,
+            'duration_s': round(self.duration, 3) if self.duration is not None else None,
+            'error': self.error,
+        }
+
+
+# プロセス内で共有するウォームアップ
+warmer = Warmer()
+
+
+def init_app(app, data_manager):
+    """Dashアプリに /healthz・/readyz を登録し、データ公開時のウォームアップを設定"""
+    warmer.server = app.server
+    warmer.data_manager = data_manager
+    data_manager.register_cache(warmer)
+
+    def report():
+        return {
+            'data_loaded': data_manager.get_data() is not None,
+            'data_version': data_manager.version,
+            'last_update': data_manager.get_last_update(),
+            'warmup': warmer.status() if enabled else None,
+        }
+
+    @app.server.route('/healthz')
+    def _healthz():
+        warmer.start()
+        return flask.jsonify({'status': 'ok', **report()})
+
+    @app.server.route('/readyz')
+    def _readyz():
+        warmer.start()
+        ready = warmer.is_ready()
+        return flask.jsonify({'status': 'ready' if ready else 'warming', **report()}), 200 if ready else 503